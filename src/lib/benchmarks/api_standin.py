@@ -0,0 +1,306 @@
+﻿"""
+API Stand-in - Benchmarks SafetyGraph / STORM
+=============================================
+Serveur aiohttp local imitant Perplexity (POST /chat/completions) et
+Anthropic (POST /v1/messages): latence tirée d'une distribution,
+injection de 429 / 5xx, taille de réponse configurable.
+Le chemin HTTP réel des connecteurs est exercé sans clé ni coût API.
+
+Usage:
+    python api_standin.py --port 8765 --latency lognormal --median-ms 400 --rate-limit-rate 0.05
+    PERPLEXITY_API_KEY=standin PERPLEXITY_BASE_URL=http://127.0.0.1:8765 ...
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ...
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger("SafetyGraph.APIStandin")
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+# Statuts 5xx injectés (répartition uniforme)
+SERVER_ERROR_STATUSES = (500, 502, 503)
+
+INSIGHT_SENTENCES = [
+    "Behavioral safety training reduces recordable incidents by 25% within 12 months.",
+    "Supervisor engagement doubles near miss reporting in construction crews.",
+    "La formation comportementale réduit les accidents de 40% dans le secteur manufacturier.",
+    "Peer observation programs improve PPE compliance to 92% after six months.",
+    "Le leadership transformationnel améliore le climat de sécurité de 18%."
+]
+
+# ===================================================================
+# CONFIGURATION
+# ===================================================================
+
+@dataclass
+class LatencyModel:
+    """Distribution de latence serveur (millisecondes)"""
+    distribution: str = "lognormal"
+    median_ms: float = 200.0
+    # Dispersion: sigma (lognormal) ou demi-largeur relative (uniform)
+    spread: float = 0.5
+    max_ms: float = 30000.0
+
+    def __post_init__(self):
+        if self.distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribution inconnue: {self.distribution} ({', '.join(LATENCY_DISTRIBUTIONS)})")
+
+    def sample(self, rng: random.Random) -> float:
+        """Latence tirée (secondes)"""
+        if self.distribution == "fixed":
+            ms = self.median_ms
+        elif self.distribution == "uniform":
+            ms = rng.uniform(self.median_ms * (1 - self.spread), self.median_ms * (1 + self.spread))
+        elif self.distribution == "exponential":
+            ms = rng.expovariate(math.log(2) / self.median_ms) if self.median_ms > 0 else 0.0
+        else:
+            ms = rng.lognormvariate(math.log(self.median_ms), self.spread) if self.median_ms > 0 else 0.0
+        return min(max(ms, 0.0), self.max_ms) / 1000
+
+@dataclass
+class StandinConfig:
+    """Comportement du serveur de substitution (commun aux deux API)"""
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    # Probabilités d'injection par requête
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    # Retry-After renvoyé avec les 429 (secondes)
+    retry_after: float = 0.5
+    # Taille approximative du contenu texte des réponses (caractères)
+    perplexity_payload_chars: int = 4000
+    anthropic_payload_chars: int = 1500
+    seed: int = 42
+
+# ===================================================================
+# SERVEUR
+# ===================================================================
+
+class APIStandinServer:
+    """
+    Serveur local Perplexity / Anthropic
+
+    Chaque requête attend une latence tirée de config.latency, puis
+    répond 429 (avec Retry-After), 5xx ou 200 selon les taux d'injection.
+    Les compteurs par endpoint et statut sont exposés dans stats().
+    """
+
+    def __init__(self, config: Optional[StandinConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StandinConfig()
+        self.host = host
+        self.port = port
+        self.rng = random.Random(self.config.seed)
+        self.status_counts: Dict[str, Counter] = {"perplexity": Counter(), "anthropic": Counter()}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._perplexity_body = self._perplexity_content(self.config.perplexity_payload_chars)
+        self._anthropic_body = self._anthropic_content(self.config.anthropic_payload_chars)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.handle_perplexity)
+        app.router.add_post("/v1/messages", self.handle_anthropic)
+        app.router.add_get("/stats", self.handle_stats)
+        return app
+
+    async def start(self) -> str:
+        """Démarre le serveur (port libre si port=0) et retourne son URL de base"""
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"🧪 Stand-in API démarré: {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    def stats(self) -> Dict:
+        return {
+            "status_counts": {api: dict(counts) for api, counts in self.status_counts.items()},
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "config": asdict(self.config)
+        }
+
+    def reset_stats(self):
+        for counts in self.status_counts.values():
+            counts.clear()
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    # ===================================================================
+    # CONTENUS
+    # ===================================================================
+
+    @staticmethod
+    def _perplexity_content(chars: int) -> str:
+        sentences = []
+        size = 0
+        while size < chars:
+            sentence = INSIGHT_SENTENCES[len(sentences) % len(INSIGHT_SENTENCES)]
+            sentences.append(f"- {sentence} [{len(sentences) + 1}]")
+            size += len(sentences[-1]) + 1
+        return "\n".join(sentences)
+
+    @staticmethod
+    def _anthropic_content(chars: int) -> str:
+        """Réponse JSON au format attendu par ClaudeSemanticExtractor._parse_response"""
+        data = {
+            "insights": [],
+            "metrics": {"efficacite": 0.82, "reduction_risque": 0.35},
+            "agents": {"A1-A3": "collecte", "AN1-AN5": "analyse"},
+            "citations": ["Standin et al. (2024)", "CNESST (2023)"],
+            "confidence": 0.87
+        }
+        while len(json.dumps(data, ensure_ascii=False)) < chars or not data["insights"]:
+            data["insights"].append(INSIGHT_SENTENCES[len(data["insights"]) % len(INSIGHT_SENTENCES)])
+        return json.dumps(data, ensure_ascii=False)
+
+    # ===================================================================
+    # HANDLERS
+    # ===================================================================
+
+    async def _admit(self, request: web.Request, api: str) -> Optional[web.Response]:
+        """Latence simulée puis erreur injectée éventuelle (None: réponse normale)"""
+        body = await request.read()
+        self.request_bytes += len(body)
+        await asyncio.sleep(self.config.latency.sample(self.rng))
+
+        draw = self.rng.random()
+        if draw < self.config.rate_limit_rate:
+            status = 429
+            headers = {"Retry-After": f"{self.config.retry_after:g}"}
+            error = {"type": "rate_limit_error", "message": "Stand-in: rate limit injected"}
+        elif draw < self.config.rate_limit_rate + self.config.server_error_rate:
+            status = self.rng.choice(SERVER_ERROR_STATUSES)
+            headers = {}
+            error = {"type": "api_error", "message": f"Stand-in: HTTP {status} injected"}
+        else:
+            return None
+
+        self.status_counts[api][status] += 1
+        payload = {"type": "error", "error": error} if api == "anthropic" else {"error": error}
+        return self._json(payload, status=status, headers=headers)
+
+    def _json(self, payload: Dict, status: int = 200, headers: Optional[Dict] = None) -> web.Response:
+        text = json.dumps(payload, ensure_ascii=False)
+        self.response_bytes += len(text)
+        return web.Response(text=text, status=status, headers=headers, content_type="application/json")
+
+    async def handle_perplexity(self, request: web.Request) -> web.Response:
+        error = await self._admit(request, "perplexity")
+        if error is not None:
+            return error
+
+        self.status_counts["perplexity"][200] += 1
+        return self._json({
+            "id": f"standin-{time.monotonic_ns()}",
+            "model": "standin-sonar",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": self._perplexity_body}
+            }],
+            "usage": {"prompt_tokens": 120, "completion_tokens": len(self._perplexity_body) // 4}
+        })
+
+    async def handle_anthropic(self, request: web.Request) -> web.Response:
+        error = await self._admit(request, "anthropic")
+        if error is not None:
+            return error
+
+        self.status_counts["anthropic"][200] += 1
+        return self._json({
+            "id": f"msg_standin_{time.monotonic_ns()}",
+            "type": "message",
+            "role": "assistant",
+            "model": "standin-claude",
+            "content": [{"type": "text", "text": self._anthropic_body}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 800, "output_tokens": len(self._anthropic_body) // 4}
+        })
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return self._json(self.stats())
+
+# ===================================================================
+# CLI
+# ===================================================================
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    """Options du stand-in (partagées avec load_test.py)"""
+    parser.add_argument("--latency", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--median-ms", type=float, default=200.0, help="Latence médiane (ms)")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="Sigma (lognormal) ou demi-largeur relative (uniform)")
+    parser.add_argument("--max-latency-ms", type=float, default=30000.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probabilité de 429 par requête")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Probabilité de 5xx par requête")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After des 429 (s)")
+    parser.add_argument("--perplexity-chars", type=int, default=4000, help="Taille des réponses Perplexity")
+    parser.add_argument("--anthropic-chars", type=int, default=1500, help="Taille des réponses Anthropic")
+    parser.add_argument("--seed", type=int, default=42)
+
+def standin_config_from_args(args: argparse.Namespace) -> StandinConfig:
+    return StandinConfig(
+        latency=LatencyModel(args.latency, args.median_ms, args.spread, args.max_latency_ms),
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        retry_after=args.retry_after,
+        perplexity_payload_chars=args.perplexity_chars,
+        anthropic_payload_chars=args.anthropic_chars,
+        seed=args.seed
+    )
+
+async def serve_forever(server: APIStandinServer):
+    async with server:
+        await asyncio.Event().wait()
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stand-in local des API Perplexity et Anthropic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = APIStandinServer(standin_config_from_args(args), args.host, args.port)
+    try:
+        asyncio.run(serve_forever(server))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
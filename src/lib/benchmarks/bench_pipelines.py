@@ -0,0 +1,333 @@
+﻿"""
+Benchmarks AN1 / STORM - SafetyGraph
+=============================================
+Suite reproductible: AN1 (process, process_batch, orchestrateur
+multi-processus, noyau vectoriel),
+KnowledgeExtractor et SafetyKnowledgeGraph sur données synthétiques.
+Débit, percentiles de latence et pic mémoire enregistrés dans une
+baseline JSON comparable d'une exécution à l'autre.
+
+Usage:
+    python bench_pipelines.py --output baseline.json
+    python bench_pipelines.py --quick --compare baseline.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+LIB_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(LIB_DIR / "storm"))
+sys.path.insert(0, str(LIB_DIR / "safetygraph"))
+
+from an1_analyste_ecarts import AN1AnalysteEcarts
+from an1_orchestrator import AN1Orchestrator
+from knowledge_extractor import KnowledgeExtractor
+from knowledge_graph import SafetyKnowledgeGraph
+from synthetic_data import (
+    generate_an1_pairs, generate_an1_matrices,
+    generate_research_corpus, generate_extractions
+)
+
+logger = logging.getLogger("SafetyGraph.Benchmarks")
+
+BENCHMARK_VERSION = 1
+
+# Échelles (établissements, variables)
+AN1_SCALES = [
+    (10, 10), (10, 200),
+    (1000, 10), (1000, 50), (1000, 200),
+    (100000, 10), (100000, 50), (100000, 200)
+]
+QUICK_AN1_SCALES = [(10, 10), (10, 200), (1000, 10), (1000, 50)]
+
+# Corpus STORM (documents, phrases par document) et graphes (extractions)
+CORPUS_SCALES = [(100, 50), (100, 500)]
+GRAPH_SCALES = [1000, 20000]
+QUICK_GRAPH_SCALES = [1000]
+
+# ===================================================================
+# MESURES
+# ===================================================================
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Percentiles de latence (secondes)"""
+    values = np.asarray(latencies, dtype=float)
+    return {
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "mean": float(values.mean()),
+        "max": float(values.max())
+    }
+
+def peak_memory_mb(fn: Callable[[], object]) -> float:
+    """Pic mémoire Python (tracemalloc) d'une exécution, hors chronométrage"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def measure(name: str, params: Dict, fn: Callable[[], object], items: int,
+            repeat: int = 5, per_item_latencies: Optional[Callable[[], List[float]]] = None) -> Dict:
+    """
+    Chronométrer fn() sur `repeat` exécutions
+    
+    items: unités traitées par exécution (débit = items / temps médian).
+    per_item_latencies: si fourni, latences unitaires mesurées par le cas
+    lui-même (ex. un appel process() par établissement) utilisées pour
+    les percentiles à la place des latences par exécution.
+    """
+    fn()  # Préchauffage (imports, compilation regex, caches numpy)
+    
+    run_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        run_times.append(time.perf_counter() - start)
+    
+    latencies = per_item_latencies() if per_item_latencies else run_times
+    median_run = float(np.median(run_times))
+    
+    result = {
+        "name": name,
+        "params": params,
+        "items": items,
+        "repeat": repeat,
+        "latency_s": summarize_latencies(latencies),
+        "run_time_s": float(median_run),
+        "throughput_per_s": items / median_run if median_run > 0 else float("inf"),
+        "peak_memory_mb": round(peak_memory_mb(fn), 3)
+    }
+    logger.info(f"⏱️ {name} {params}: {result['throughput_per_s']:.1f}/s, "
+                f"p95 {result['latency_s']['p95'] * 1000:.2f}ms, {result['peak_memory_mb']:.1f} MB")
+    return result
+
+# ===================================================================
+# CAS AN1
+# ===================================================================
+
+def bench_an1(scales, max_full_sites: int, repeat: int, seed: int) -> List[Dict]:
+    """AN1: noyau vectoriel (toutes échelles), process_batch, orchestrateur et process() par établissement"""
+    agent = AN1AnalysteEcarts()
+    orchestrator = AN1Orchestrator()
+    loop = asyncio.new_event_loop()
+    results = []
+    
+    try:
+        for n_sites, n_variables in scales:
+            params = {"sites": n_sites, "variables": n_variables}
+            
+            scores_a1, scores_a2 = generate_an1_matrices(n_sites, n_variables, seed)
+            results.append(measure(
+                "an1_gap_kernel", params,
+                lambda: agent._calculate_gap_arrays(scores_a1, scores_a2),
+                items=n_sites, repeat=repeat
+            ))
+            del scores_a1, scores_a2
+            
+            if n_sites > max_full_sites:
+                continue
+            
+            pairs = generate_an1_pairs(n_sites, n_variables, seed)
+            results.append(measure(
+                "an1_process_batch", params,
+                lambda: loop.run_until_complete(agent.process_batch(pairs)),
+                items=n_sites, repeat=repeat
+            ))
+            
+            # Pool de processus (tous les cœurs, cf. environment.cpu_count)
+            sites = [(index, data_a1, data_a2) for index, (data_a1, data_a2) in enumerate(pairs)]
+            results.append(measure(
+                "an1_orchestrator", params, lambda: orchestrator.run(sites),
+                items=n_sites, repeat=repeat
+            ))
+            
+            def run_sequential(latencies: Optional[List[float]] = None):
+                for data_a1, data_a2 in pairs:
+                    start = time.perf_counter()
+                    loop.run_until_complete(agent.process(data_a1, data_a2))
+                    if latencies is not None:
+                        latencies.append(time.perf_counter() - start)
+            
+            def site_latencies() -> List[float]:
+                latencies: List[float] = []
+                run_sequential(latencies)
+                return latencies
+            
+            results.append(measure(
+                "an1_process", params, run_sequential,
+                items=n_sites, repeat=max(1, repeat // 2), per_item_latencies=site_latencies
+            ))
+    finally:
+        loop.close()
+        orchestrator.close()
+    
+    return results
+
+# ===================================================================
+# CAS STORM
+# ===================================================================
+
+def bench_extractor(scales, repeat: int, seed: int) -> List[Dict]:
+    """KnowledgeExtractor: extraction par document sur corpus synthétiques"""
+    extractor = KnowledgeExtractor()
+    results = []
+    
+    for n_documents, n_sentences in scales:
+        corpus = generate_research_corpus(n_documents, n_sentences, seed)
+        corpus_mb = sum(len(doc["raw_content"]) for doc in corpus) / (1024 * 1024)
+        
+        def document_latencies() -> List[float]:
+            latencies = []
+            for research_data in corpus:
+                start = time.perf_counter()
+                extractor.extract_from_research(research_data)
+                latencies.append(time.perf_counter() - start)
+            return latencies
+        
+        result = measure(
+            "knowledge_extractor", {"documents": n_documents, "sentences": n_sentences},
+            lambda: extractor.batch_extract_knowledge(corpus),
+            items=n_documents, repeat=repeat, per_item_latencies=document_latencies
+        )
+        result["throughput_mb_per_s"] = corpus_mb / result["run_time_s"] if result["run_time_s"] > 0 else float("inf")
+        results.append(result)
+    
+    return results
+
+def bench_graph(scales, repeat: int, seed: int) -> List[Dict]:
+    """SafetyKnowledgeGraph: insertion en lot, export et impact"""
+    results = []
+    
+    for n_extractions in scales:
+        extractions = list(generate_extractions(n_extractions, seed=seed))
+        params = {"extractions": n_extractions}
+        
+        def build() -> SafetyKnowledgeGraph:
+            graph = SafetyKnowledgeGraph()
+            graph.add_semantic_knowledge_bulk(extractions)
+            return graph
+        
+        results.append(measure("graph_bulk_insert", params, build, items=n_extractions, repeat=repeat))
+        
+        graph = build()
+        params = dict(params, nodes=graph.graph.number_of_nodes())
+        results.append(measure("graph_export", params, graph.export_knowledge_structure, items=1, repeat=repeat))
+        results.append(measure("graph_enhancement_impact", params, graph.calculate_enhancement_impact,
+                               items=1, repeat=repeat))
+        
+        # Requêtes plein texte: insights existants, avec et sans filtre topic
+        queries = [(insight, extraction['topic']) for extraction in extractions[:100]
+                   for insight in extraction['insights'][:1]]
+        results.append(measure("graph_search", params,
+                               lambda: [graph.search_concepts(query) for query, _ in queries],
+                               items=len(queries), repeat=repeat))
+        results.append(measure("graph_search_topic", params,
+                               lambda: [graph.search_concepts(query, topic=topic) for query, topic in queries],
+                               items=len(queries), repeat=repeat))
+    
+    return results
+
+# ===================================================================
+# BASELINE
+# ===================================================================
+
+def environment_info() -> Dict:
+    """Contexte d'exécution enregistré avec la baseline"""
+    import os
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def case_key(result: Dict) -> str:
+    """Clé stable d'un cas (nom + paramètres)"""
+    return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+def compare_with_baseline(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Comparer débit et p95 à une baseline; retourne les régressions au-delà de la tolérance"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    
+    regressions = []
+    for result in results:
+        reference = baseline.get(case_key(result))
+        if reference is None:
+            continue
+        
+        throughput_ratio = result["throughput_per_s"] / reference["throughput_per_s"]
+        p95_ratio = result["latency_s"]["p95"] / reference["latency_s"]["p95"]
+        print(f"{result['name']:<26} {json.dumps(result['params']):<40} "
+              f"débit x{throughput_ratio:.2f}  p95 x{p95_ratio:.2f}")
+        
+        if throughput_ratio < 1 - tolerance or p95_ratio > 1 + tolerance:
+            regressions.append(f"{result['name']} {result['params']}")
+    
+    return regressions
+
+def run_benchmarks(quick: bool = False, max_full_sites: int = 1000,
+                   repeat: int = 5, seed: int = 42) -> Dict:
+    """Exécuter la suite complète et retourner le document baseline"""
+    results = []
+    results += bench_an1(QUICK_AN1_SCALES if quick else AN1_SCALES, max_full_sites, repeat, seed)
+    results += bench_extractor(CORPUS_SCALES[:1] if quick else CORPUS_SCALES, repeat, seed)
+    results += bench_graph(QUICK_GRAPH_SCALES if quick else GRAPH_SCALES, repeat, seed)
+    
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "quick": quick,
+        "seed": seed,
+        "environment": environment_info(),
+        "results": results
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks AN1 / STORM sur données synthétiques")
+    parser.add_argument("--output", default="bench_results.json", help="Fichier JSON de résultats")
+    parser.add_argument("--compare", help="Baseline JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Tolérance de régression (0.2 = 20%%)")
+    parser.add_argument("--quick", action="store_true", help="Échelles réduites")
+    parser.add_argument("--max-full-sites", type=int, default=1000,
+                        help="Nombre max d'établissements pour process()/process_batch")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    # Journaux par appel des agents: bruit et coût hors périmètre mesuré
+    for name in ("SafetyAgentic.AN1", "KnowledgeExtractor"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    
+    report = run_benchmarks(args.quick, args.max_full_sites, args.repeat, args.seed)
+    
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"💾 Résultats enregistrés: {args.output} ({len(report['results'])} cas)")
+    
+    if args.compare:
+        regressions = compare_with_baseline(report["results"], args.compare, args.tolerance)
+        if regressions:
+            logger.warning(f"⚠️ {len(regressions)} régression(s): {', '.join(regressions)}")
+            return 1
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+﻿"""
+Import Time Budget - SafetyGraph / STORM
+=============================================
+Vérifie que l'import des modules storm et safetygraph reste sous un budget
+(python -X importtime, processus neuf par module) et qu'aucune dépendance
+lourde (numpy, networkx, aiohttp, anthropic, yaml) n'est chargée à l'import.
+
+Le budget porte sur le coût propre au projet et aux dépendances tierces;
+la part bibliothèque standard (asyncio, json...) est rapportée séparément,
+elle dépend surtout de la machine.
+
+Usage:
+    python check_import_time.py [--budget-ms 50] [--runs 3]
+"""
+
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+LIB_DIR = Path(__file__).resolve().parent.parent
+
+MODULES = {
+    "storm": [
+        "storm_launcher", "storm_pipeline", "knowledge_graph", "knowledge_extractor",
+        "semantic_extractor", "mcp_perplexity", "research_topics", "cnesst_enrichment",
+        "insight_dedup", "concept_search", "knowledge_columns"
+    ],
+    "safetygraph": ["an1_analyste_ecarts"]
+}
+
+HEAVY_DEPENDENCIES = ["numpy", "networkx", "aiohttp", "anthropic", "yaml", "pyarrow"]
+
+DEFAULT_BUDGET_MS = 50.0
+
+def measure_import(package: str, module: str) -> Tuple[float, float, List[str]]:
+    """Temps d'import (ms): total, hors bibliothèque standard; dépendances lourdes chargées"""
+    code = (
+        f"import sys; sys.path.insert(0, {str(LIB_DIR / package)!r}); import {module}; "
+        f"print(','.join(m for m in {HEAVY_DEPENDENCIES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True
+    )
+    
+    # Lignes "import time: self | cumulative | name"; le sous-arbre du module
+    # suit l'initialisation de site et se termine par sa ligne sans indentation
+    cumulative_us = None
+    own_us = 0
+    in_subtree = False
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, self_us, cumulative, name = line.replace("import time:", "|", 1).split("|")
+        if not self_us.strip().isdigit():
+            continue  # En-tête
+        if name.strip() == "site" and not name.startswith("  "):
+            in_subtree = True
+            continue
+        if not in_subtree:
+            continue
+        if name.strip().split(".")[0] not in sys.stdlib_module_names:
+            own_us += int(self_us)
+        if name.rstrip() == f" {module}":
+            cumulative_us = int(cumulative)
+            break
+    
+    if cumulative_us is None:
+        raise RuntimeError(f"Temps d'import introuvable pour {module}")
+    
+    heavy = [m for m in completed.stdout.strip().split(",") if m]
+    return cumulative_us / 1000, own_us / 1000, heavy
+
+def check_import_budget(budget_ms: float = DEFAULT_BUDGET_MS, runs: int = 3) -> Dict[str, Dict]:
+    """Mesure chaque module (meilleur de `runs`) et compare au budget"""
+    report = {}
+    for package, modules in MODULES.items():
+        for module in modules:
+            measures = [measure_import(package, module) for _ in range(runs)]
+            own_ms = min(own for _, own, _ in measures)
+            report[module] = {
+                "package": package,
+                "import_ms": min(total for total, _, _ in measures),
+                "own_ms": own_ms,
+                "heavy_dependencies": measures[0][2],
+                "ok": own_ms <= budget_ms and not measures[0][2]
+            }
+    return report
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Budget de temps d'import storm / safetygraph")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="Mesures par module (meilleure retenue)")
+    args = parser.parse_args()
+    
+    report = check_import_budget(args.budget_ms, args.runs)
+    for module, result in report.items():
+        status = "✅" if result["ok"] else "❌"
+        heavy = f"  lourdes: {', '.join(result['heavy_dependencies'])}" if result["heavy_dependencies"] else ""
+        print(f"{status} {result['package'] + '/' + module:<34} projet {result['own_ms']:6.1f} ms"
+              f"  (total {result['import_ms']:6.1f} ms){heavy}")
+    
+    failures = [module for module, result in report.items() if not result["ok"]]
+    if failures:
+        print(f"❌ Budget d'import ({args.budget_ms:.0f} ms) dépassé: {', '.join(failures)}")
+        return 1
+    
+    print(f"✅ Tous les modules sous {args.budget_ms:.0f} ms (hors stdlib) sans dépendance lourde à l'import")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+﻿"""
+Load Test - Benchmarks SafetyGraph / STORM
+==========================================
+Charge de bout en bout sur le chemin HTTP réel: batch_research
+(PerplexityMCPConnector) et ClaudeSemanticExtractor contre le stand-in
+local (api_standin.py) ou un serveur désigné par --target.
+Débit et percentiles p50/p95/p99 par niveau de concurrence.
+
+Usage:
+    python load_test.py --requests 500 --concurrency 4 8 16 32 --median-ms 300
+    python load_test.py --scenario perplexity --rate-limit-rate 0.05 --server-error-rate 0.02
+    python load_test.py --target http://127.0.0.1:8765 --output load.json
+"""
+
+import sys
+import copy
+import json
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+LIB_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(LIB_DIR / "storm"))
+
+from api_standin import APIStandinServer, add_standin_arguments, standin_config_from_args
+from bench_pipelines import environment_info, summarize_latencies
+from mcp_perplexity import PerplexityMCPConnector, batch_research
+from research_cache import ResearchCache
+from semantic_extractor import ClaudeSemanticExtractor
+from storm_config import load_storm_config
+
+logger = logging.getLogger("SafetyGraph.LoadTest")
+
+SCENARIOS = ("perplexity", "semantic")
+
+# Clé factice: tout sauf "demo_key" (qui court-circuite le chemin HTTP)
+STANDIN_API_KEY = "standin"
+
+# ===================================================================
+# CLIENTS INSTRUMENTÉS
+# ===================================================================
+
+class TimedPerplexityConnector(PerplexityMCPConnector):
+    """Connecteur Perplexity qui enregistre la latence de chaque recherche (nouvelles tentatives incluses)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+
+    async def search_topic(self, topic: str, context: str = "safety", rate_limiter=None) -> Dict:
+        start = time.perf_counter()
+        try:
+            return await super().search_topic(topic, context, rate_limiter=rate_limiter)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+class TimedSemanticExtractor(ClaudeSemanticExtractor):
+    """Extracteur sémantique qui enregistre la latence de chaque extraction (nouvelles tentatives SDK incluses)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies: List[float] = []
+
+    async def extract_semantic_knowledge(self, content: str, topic: str):
+        start = time.perf_counter()
+        try:
+            return await super().extract_semantic_knowledge(content, topic)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+# ===================================================================
+# SCÉNARIOS
+# ===================================================================
+
+def summarize_run(scenario: str, concurrency: int, requests: int, failures: int,
+                  latencies: List[float], elapsed: float) -> Dict:
+    result = {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "succeeded": requests - failures,
+        "failed": failures,
+        "elapsed_s": elapsed,
+        "throughput_per_s": (requests - failures) / elapsed if elapsed > 0 else float("inf"),
+        "latency_s": summarize_latencies(latencies) if latencies else {}
+    }
+    latency = result["latency_s"]
+    logger.info(f"⏱️ {scenario} x{concurrency}: {result['throughput_per_s']:.1f}/s, "
+                f"p50 {latency.get('p50', 0) * 1000:.0f}ms, p95 {latency.get('p95', 0) * 1000:.0f}ms, "
+                f"p99 {latency.get('p99', 0) * 1000:.0f}ms, {failures} échec(s)")
+    return result
+
+async def run_perplexity(base_url: str, requests: int, concurrency: int, storm_config: Dict) -> Dict:
+    """batch_research sur `requests` topics distincts (pas de fusion single-flight ni de cache)"""
+    config = copy.deepcopy(storm_config)
+    config.setdefault("research", {})["parallel_threads"] = concurrency
+
+    connector = TimedPerplexityConnector(cache=ResearchCache(enabled=False), config=config)
+    connector.api_key = STANDIN_API_KEY
+    connector.base_url = base_url
+    topics = [f"load_test_topic_{i}" for i in range(requests)]
+
+    try:
+        start = time.perf_counter()
+        results = await batch_research(topics, connector=connector)
+        elapsed = time.perf_counter() - start
+    finally:
+        await connector.close()
+
+    failures = sum(1 for result in results if "error" in result)
+    return summarize_run("perplexity", concurrency, requests, failures, connector.latencies, elapsed)
+
+async def run_semantic(base_url: str, requests: int, concurrency: int, max_retries: int) -> Dict:
+    """batch_extract_semantic_knowledge sur `requests` documents distincts (mémoïsation désactivée)"""
+    import anthropic
+
+    extractor = TimedSemanticExtractor(
+        api_key=STANDIN_API_KEY, base_url=base_url, max_concurrency=concurrency,
+        # Budget de tokens non limitant: seule la concurrence est mesurée
+        tokens_per_minute=10 ** 9, memoize=False
+    )
+    # Concurrence bornée par le sémaphore de l'extracteur; nouvelles tentatives du SDK configurables
+    client = anthropic.AsyncAnthropic(api_key=STANDIN_API_KEY, base_url=base_url, max_retries=max_retries)
+    extractor.client = client
+    items = [(f"Document de recherche {i}: " + "données SST " * 50, f"load_test_topic_{i}") for i in range(requests)]
+
+    try:
+        start = time.perf_counter()
+        extractions = await extractor.batch_extract_semantic_knowledge(items)
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+
+    return summarize_run("semantic", concurrency, requests, requests - len(extractions), extractor.latencies, elapsed)
+
+async def run_load_test(scenarios: List[str], requests: int, concurrency_levels: List[int],
+                        server: Optional[APIStandinServer] = None, target: Optional[str] = None,
+                        max_retries: int = 2) -> List[Dict]:
+    """Exécute chaque scénario à chaque niveau de concurrence (stand-in démarré si pas de cible)"""
+    storm_config = load_storm_config()
+    results = []
+
+    if target is None:
+        await server.start()
+    base_url = target or server.base_url
+
+    try:
+        for scenario in scenarios:
+            for concurrency in concurrency_levels:
+                if target is None:
+                    server.reset_stats()
+                if scenario == "perplexity":
+                    result = await run_perplexity(base_url, requests, concurrency, storm_config)
+                else:
+                    result = await run_semantic(base_url, requests, concurrency, max_retries)
+                if target is None:
+                    result["server"] = server.stats()["status_counts"]
+                results.append(result)
+    finally:
+        if target is None:
+            await server.stop()
+
+    return results
+
+# ===================================================================
+# CLI
+# ===================================================================
+
+def print_table(results: List[Dict]):
+    print(f"{'scénario':<12} {'conc.':>5} {'ok':>6} {'échecs':>6} {'débit/s':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        latency = r["latency_s"]
+        print(f"{r['scenario']:<12} {r['concurrency']:>5} {r['succeeded']:>6} {r['failed']:>6} "
+              f"{r['throughput_per_s']:>9.1f} {latency.get('p50', 0) * 1000:>8.0f} "
+              f"{latency.get('p95', 0) * 1000:>8.0f} {latency.get('p99', 0) * 1000:>8.0f}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Test de charge STORM contre le stand-in API local")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par niveau de concurrence")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--max-retries", type=int, default=2, help="Nouvelles tentatives du SDK Anthropic")
+    parser.add_argument("--target", help="URL d'un serveur déjà démarré (sinon stand-in local)")
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Une ligne INFO par requête HTTP; les erreurs par requête des clients restent visibles
+    # (anthropic 1.13 journalise via "httpx2")
+    for name in ("httpx", "httpx2"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    scenarios = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+    server = None if args.target else APIStandinServer(standin_config_from_args(args))
+    results = asyncio.run(run_load_test(scenarios, args.requests, args.concurrency,
+                                        server=server, target=args.target, max_retries=args.max_retries))
+    print_table(results)
+
+    if args.output:
+        report = {
+            "created_at": datetime.now().isoformat(),
+            "environment": environment_info(),
+            "standin": None if args.target else server.stats()["config"],
+            "target": args.target,
+            "results": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        logger.info(f"💾 Résultats enregistrés: {args.output}")
+
+    # Scénario sans aucune réussite: mesure invalide (configuration, SDK, cible...)
+    broken = [r for r in results if r["requests"] and not r["succeeded"]]
+    for r in broken:
+        logger.error(f"❌ {r['scenario']} x{r['concurrency']}: {r['failed']}/{r['requests']} requêtes en échec")
+    return 1 if broken else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
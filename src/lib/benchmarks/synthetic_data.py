@@ -0,0 +1,116 @@
+﻿"""
+Synthetic Data - Benchmarks SafetyGraph / STORM
+=============================================
+Générateurs reproductibles de données A1/A2, corpus de recherche
+et extractions pour benchmarks AN1 et pipeline STORM
+"""
+
+import random
+import numpy as np
+from typing import Dict, Iterator, List, Tuple
+
+# Variables connues des modèles HSE (AN1) - complétées par des variables génériques
+HSE_VARIABLES = [
+    "leadership_sst", "politique_securite", "ressources_securite",
+    "supervision_directe", "formation_superviseurs", "communication_risques",
+    "usage_epi", "respect_procedures", "maintenance_equipements",
+    "comportements_risque", "erreurs_execution", "violations_regles",
+    "formation_securite", "audit_securite", "controle_epi", "inspection_equipements",
+    "competences_securite", "motivation_securite", "perception_risque",
+    "equipements_protection", "systemes_alerte", "maintenance_preventive",
+    "competences_techniques", "automatismes_securite", "reflexes_urgence",
+    "application_consignes", "suivi_protocoles", "comprehension_risques",
+    "analyse_situations", "prise_decision", "procedures_urgence", "formation_secours"
+]
+
+INSIGHT_PREFIXES = ["Research shows that", "Studies indicate", "Evidence suggests", "Findings reveal"]
+INSIGHT_SUBJECTS = [
+    "behavioral safety training", "supervisor engagement", "peer observation programs",
+    "near miss reporting", "psychological safety", "leading indicators", "toolbox talks",
+    "safety leadership coaching", "hazard recognition drills", "incident debriefs"
+]
+INSIGHT_EFFECTS = [
+    "reduces recordable injuries", "improves procedure compliance", "increases reporting rates",
+    "strengthens safety climate scores", "lowers lost time incidents", "improves PPE usage"
+]
+METRIC_TEMPLATES = ["{v}% improvement", "{v}% reduction", "{v}% increase", "ROI of {v}%"]
+FILLER = "Organizations across construction and manufacturing sectors were surveyed over several years."
+
+def variable_names(n_variables: int) -> List[str]:
+    """n variables: variables HSE connues puis variables génériques"""
+    names = HSE_VARIABLES[:n_variables]
+    names += [f"variable_culture_{i}" for i in range(n_variables - len(names))]
+    return names
+
+def generate_an1_pairs(n_sites: int, n_variables: int, seed: int = 42) -> List[Tuple[Dict, Dict]]:
+    """Paires (A1, A2) synthétiques au format AN1AnalysteEcarts.process()"""
+    rng = random.Random(seed)
+    names = variable_names(n_variables)
+    pairs = []
+    
+    for _ in range(n_sites):
+        scores_a1 = {v: {"score": round(rng.uniform(3.0, 10.0), 2), "source": "questionnaire"} for v in names}
+        scores_a2 = {v: {"score": round(rng.uniform(1.0, 10.0), 2), "source": "observation"} for v in names}
+        pairs.append((
+            {"variables_culture_sst": scores_a1,
+             "scores_autoeval": {"score_global": rng.randint(40, 95), "fiabilite": 0.8}},
+            {"variables_culture_terrain": scores_a2,
+             "observations": {"score_comportement": rng.randint(30, 90), "dangers_detectes": rng.randint(0, 5)}}
+        ))
+    
+    return pairs
+
+def generate_an1_matrices(n_sites: int, n_variables: int, seed: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """Matrices de scores établissements × variables (A1, A2) pour le noyau vectoriel AN1"""
+    rng = np.random.default_rng(seed)
+    scores_a1 = np.round(rng.uniform(3.0, 10.0, size=(n_sites, n_variables)), 2)
+    scores_a2 = np.round(rng.uniform(1.0, 10.0, size=(n_sites, n_variables)), 2)
+    return scores_a1, scores_a2
+
+def generate_research_document(topic: str, n_sentences: int, rng: random.Random) -> str:
+    """Réponse de recherche synthétique (insights, métriques, texte de remplissage)"""
+    sentences = []
+    for _ in range(n_sentences):
+        kind = rng.random()
+        if kind < 0.3:
+            sentences.append(f"{rng.choice(INSIGHT_PREFIXES)} {rng.choice(INSIGHT_SUBJECTS)} "
+                             f"{rng.choice(INSIGHT_EFFECTS)} in {topic.replace('_', ' ')}.")
+        elif kind < 0.5:
+            metric = rng.choice(METRIC_TEMPLATES).format(v=rng.randint(5, 80))
+            sentences.append(f"Programs reported a {metric} after twelve months.")
+        else:
+            sentences.append(FILLER)
+    return " ".join(sentences)
+
+def generate_research_corpus(n_documents: int, n_sentences: int = 200, seed: int = 42) -> List[Dict]:
+    """Résultats de recherche au format PerplexityMCPConnector / KnowledgeExtractor"""
+    rng = random.Random(seed)
+    topics = [f"behavioral_safety_topic_{i}" for i in range(max(1, n_documents // 5))]
+    corpus = []
+    
+    for i in range(n_documents):
+        topic = topics[i % len(topics)]
+        corpus.append({
+            "topic": topic,
+            "raw_content": generate_research_document(topic, n_sentences, rng),
+            "sources": [
+                {"title": f"Safety research journal {j}", "url": f"https://university{j}.edu/study"}
+                for j in range(3)
+            ]
+        })
+    
+    return corpus
+
+def generate_extractions(n_extractions: int, insights_per_extraction: int = 5,
+                         distinct_insights: int = 10000, seed: int = 42) -> Iterator[Dict]:
+    """Extractions au format SafetyKnowledgeGraph.add_semantic_knowledge"""
+    rng = random.Random(seed)
+    agents = ["A1", "A2", "A3", "AN1", "AN2", "R1", "R3", "R6", "R10", "SC"]
+    
+    for i in range(n_extractions):
+        yield {
+            "topic": f"behavioral_safety_topic_{i % 100}",
+            "insights": [f"{rng.choice(INSIGHT_SUBJECTS)} finding {rng.randrange(distinct_insights)}"
+                         for _ in range(insights_per_extraction)],
+            "agent_mappings": {agent: "enrichissement" for agent in rng.sample(agents, 3)}
+        }
@@ -3,17 +3,23 @@
 # Analyse écarts entre autoévaluations (A1) et observations terrain (A2)
 # pour identifier zones aveugles culture sécurité
 
-import asyncio
-from typing import Dict, List, Tuple, Optional
-import numpy as np
+import time
+import numbers
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
 import logging
 from datetime import datetime
-import json
 
-# Configuration logger
-logging.basicConfig(level=logging.INFO)
+from metrics import MetricsRegistry, metrics_registry
+
+# numpy chargé au premier calcul (import du module quasi gratuit)
+if TYPE_CHECKING:
+    import numpy as np
+
 logger = logging.getLogger("SafetyAgentic.AN1")
 
+# Série de model_durations pour l'évaluation des facettes, commune aux 12 modèles
+FACETS_SERIES = "facettes"
+
 class AN1AnalysteEcarts:
     """
     Agent AN1 - Analyste des Écarts Culture Sécurité
@@ -26,8 +32,16 @@ class AN1AnalysteEcarts:
     5. Générer recommandations ciblées
     """
     
-    def __init__(self):
-        """Initialisation Agent AN1"""
+    def __init__(self, metrics: Optional[MetricsRegistry] = None,
+                 facet_weights: Optional[Dict[str, Dict[str, float]]] = None):
+        """
+        Initialisation Agent AN1
+        
+        Args:
+            metrics: Registre de métriques (registre partagé par défaut)
+            facet_weights: Facettes HSE {facette: {variable: poids}} ajoutées ou remplaçant
+                les correspondances par défaut (ex. {"tripod": {"audit_securite": 2.0, ...}})
+        """
         self.agent_id = "AN1"
         self.agent_name = "Analyste Écarts"
         self.version = "1.0.0"
@@ -55,6 +69,61 @@ class AN1AnalysteEcarts:
             "eleve": 50,       # Écart 25-50% = critique
             "critique": 100    # Écart > 50% = zone aveugle majeure
         }
+        self.ecart_levels = list(self.ecart_thresholds.keys())
+        
+        # Mapping variables culture → modèles HSE
+        self.hfacs_mapping = {
+            "hfacs_l1": ["leadership_sst", "politique_securite", "ressources_securite"],
+            "hfacs_l2": ["supervision_directe", "formation_superviseurs", "communication_risques"],
+            "hfacs_l3": ["usage_epi", "respect_procedures", "maintenance_equipements"],
+            "hfacs_l4": ["comportements_risque", "erreurs_execution", "violations_regles"]
+        }
+        self.swiss_cheese_barriers = {
+            "barrieres_organisationnelles": ["politique_securite", "formation_securite", "audit_securite"],
+            "barrieres_supervision": ["supervision_directe", "controle_epi", "inspection_equipements"],
+            "barrieres_individuelles": ["competences_securite", "motivation_securite", "perception_risque"],
+            "barrieres_techniques": ["equipements_protection", "systemes_alerte", "maintenance_preventive"]
+        }
+        self.srk_mapping = {
+            "skill": ["competences_techniques", "automatismes_securite", "reflexes_urgence"],
+            "rule": ["respect_procedures", "application_consignes", "suivi_protocoles"],
+            "knowledge": ["comprehension_risques", "analyse_situations", "prise_decision"]
+        }
+        self.bow_tie_barriers = {
+            "barrieres_preventives": {
+                "formation": "formation_securite",
+                "procedures": "respect_procedures",
+                "supervision": "supervision_directe"
+            },
+            "barrieres_protectives": {
+                "epi": "usage_epi",
+                "systemes_urgence": "procedures_urgence",
+                "premiers_secours": "formation_secours"
+            }
+        }
+        
+        # Matrice de poids creuse variables × facettes HSE (un produit pour tous les modèles)
+        self.hse_facets = self._build_hse_facets(facet_weights)
+        self._facet_cache: Dict[Tuple[str, ...], Dict] = {}
+        
+        # Instrumentation par étape (perf_counter)
+        self.metrics = metrics if metrics is not None else metrics_registry
+        self.stage_durations = self.metrics.histogram(
+            "an1_stage_duration_seconds", "Durée des étapes de traitement AN1", ("stage",)
+        )
+        self.model_durations = self.metrics.histogram(
+            "an1_hse_model_duration_seconds",
+            "Durée d'application de chaque modèle HSE AN1 (model=\"facettes\": évaluation partagée)", ("model",)
+        )
+        # Séries pré-liées (chemin chaud sans résolution d'étiquettes)
+        self._stage_series = {
+            stage: self.stage_durations.labels(stage=stage)
+            for stage in ("validation", "gaps", "hse_models", "blind_spots", "realism",
+                          "recommendations", "confidence", "total",
+                          "batch_validation", "batch_blocks", "batch_total")
+        }
+        self._model_series = {code: self.model_durations.labels(model=code) for code in self.hse_models}
+        self._model_series[FACETS_SERIES] = self.model_durations.labels(model=FACETS_SERIES)
         
         logger.info(f"🤖 Agent {self.agent_id} ({self.agent_name}) initialisé")
     
@@ -70,62 +139,51 @@ class AN1AnalysteEcarts:
         Returns:
             Dict avec analyse complète des écarts
         """
-        start_time = datetime.now()
+        start_time = time.perf_counter()
         logger.info("🔄 Démarrage traitement Agent AN1")
+        stage = self._stage_series
         
         try:
             # 1. Validation données d'entrée
-            self._validate_input_data(data_a1, data_a2)
+            with stage["validation"].time():
+                self._validate_input_data(data_a1, data_a2)
             logger.info("✅ Validation des données d'entrée réussie")
             
             # 2. Calcul écarts variables culture SST
-            ecarts_variables = self._calculate_culture_gaps(data_a1, data_a2)
+            with stage["gaps"].time():
+                ecarts_variables = self._calculate_culture_gaps(data_a1, data_a2)
             
-            # 3. Application des 12 modèles HSE
-            analysis_hse = self._apply_hse_models(ecarts_variables, context)
+            # 3. Application des 12 modèles HSE (durée par modèle dans model_durations)
+            with stage["hse_models"].time():
+                analysis_hse = self._apply_hse_models(ecarts_variables, context)
             
             # 4. Identification zones aveugles
-            zones_aveugles = self._identify_blind_spots(ecarts_variables)
+            with stage["blind_spots"].time():
+                zones_aveugles = self._identify_blind_spots(ecarts_variables)
             
             # 5. Calcul scores réalisme culturel
-            realisme_scores = self._calculate_realism_scores(data_a1, data_a2)
+            with stage["realism"].time():
+                realisme_scores = self._calculate_realism_scores(data_a1, data_a2)
             
             # 6. Génération recommandations ciblées
-            recommendations = self._generate_targeted_recommendations(
-                ecarts_variables, zones_aveugles, analysis_hse
-            )
+            with stage["recommendations"].time():
+                recommendations = self._generate_targeted_recommendations(
+                    ecarts_variables, zones_aveugles, analysis_hse
+                )
             
             # 7. Calcul métriques performance
-            performance_time = (datetime.now() - start_time).total_seconds()
-            confidence_score = self._calculate_confidence_score(ecarts_variables)
+            with stage["confidence"].time():
+                confidence_score = self._calculate_confidence_score(ecarts_variables)
+            performance_time = time.perf_counter() - start_time
+            stage["total"].observe(performance_time)
             
             logger.info(f"📊 Performance AN1: {performance_time:.2f}s, confidence: {confidence_score:.2f}")
             
             # 8. Construction résultat final
-            result = {
-                "agent_info": {
-                    "agent_id": self.agent_id,
-                    "agent_name": self.agent_name,
-                    "version": self.version,
-                    "timestamp": datetime.now().isoformat(),
-                    "performance_time": performance_time,
-                    "confidence_score": confidence_score
-                },
-                "ecarts_analysis": {
-                    "ecarts_variables": ecarts_variables,
-                    "zones_aveugles": zones_aveugles,
-                    "realisme_scores": realisme_scores,
-                    "nombre_ecarts_critiques": len([e for e in ecarts_variables.values() if e.get("niveau") == "critique"])
-                },
-                "hse_models_analysis": analysis_hse,
-                "recommendations": recommendations,
-                "summary": {
-                    "ecart_moyen": np.mean([e.get("pourcentage", 0) for e in ecarts_variables.values()]),
-                    "variables_critiques": len(zones_aveugles),
-                    "actions_recommandees": len(recommendations),
-                    "priorite_intervention": self._determine_intervention_priority(zones_aveugles)
-                }
-            }
+            result = self._build_result(
+                ecarts_variables, analysis_hse, zones_aveugles, realisme_scores,
+                recommendations, performance_time, confidence_score
+            )
             
             logger.info(f"✅ Agent AN1 terminé - Score confiance: {confidence_score:.2f}")
             return result
@@ -133,7 +191,187 @@ class AN1AnalysteEcarts:
         except Exception as e:
             logger.error(f"❌ Erreur Agent AN1: {str(e)}")
             return {"error": str(e), "agent_id": self.agent_id}
-    
+
+    def _build_result(self, ecarts_variables: Dict, analysis_hse: Dict, zones_aveugles: List,
+                      realisme_scores: Dict, recommendations: List, performance_time: float,
+                      confidence_score: float, ecart_moyen: Optional[float] = None) -> Dict:
+        """Construction du résultat AN1 (commun au traitement unitaire et par lot)"""
+        import numpy as np
+
+        if ecart_moyen is None:
+            ecart_moyen = np.mean([e.get("pourcentage", 0) for e in ecarts_variables.values()])
+
+        return {
+            "agent_info": {
+                "agent_id": self.agent_id,
+                "agent_name": self.agent_name,
+                "version": self.version,
+                "timestamp": datetime.now().isoformat(),
+                "performance_time": performance_time,
+                "confidence_score": confidence_score
+            },
+            "ecarts_analysis": {
+                "ecarts_variables": ecarts_variables,
+                "zones_aveugles": zones_aveugles,
+                "realisme_scores": realisme_scores,
+                "nombre_ecarts_critiques": len([e for e in ecarts_variables.values() if e.get("niveau") == "critique"])
+            },
+            "hse_models_analysis": analysis_hse,
+            "recommendations": recommendations,
+            "summary": {
+                "ecart_moyen": ecart_moyen,
+                "variables_critiques": len(zones_aveugles),
+                "actions_recommandees": len(recommendations),
+                "priorite_intervention": self._determine_intervention_priority(zones_aveugles)
+            }
+        }
+
+    async def process_batch(self, pairs: List[Tuple[Dict, Dict]], context: Dict = None) -> List[Dict]:
+        """
+        Traitement par lot: analyser écarts A1 vs A2 pour plusieurs établissements
+
+        Les scores sont regroupés par disposition de variables (mêmes variables
+        communes, même ordre) puis empilés en matrices NumPy établissements × variables.
+        Écarts, niveaux, directions et agrégats HFACS/Swiss Cheese/SRK/Bow-Tie sont
+        calculés par opérations vectorielles; chaque résultat est identique à celui
+        de process() pour la même paire (hors timestamp et performance_time).
+        Un établissement invalide (champ manquant, score non numérique...) reçoit
+        l'erreur que process() retournerait, sans affecter le reste de son bloc.
+
+        Args:
+            pairs: Liste de paires (data_a1, data_a2), une par établissement
+            context: Contexte commun incident/secteur/organisation
+
+        Returns:
+            Liste de résultats au format process(), dans l'ordre des paires
+        """
+        start_time = time.perf_counter()
+        logger.info(f"🔄 Démarrage traitement par lot Agent AN1 - {len(pairs)} établissements")
+
+        results: List[Optional[Dict]] = [None] * len(pairs)
+        layouts: Dict[Tuple[str, ...], List[int]] = {}
+        rows: List[Optional[Tuple[List, List]]] = [None] * len(pairs)
+
+        # 1. Validation, lecture des scores et regroupement par disposition de variables
+        # (un établissement invalide est écarté de son bloc, comme process() le rejetterait)
+        stage_start = time.perf_counter()
+        for index, (data_a1, data_a2) in enumerate(pairs):
+            try:
+                self._validate_input_data(data_a1, data_a2)
+                layout = tuple(self._common_variables(data_a1, data_a2))
+                vars_a1 = data_a1["variables_culture_sst"]
+                vars_a2 = data_a2["variables_culture_terrain"]
+                scores = [self._variable_scores(vars_a1, vars_a2, v) for v in layout]
+            except Exception as e:
+                logger.error(f"❌ Erreur Agent AN1: {str(e)}")
+                results[index] = {"error": str(e), "agent_id": self.agent_id}
+                continue
+
+            rows[index] = ([a1 for a1, _ in scores], [a2 for _, a2 in scores])
+            layouts.setdefault(layout, []).append(index)
+
+        self._stage_series["batch_validation"].observe(time.perf_counter() - stage_start)
+
+        # 2. Calcul vectoriel par bloc dense
+        stage_start = time.perf_counter()
+        for layout, indices in layouts.items():
+            try:
+                block = self._process_block(layout, [pairs[i] for i in indices], [rows[i] for i in indices], context)
+            except Exception as e:
+                logger.error(f"❌ Erreur Agent AN1 (lot): {str(e)}")
+                block = [{"error": str(e), "agent_id": self.agent_id} for _ in indices]
+
+            for index, result in zip(indices, block):
+                results[index] = result
+
+        self._stage_series["batch_blocks"].observe(time.perf_counter() - stage_start)
+
+        # 3. Temps amorti par établissement
+        performance_time = time.perf_counter() - start_time
+        self._stage_series["batch_total"].observe(performance_time)
+        per_site_time = performance_time / len(pairs) if pairs else 0.0
+        for result in results:
+            if "agent_info" in result:
+                result["agent_info"]["performance_time"] = per_site_time
+
+        logger.info(f"✅ Lot AN1 terminé - {len(pairs)} établissements, {len(layouts)} dispositions, {performance_time:.2f}s")
+        return results
+
+    def _process_block(self, layout: Tuple[str, ...], pairs: List[Tuple[Dict, Dict]],
+                       rows: List[Tuple[List, List]], context: Dict = None) -> List[Dict]:
+        """
+        Analyse vectorielle d'un bloc d'établissements partageant la même disposition
+
+        rows: scores (A1, A2) déjà validés par établissement, dans l'ordre de layout
+        """
+        import numpy as np
+
+        n_sites = len(pairs)
+
+        # Matrices établissements × variables
+        scores_a1 = np.array([row_a1 for row_a1, _ in rows], dtype=float).reshape(n_sites, len(layout))
+        scores_a2 = np.array([row_a2 for _, row_a2 in rows], dtype=float).reshape(n_sites, len(layout))
+
+        gaps = self._calculate_gap_arrays(scores_a1, scores_a2)
+        hse_batch = self._apply_hse_models_batch(layout, gaps)
+
+        pourcentages = gaps["pourcentage"]
+        if layout:
+            ecarts_moyens = pourcentages.mean(axis=1)
+            coherences = (1 - (pourcentages / 100)).mean(axis=1)
+        else:
+            ecarts_moyens = np.full(n_sites, np.nan)
+            coherences = None
+
+        # Conversion en structures par établissement (format process())
+        ecarts_absolus = gaps["ecart_absolu"].tolist()
+        pourcentages_list = pourcentages.tolist()
+        niveaux = gaps["niveau"].tolist()
+        surestimations = gaps["surestimation"].tolist()
+
+        results = []
+        for site, (data_a1, data_a2) in enumerate(pairs):
+            # Erreur propre à un établissement (ex. scores globaux A1/A2): lui seul est en erreur
+            try:
+                vars_a1 = data_a1["variables_culture_sst"]
+                vars_a2 = data_a2["variables_culture_terrain"]
+
+                ecarts_variables = {}
+                for col, variable in enumerate(layout):
+                    ecarts_variables[variable] = {
+                        "score_autoeval": vars_a1[variable].get("score", 0),
+                        "score_terrain": vars_a2[variable].get("score", 0),
+                        "ecart_absolu": ecarts_absolus[site][col],
+                        "pourcentage": pourcentages_list[site][col],
+                        "niveau": self.ecart_levels[niveaux[site][col]],
+                        "direction": "surestimation" if surestimations[site][col] else "sous_estimation",
+                        "variable_source_a1": vars_a1[variable].get("source", "unknown"),
+                        "variable_source_a2": vars_a2[variable].get("source", "unknown")
+                    }
+
+                analysis_hse = hse_batch[site]
+                zones_aveugles = self._identify_blind_spots(ecarts_variables)
+                realisme_scores = self._calculate_realism_scores(data_a1, data_a2)
+                recommendations = self._generate_targeted_recommendations(
+                    ecarts_variables, zones_aveugles, analysis_hse
+                )
+
+                if coherences is None:
+                    confidence_score = 0.5
+                else:
+                    completude = min(1.0, len(layout) / 10)
+                    confidence_score = max(0.3, min(0.95, (coherences[site] * 0.7) + (completude * 0.3)))
+
+                results.append(self._build_result(
+                    ecarts_variables, analysis_hse, zones_aveugles, realisme_scores,
+                    recommendations, 0.0, confidence_score, ecart_moyen=ecarts_moyens[site]
+                ))
+            except Exception as e:
+                logger.error(f"❌ Erreur Agent AN1: {str(e)}")
+                results.append({"error": str(e), "agent_id": self.agent_id})
+
+        return results
+
     def _validate_input_data(self, data_a1: Dict, data_a2: Dict):
         """Validation des données A1 et A2"""
         if not data_a1 or not data_a2:
@@ -159,10 +397,9 @@ class AN1AnalysteEcarts:
         vars_a1 = data_a1.get("variables_culture_sst", {})
         vars_a2 = data_a2.get("variables_culture_terrain", {})
         
-        # Analyser chaque variable commune
-        for variable in set(vars_a1.keys()).intersection(set(vars_a2.keys())):
-            score_a1 = vars_a1[variable].get("score", 0)
-            score_a2 = vars_a2[variable].get("score", 0)
+        # Analyser chaque variable commune (ordre A1)
+        for variable in self._common_variables(data_a1, data_a2):
+            score_a1, score_a2 = self._variable_scores(vars_a1, vars_a2, variable)
             
             # Calcul écart relatif
             if score_a1 > 0:
@@ -192,123 +429,291 @@ class AN1AnalysteEcarts:
             }
         
         return ecarts
-    
-    def _apply_hse_models(self, ecarts_variables: Dict, context: Dict = None) -> Dict:
-        """Application des 12 modèles HSE sur les écarts"""
-        hse_analysis = {}
-        
-        for model_code, model_name in self.hse_models.items():
-            if model_code.startswith("hfacs"):
-                analysis = self._apply_hfacs_model(model_code, ecarts_variables, context)
-            elif model_code == "swiss_cheese":
-                analysis = self._apply_swiss_cheese_model(ecarts_variables, context)
-            elif model_code == "srk":
-                analysis = self._apply_srk_model(ecarts_variables, context)
-            elif model_code == "bow_tie":
-                analysis = self._apply_bow_tie_model(ecarts_variables, context)
-            else:
-                # Analyse générique pour autres modèles
-                analysis = self._apply_generic_hse_model(model_code, ecarts_variables, context)
-            
-            hse_analysis[model_code] = {
-                "model_name": model_name,
-                "analysis": analysis,
-                "variables_impliquees": len([v for v in ecarts_variables.keys() if ecarts_variables[v]["niveau"] in ["eleve", "critique"]]),
-                "score_applicabilite": self._calculate_model_applicability(model_code, ecarts_variables)
-            }
-        
-        return hse_analysis
-    
-    def _apply_hfacs_model(self, level: str, ecarts: Dict, context: Dict) -> Dict:
-        """Application modèle HFACS selon niveau"""
-        hfacs_mapping = {
-            "hfacs_l1": ["leadership_sst", "politique_securite", "ressources_securite"],
-            "hfacs_l2": ["supervision_directe", "formation_superviseurs", "communication_risques"],
-            "hfacs_l3": ["usage_epi", "respect_procedures", "maintenance_equipements"],
-            "hfacs_l4": ["comportements_risque", "erreurs_execution", "violations_regles"]
-        }
-        
-        variables_concernees = hfacs_mapping.get(level, [])
-        ecarts_niveau = {v: ecarts[v] for v in variables_concernees if v in ecarts}
-        
-        return {
-            "niveau_hfacs": level,
-            "variables_analysees": len(ecarts_niveau),
-            "ecarts_critiques": len([e for e in ecarts_niveau.values() if e["niveau"] == "critique"]),
-            "score_defaillance": np.mean([e["pourcentage"] for e in ecarts_niveau.values()]) if ecarts_niveau else 0,
-            "actions_recommandees": self._generate_hfacs_actions(level, ecarts_niveau)
-        }
-    
-    def _apply_swiss_cheese_model(self, ecarts: Dict, context: Dict) -> Dict:
-        """Application modèle Swiss Cheese - analyse défaillances barrières"""
-        barrieres = {
-            "barrieres_organisationnelles": ["politique_securite", "formation_securite", "audit_securite"],
-            "barrieres_supervision": ["supervision_directe", "controle_epi", "inspection_equipements"],
-            "barrieres_individuelles": ["competences_securite", "motivation_securite", "perception_risque"],
-            "barrieres_techniques": ["equipements_protection", "systemes_alerte", "maintenance_preventive"]
-        }
-        
-        defaillances = {}
-        for barriere_type, variables in barrieres.items():
-            ecarts_barriere = {v: ecarts[v] for v in variables if v in ecarts}
-            defaillance_score = np.mean([e["pourcentage"] for e in ecarts_barriere.values()]) if ecarts_barriere else 0
-            
-            defaillances[barriere_type] = {
-                "score_defaillance": defaillance_score,
-                "variables_impliquees": list(ecarts_barriere.keys()),
-                "niveau_risque": "high" if defaillance_score > 30 else "medium" if defaillance_score > 15 else "low"
-            }
-        
+
+    @staticmethod
+    def _variable_scores(vars_a1: Dict, vars_a2: Dict, variable: str) -> Tuple[float, float]:
+        """Scores A1/A2 d'une variable commune (ValueError si un score n'est pas numérique)"""
+        score_a1 = vars_a1[variable].get("score", 0)
+        score_a2 = vars_a2[variable].get("score", 0)
+        for score in (score_a1, score_a2):
+            if not isinstance(score, numbers.Real):
+                raise ValueError(f"Score non numérique pour {variable}: {score!r}")
+        return score_a1, score_a2
+
+    def _common_variables(self, data_a1: Dict, data_a2: Dict) -> List[str]:
+        """Variables culture communes A1/A2, dans l'ordre de l'autoévaluation A1"""
+        vars_a1 = data_a1.get("variables_culture_sst", {})
+        vars_a2 = data_a2.get("variables_culture_terrain", {})
+        return [variable for variable in vars_a1 if variable in vars_a2]
+
+    def _calculate_gap_arrays(self, scores_a1: "np.ndarray", scores_a2: "np.ndarray") -> Dict[str, "np.ndarray"]:
+        """Calcul vectoriel des écarts (établissements × variables), mêmes règles que _calculate_culture_gaps"""
+        import numpy as np
+
+        ecart_absolu = np.abs(scores_a1 - scores_a2)
+
+        # Écart relatif, pénalité si A1 <= 0
+        positif = scores_a1 > 0
+        pourcentage = np.abs(scores_a2) * 10
+        np.divide(ecart_absolu, scores_a1, out=pourcentage, where=positif)
+        pourcentage = np.where(positif, pourcentage * 100, pourcentage)
+
+        # Classification niveau: indice dans self.ecart_levels
+        seuils = [self.ecart_thresholds[level] for level in self.ecart_levels[:-1]]
+        niveau = np.searchsorted(seuils, pourcentage, side="right")
+
         return {
-            "defaillances_barrieres": defaillances,
-            "risque_global": max([d["score_defaillance"] for d in defaillances.values()]) if defaillances else 0,
-            "barrieres_critiques": [k for k, v in defaillances.items() if v["niveau_risque"] == "high"]
+            "ecart_absolu": ecart_absolu,
+            "pourcentage": pourcentage,
+            "niveau": niveau,
+            "surestimation": scores_a1 > scores_a2
         }
-    
-    def _apply_srk_model(self, ecarts: Dict, context: Dict) -> Dict:
-        """Application modèle SRK (Skill-Rule-Knowledge)"""
-        srk_mapping = {
-            "skill": ["competences_techniques", "automatismes_securite", "reflexes_urgence"],
-            "rule": ["respect_procedures", "application_consignes", "suivi_protocoles"],
-            "knowledge": ["comprehension_risques", "analyse_situations", "prise_decision"]
+
+    def _build_hse_facets(self, facet_weights: Optional[Dict[str, Dict[str, float]]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Colonnes de la matrice de poids: facette → {variable culture: poids}
+
+        Chaque facette est une moyenne pondérée des écarts (%) de ses variables
+        présentes; les correspondances HFACS/Swiss Cheese/SRK/Bow-Tie fournissent
+        les facettes par défaut (poids 1), surchargées ou complétées par facet_weights.
+        """
+        facets = {level: dict.fromkeys(variables, 1.0) for level, variables in self.hfacs_mapping.items()}
+        for barriere_type, variables in self.swiss_cheese_barriers.items():
+            facets[f"swiss_cheese.{barriere_type}"] = dict.fromkeys(variables, 1.0)
+        for niveau_srk, variables in self.srk_mapping.items():
+            facets[f"srk.{niveau_srk}"] = dict.fromkeys(variables, 1.0)
+        for groupe, barrieres in self.bow_tie_barriers.items():
+            for barriere, variable in barrieres.items():
+                facets[f"bow_tie.{groupe}.{barriere}"] = {variable: 1.0}
+
+        for facet, weights in (facet_weights or {}).items():
+            facets[facet] = dict(weights)
+
+        return facets
+
+    def _facet_index(self, layout: Tuple[str, ...]) -> Dict:
+        """
+        Matrice de poids restreinte à une disposition de variables (format creux ELL)
+
+        Chaque facette garde ses colonnes dans l'ordre de sa définition, complétées
+        par une colonne de bourrage (écart nul, poids nul). Mise en cache par disposition.
+        """
+        index = self._facet_cache.get(layout)
+        if index is not None:
+            return index
+
+        import numpy as np
+
+        columns = {variable: col for col, variable in enumerate(layout)}
+        members = [
+            [(columns[variable], weight) for variable, weight in weights.items() if weight and variable in columns]
+            for weights in self.hse_facets.values()
+        ]
+        width = max([len(m) for m in members] + [1])
+
+        cols = np.full((len(members), width), len(layout), dtype=np.intp)
+        poids = np.zeros((len(members), width))
+        noms = np.full((len(members), width), None, dtype=object)
+        for facet, facet_members in enumerate(members):
+            for slot, (col, weight) in enumerate(facet_members):
+                cols[facet, slot] = col
+                poids[facet, slot] = weight
+                noms[facet, slot] = layout[col]
+
+        index = {
+            "facets": {name: facet for facet, name in enumerate(self.hse_facets)},
+            "cols": cols,
+            "weights": poids,
+            "valid": poids != 0,
+            "totals": poids.sum(axis=1),
+            "counts": (poids != 0).sum(axis=1).tolist(),
+            "names": noms,
+            "members": [[layout[col] for col, _ in facet_members] for facet_members in members]
         }
-        
-        srk_analysis = {}
-        for niveau, variables in srk_mapping.items():
-            ecarts_niveau = {v: ecarts[v] for v in variables if v in ecarts}
-            score_ecart = np.mean([e["pourcentage"] for e in ecarts_niveau.values()]) if ecarts_niveau else 0
-            
-            srk_analysis[niveau] = {
-                "score_ecart": score_ecart,
-                "variables_count": len(ecarts_niveau),
-                "defaillance_principale": max(ecarts_niveau.items(), key=lambda x: x[1]["pourcentage"])[0] if ecarts_niveau else None
-            }
-        
-        return srk_analysis
-    
-    def _apply_bow_tie_model(self, ecarts: Dict, context: Dict) -> Dict:
-        """Application modèle Bow-Tie - barrières préventives vs protectives"""
+
+        if len(self._facet_cache) >= 256:
+            self._facet_cache.clear()
+        self._facet_cache[layout] = index
+        return index
+
+    def _evaluate_facets(self, layout: Tuple[str, ...], pourcentage: "np.ndarray", niveau: "np.ndarray") -> Dict:
+        """
+        Scores de toutes les facettes pour un bloc établissements × variables
+
+        Produit creux écarts × poids (une passe pour toutes les facettes), comptes
+        d'écarts critiques et variable dominante par facette.
+        """
+        import numpy as np
+
+        index = self._facet_index(layout)
+        n_sites, n_variables = pourcentage.shape
+        cols = index["cols"]
+
+        # Colonne de bourrage: écart nul, niveau hors échelle
+        padded = np.zeros((n_sites, n_variables + 1))
+        padded[:, :n_variables] = pourcentage
+        niveaux = np.full((n_sites, n_variables + 1), -1, dtype=niveau.dtype)
+        niveaux[:, :n_variables] = niveau
+
+        # établissements × facettes × colonnes (somme séquentielle dans l'ordre des facettes)
+        gathered = padded[:, cols]
+        sums = (gathered * index["weights"]).sum(axis=2)
+        totals = index["totals"]
+        scores = np.divide(sums, totals, out=np.zeros_like(sums), where=totals > 0)
+
+        critiques = (niveaux[:, cols] == self.ecart_levels.index("critique")).sum(axis=2)
+
+        # Variable dominante: premier maximum dans l'ordre de la facette
+        slots = np.where(index["valid"], gathered, -np.inf).argmax(axis=2)
+        principales = index["names"][np.arange(cols.shape[0]), slots]
+
         return {
-            "barrieres_preventives": {
-                "formation": ecarts.get("formation_securite", {}).get("pourcentage", 0),
-                "procedures": ecarts.get("respect_procedures", {}).get("pourcentage", 0),
-                "supervision": ecarts.get("supervision_directe", {}).get("pourcentage", 0)
-            },
-            "barrieres_protectives": {
-                "epi": ecarts.get("usage_epi", {}).get("pourcentage", 0),
-                "systemes_urgence": ecarts.get("procedures_urgence", {}).get("pourcentage", 0),
-                "premiers_secours": ecarts.get("formation_secours", {}).get("pourcentage", 0)
-            }
+            "index": index,
+            "scores": scores,
+            "critiques": critiques,
+            "principales": principales
         }
+
+    def _apply_hse_models_batch(self, layout: Tuple[str, ...], gaps: Dict[str, "np.ndarray"],
+                                model_series: Optional[Dict] = None) -> List[Dict]:
+        """
+        Application des 12 modèles HSE sur un bloc d'établissements
+
+        Les scores de tous les modèles proviennent d'une seule évaluation des
+        facettes (_evaluate_facets); les modèles génériques lisent leur propre
+        facette si elle est définie, sinon l'écart moyen global.
+
+        model_series: histogrammes par modèle; l'évaluation des facettes est
+        mesurée dans la série FACETS_SERIES, chaque modèle pour l'ensemble du
+        bloc. Aucune mesure sans histogramme.
+        """
+        import numpy as np
+
+        pourcentage = gaps["pourcentage"]
+        niveau = gaps["niveau"]
+        n_sites, n_variables = pourcentage.shape
+        timed = model_series is not None
+
+        if timed:
+            facets_start = time.perf_counter()
+        evaluation = self._evaluate_facets(layout, pourcentage, niveau)
+        if timed:
+            model_series[FACETS_SERIES].observe(time.perf_counter() - facets_start)
+        index = evaluation["index"]
+        facets = index["facets"]
+        counts = index["counts"]
+        members = index["members"]
+
+        # Indicateurs communs à tous les modèles
+        variables_impliquees = (niveau >= self.ecart_levels.index("eleve")).sum(axis=1)
+        total_variables = n_variables if n_variables else 1
+        applicabilite = np.minimum(100, (variables_impliquees / total_variables) * 100 + 20).tolist()
+        variables_impliquees = variables_impliquees.tolist()
+
+        score_global = pourcentage.mean(axis=1).tolist() if n_variables else [0] * n_sites
+        swiss_facets = [facets[f"swiss_cheese.{b}"] for b in self.swiss_cheese_barriers]
+        if swiss_facets:
+            risque_global = evaluation["scores"][:, swiss_facets].max(axis=1).tolist()
+        else:
+            risque_global = [0] * n_sites
+
+        scores = evaluation["scores"].tolist()
+        critiques = evaluation["critiques"].tolist()
+        principales = evaluation["principales"].tolist()
+
+        results: List[Dict] = [{} for _ in range(n_sites)]
+        for model_code, model_name in self.hse_models.items():
+            if timed:
+                model_start = time.perf_counter()
+
+            for site in range(n_sites):
+                site_scores = scores[site]
+                if model_code.startswith("hfacs"):
+                    facet = facets[model_code]
+                    analysis = {
+                        "niveau_hfacs": model_code,
+                        "variables_analysees": counts[facet],
+                        "ecarts_critiques": critiques[site][facet],
+                        "score_defaillance": site_scores[facet],
+                        "actions_recommandees": self._hfacs_actions(model_code, principales[site][facet])
+                    }
+                elif model_code == "swiss_cheese":
+                    defaillances = {}
+                    for barriere_type in self.swiss_cheese_barriers:
+                        facet = facets[f"swiss_cheese.{barriere_type}"]
+                        score = site_scores[facet]
+                        defaillances[barriere_type] = {
+                            "score_defaillance": score,
+                            "variables_impliquees": list(members[facet]),
+                            "niveau_risque": "high" if score > 30 else "medium" if score > 15 else "low"
+                        }
+                    analysis = {
+                        "defaillances_barrieres": defaillances,
+                        "risque_global": risque_global[site],
+                        "barrieres_critiques": [k for k, v in defaillances.items() if v["niveau_risque"] == "high"]
+                    }
+                elif model_code == "srk":
+                    analysis = {}
+                    for niveau_srk in self.srk_mapping:
+                        facet = facets[f"srk.{niveau_srk}"]
+                        analysis[niveau_srk] = {
+                            "score_ecart": site_scores[facet],
+                            "variables_count": counts[facet],
+                            "defaillance_principale": principales[site][facet]
+                        }
+                elif model_code == "bow_tie":
+                    analysis = {
+                        groupe: {
+                            barriere: site_scores[facets[f"bow_tie.{groupe}.{barriere}"]]
+                            for barriere in barrieres
+                        }
+                        for groupe, barrieres in self.bow_tie_barriers.items()
+                    }
+                elif model_code in facets:
+                    # Modèle générique doté de sa propre facette
+                    facet = facets[model_code]
+                    analysis = {
+                        "model_code": model_code,
+                        "variables_analysees": counts[facet],
+                        "score_global": site_scores[facet],
+                        "applicable": True
+                    }
+                else:
+                    analysis = {
+                        "model_code": model_code,
+                        "variables_analysees": n_variables,
+                        "score_global": score_global[site],
+                        "applicable": True
+                    }
+
+                results[site][model_code] = {
+                    "model_name": model_name,
+                    "analysis": analysis,
+                    "variables_impliquees": variables_impliquees[site],
+                    "score_applicabilite": applicabilite[site]
+                }
+
+            if timed:
+                model_series[model_code].observe(time.perf_counter() - model_start)
+
+        return results
     
-    def _apply_generic_hse_model(self, model_code: str, ecarts: Dict, context: Dict) -> Dict:
-        """Analyse générique pour autres modèles HSE"""
-        return {
-            "model_code": model_code,
-            "variables_analysees": len(ecarts),
-            "score_global": np.mean([e["pourcentage"] for e in ecarts.values()]) if ecarts else 0,
-            "applicable": True
+    def _apply_hse_models(self, ecarts_variables: Dict, context: Dict = None) -> Dict:
+        """Application des 12 modèles HSE sur les écarts d'un établissement (bloc d'une ligne)"""
+        import numpy as np
+
+        layout = tuple(ecarts_variables)
+        level_index = {level: i for i, level in enumerate(self.ecart_levels)}
+        gaps = {
+            "pourcentage": np.array(
+                [e["pourcentage"] for e in ecarts_variables.values()], dtype=float
+            ).reshape(1, len(layout)),
+            "niveau": np.array(
+                [level_index[e["niveau"]] for e in ecarts_variables.values()], dtype=np.intp
+            ).reshape(1, len(layout))
         }
+
+        return self._apply_hse_models_batch(layout, gaps, model_series=self._model_series)[0]
     
     def _identify_blind_spots(self, ecarts_variables: Dict) -> List[Dict]:
         """Identification zones aveugles culture sécurité"""
@@ -365,6 +770,8 @@ class AN1AnalysteEcarts:
     
     def _calculate_realism_scores(self, data_a1: Dict, data_a2: Dict) -> Dict:
         """Calcul scores réalisme culturel"""
+        import numpy as np
+
         scores_a1 = data_a1.get("scores_autoeval", {})
         observations_a2 = data_a2.get("observations", {})
         
@@ -439,16 +846,10 @@ class AN1AnalysteEcarts:
         else:
             return "Ressources limitées - Sensibilisation ciblée"
     
-    def _calculate_model_applicability(self, model_code: str, ecarts: Dict) -> float:
-        """Calcul score applicabilité modèle selon écarts"""
-        # Score basé sur nombre variables concernées et niveau écarts
-        variables_critiques = len([e for e in ecarts.values() if e["niveau"] in ["eleve", "critique"]])
-        total_variables = len(ecarts) if ecarts else 1
-        
-        return min(100, (variables_critiques / total_variables) * 100 + 20)
-    
     def _calculate_confidence_score(self, ecarts_variables: Dict) -> float:
         """Calcul score confiance global analyse"""
+        import numpy as np
+
         if not ecarts_variables:
             return 0.5
         
@@ -475,8 +876,8 @@ class AN1AnalysteEcarts:
         else:
             return "FAIBLE"
     
-    def _generate_hfacs_actions(self, level: str, ecarts_niveau: Dict) -> List[str]:
-        """Génération actions HFACS selon niveau"""
+    def _hfacs_actions(self, level: str, variable_critique: Optional[str]) -> List[str]:
+        """Actions HFACS selon niveau et variable la plus critique"""
         actions_map = {
             "hfacs_l1": [
                 "Réviser politique sécurité organisationnelle",
@@ -503,8 +904,7 @@ class AN1AnalysteEcarts:
         base_actions = actions_map.get(level, ["Action générique selon niveau"])
         
         # Personnaliser selon écarts détectés
-        if ecarts_niveau:
-            variable_critique = max(ecarts_niveau.items(), key=lambda x: x[1]["pourcentage"])[0]
+        if variable_critique:
             base_actions.append(f"Focus prioritaire sur: {variable_critique}")
         
         return base_actions[:3]  # Max 3 actions par niveau
@@ -597,6 +997,11 @@ async def test_an1_analyste_ecarts():
     print(f"  • Actions recommandées: {result['summary']['actions_recommandees']}")
     print(f"  • Priorité intervention: {result['summary']['priorite_intervention']}")
     
+    # Durées par étape
+    print(f"\n⏱️ DURÉES PAR ÉTAPE:")
+    for series, stats in agent_an1.stage_durations.summary().items():
+        print(f"  - {series}: {stats['mean'] * 1000:.3f}ms")
+    
     print(f"\n✅ Test Agent AN1 terminé avec succès!")
     print(f"⏱️ Performance: {result['agent_info']['performance_time']:.3f}s")
     return result
@@ -604,4 +1009,5 @@ async def test_an1_analyste_ecarts():
 # Exécution test si script appelé directement
 if __name__ == "__main__":
     import asyncio
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(test_an1_analyste_ecarts())
\ No newline at end of file
@@ -0,0 +1,263 @@
+# Suivi temporel AN1 - Écarts A1/A2 par période
+# ===========================================
+# Statistiques glissantes par établissement et variable culture SST,
+# mises à jour en O(1) à chaque période d'évaluation (EWMA, variance,
+# tendance, comptes par niveau d'écart) sans retraiter l'historique
+
+import math
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger("SafetyAgentic.AN1.Tracker")
+
+# Niveaux d'écart AN1 (ordre de AN1AnalysteEcarts.ecart_thresholds)
+GAP_LEVELS = ("faible", "modere", "eleve", "critique")
+
+# Variation d'écart (points de % par période) en deçà de laquelle la tendance est stable
+TREND_TOLERANCE = 0.5
+
+@dataclass
+class GapStatistics:
+    """Statistiques glissantes d'une variable culture pour un établissement"""
+    periods: int = 0
+    first_period: Any = None
+    last_period: Any = None
+    last_gap: float = 0.0
+    last_level: Optional[str] = None
+    # Moyenne mobile exponentielle de l'écart (%) et variance exponentielle associée
+    ewma: float = 0.0
+    ewm_variance: float = 0.0
+    # Tendance: EWMA des variations d'une période à l'autre (points de % par période)
+    trend: float = 0.0
+    # Moyenne et somme des carrés des écarts sur tout l'historique (Welford)
+    mean: float = 0.0
+    m2: float = 0.0
+    level_counts: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(GAP_LEVELS, 0))
+
+    def update(self, period: Any, gap_pct: float, level: str, alpha: float):
+        """Intègre une nouvelle période (O(1))"""
+        if self.periods == 0:
+            self.first_period = period
+            self.ewma = gap_pct
+        else:
+            delta = gap_pct - self.last_gap
+            self.trend = delta if self.periods == 1 else alpha * delta + (1 - alpha) * self.trend
+
+            diff = gap_pct - self.ewma
+            increment = alpha * diff
+            self.ewma += increment
+            self.ewm_variance = (1 - alpha) * (self.ewm_variance + diff * increment)
+
+        self.periods += 1
+        welford_delta = gap_pct - self.mean
+        self.mean += welford_delta / self.periods
+        self.m2 += welford_delta * (gap_pct - self.mean)
+
+        self.level_counts[level] = self.level_counts.get(level, 0) + 1
+        self.last_period = period
+        self.last_gap = gap_pct
+        self.last_level = level
+
+    @property
+    def variance(self) -> float:
+        """Variance (échantillon) de l'écart sur tout l'historique"""
+        return self.m2 / (self.periods - 1) if self.periods > 1 else 0.0
+
+    @property
+    def drift_score(self) -> float:
+        """Écart de l'EWMA à la moyenne historique, en écarts-types"""
+        std = math.sqrt(self.variance)
+        return (self.ewma - self.mean) / std if std > 0 else 0.0
+
+class AN1GapTracker:
+    """
+    Suivi incrémental des écarts AN1 par établissement et période
+
+    Chaque période est intégrée en O(1) par variable; tendances et dérives
+    se lisent directement dans l'état, quel que soit l'historique.
+    """
+
+    def __init__(self, alpha: float = 0.3, agent=None):
+        """
+        Args:
+            alpha: Poids de la dernière période dans les moyennes exponentielles (0 < alpha <= 1)
+            agent: AN1AnalysteEcarts utilisé pour calculer les écarts depuis A1/A2 bruts
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"alpha doit être dans ]0, 1]: {alpha}")
+
+        self.alpha = alpha
+        self.agent = agent
+        self.stats: Dict[Hashable, Dict[str, GapStatistics]] = {}
+        self.last_periods: Dict[Hashable, Any] = {}
+
+    # ===================================================================
+    # MISE À JOUR
+    # ===================================================================
+
+    def update(self, site_id: Hashable, period: Any, ecarts_variables: Dict[str, Dict]) -> int:
+        """
+        Intègre les écarts d'une période (format ecarts_analysis.ecarts_variables)
+
+        Les périodes d'un établissement doivent être strictement croissantes.
+        La période est intégrée entièrement ou pas du tout: toutes les
+        variables sont lues et validées avant la moindre mise à jour.
+
+        Returns:
+            Nombre de variables mises à jour
+        """
+        last_period = self.last_periods.get(site_id)
+        if last_period is not None and not period > last_period:
+            raise ValueError(f"Période {period!r} non postérieure à {last_period!r} pour {site_id!r}")
+
+        entries = []
+        for variable, ecart in ecarts_variables.items():
+            try:
+                gap_pct, level = float(ecart["pourcentage"]), ecart["niveau"]
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Écart invalide pour {variable!r} ({site_id!r}): {e!r}") from e
+            if level not in GAP_LEVELS:
+                raise ValueError(f"Niveau d'écart inconnu pour {variable!r} ({site_id!r}): {level!r}")
+            entries.append((variable, gap_pct, level))
+
+        site_stats = self.stats.setdefault(site_id, {})
+        for variable, gap_pct, level in entries:
+            stats = site_stats.get(variable)
+            if stats is None:
+                stats = site_stats[variable] = GapStatistics()
+            stats.update(period, gap_pct, level, self.alpha)
+
+        self.last_periods[site_id] = period
+        return len(ecarts_variables)
+
+    def update_from_result(self, site_id: Hashable, period: Any, result: Dict) -> int:
+        """Intègre un résultat AN1AnalysteEcarts.process() / process_batch()"""
+        if "error" in result:
+            raise ValueError(f"Résultat AN1 en erreur pour {site_id!r}: {result['error']}")
+        return self.update(site_id, period, result["ecarts_analysis"]["ecarts_variables"])
+
+    def observe(self, site_id: Hashable, period: Any, data_a1: Dict, data_a2: Dict) -> int:
+        """Calcule les écarts A1/A2 d'une période (sans analyse HSE complète) et les intègre"""
+        if self.agent is None:
+            from an1_analyste_ecarts import AN1AnalysteEcarts
+            self.agent = AN1AnalysteEcarts()
+
+        self.agent._validate_input_data(data_a1, data_a2)
+        return self.update(site_id, period, self.agent._calculate_culture_gaps(data_a1, data_a2))
+
+    def update_batch(self, period: Any, results: Dict[Hashable, Dict]) -> Dict[Hashable, str]:
+        """
+        Intègre une période pour plusieurs établissements {site_id: résultat AN1}
+
+        Returns:
+            Erreurs par établissement (les autres établissements sont intégrés)
+        """
+        errors = {}
+        for site_id, result in results.items():
+            try:
+                self.update_from_result(site_id, period, result)
+            except (ValueError, KeyError) as e:
+                errors[site_id] = str(e)
+
+        if errors:
+            logger.warning(f"⚠️ Suivi AN1 période {period}: {len(errors)} établissement(s) ignoré(s)")
+        return errors
+
+    # ===================================================================
+    # REQUÊTES (O(1) par variable)
+    # ===================================================================
+
+    def get_statistics(self, site_id: Hashable, variable: str) -> Optional[GapStatistics]:
+        return self.stats.get(site_id, {}).get(variable)
+
+    def trend(self, site_id: Hashable, variable: str) -> Dict:
+        """Tendance courante d'une variable"""
+        stats = self.get_statistics(site_id, variable)
+        if stats is None:
+            return {}
+
+        if stats.trend > TREND_TOLERANCE:
+            direction = "degradation"   # Écart A1/A2 qui se creuse
+        elif stats.trend < -TREND_TOLERANCE:
+            direction = "amelioration"
+        else:
+            direction = "stable"
+
+        return {
+            "variable": variable,
+            "periods": stats.periods,
+            "last_period": stats.last_period,
+            "last_gap": stats.last_gap,
+            "last_level": stats.last_level,
+            "ewma": stats.ewma,
+            "ewm_std": math.sqrt(stats.ewm_variance),
+            "mean": stats.mean,
+            "std": math.sqrt(stats.variance),
+            "trend_per_period": stats.trend,
+            "direction": direction,
+            "drift_score": stats.drift_score,
+            "level_counts": dict(stats.level_counts)
+        }
+
+    def drifting_variables(self, site_id: Hashable, threshold: float = 2.0,
+                           min_periods: int = 4) -> List[Tuple[str, float]]:
+        """Variables dont l'EWMA s'écarte de la moyenne historique de plus de `threshold` écarts-types"""
+        drifting = [
+            (variable, stats.drift_score)
+            for variable, stats in self.stats.get(site_id, {}).items()
+            if stats.periods >= min_periods and abs(stats.drift_score) >= threshold
+        ]
+        return sorted(drifting, key=lambda item: abs(item[1]), reverse=True)
+
+    def site_summary(self, site_id: Hashable) -> Dict:
+        """Synthèse d'un établissement: EWMA moyenne, variables en dégradation, niveaux courants"""
+        site_stats = self.stats.get(site_id, {})
+        trends = {variable: self.trend(site_id, variable) for variable in site_stats}
+        current_levels = dict.fromkeys(GAP_LEVELS, 0)
+        for stats in site_stats.values():
+            if stats.last_level is not None:
+                current_levels[stats.last_level] = current_levels.get(stats.last_level, 0) + 1
+
+        return {
+            "site_id": site_id,
+            "last_period": self.last_periods.get(site_id),
+            "variables": len(site_stats),
+            "ewma_moyen": sum(s.ewma for s in site_stats.values()) / len(site_stats) if site_stats else 0.0,
+            "variables_en_degradation": [v for v, t in trends.items() if t["direction"] == "degradation"],
+            "variables_en_amelioration": [v for v, t in trends.items() if t["direction"] == "amelioration"],
+            "niveaux_courants": current_levels,
+            "derives": self.drifting_variables(site_id)
+        }
+
+    # ===================================================================
+    # PERSISTANCE
+    # ===================================================================
+
+    def to_dict(self) -> Dict:
+        """État sérialisable (JSON si identifiants et périodes le sont)"""
+        return {
+            "alpha": self.alpha,
+            "sites": [
+                {
+                    "site_id": site_id,
+                    "last_period": self.last_periods.get(site_id),
+                    "variables": {variable: asdict(stats) for variable, stats in site_stats.items()}
+                }
+                for site_id, site_stats in self.stats.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict, agent=None) -> "AN1GapTracker":
+        """Restaure un suivi depuis to_dict()"""
+        tracker = cls(alpha=state["alpha"], agent=agent)
+        for site in state["sites"]:
+            site_id = site["site_id"]
+            if isinstance(site_id, list):
+                site_id = tuple(site_id)  # Identifiants composés passés par JSON
+            tracker.stats[site_id] = {
+                variable: GapStatistics(**values) for variable, values in site["variables"].items()
+            }
+            tracker.last_periods[site_id] = site["last_period"]
+        return tracker
@@ -0,0 +1,352 @@
+# Orchestrateur AN1 multi-établissements
+# ===========================================
+# Répartit les analyses AN1 (CPU) sur un pool de processus par paquets
+# d'établissements, restitue les résultats au fil de l'eau avec isolation
+# des erreurs et suivi de progression
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import (Any, AsyncIterator, Callable, Deque, Dict, Hashable, Iterable, Iterator,
+                    List, Optional, Tuple)
+
+logger = logging.getLogger("SafetyAgentic.AN1.Orchestrator")
+
+# Établissement à analyser: (identifiant, données A1, données A2)
+SiteInput = Tuple[Hashable, Dict, Dict]
+
+DEFAULT_CHUNK_SIZE = 64
+# Paquets en vol par processus (le suivant est prêt quand un paquet se termine)
+CHUNKS_PER_WORKER = 2
+PROGRESS_LOG_INTERVAL = 5.0
+
+@dataclass
+class OrchestratorProgress:
+    """Progression d'une analyse multi-établissements"""
+    total: Optional[int] = None
+    completed: int = 0
+    errors: int = 0
+    chunks_done: int = 0
+    chunks_retried: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self) -> float:
+        """Établissements analysés par seconde"""
+        elapsed = self.elapsed
+        return self.completed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Temps restant estimé (secondes), None si le total est inconnu"""
+        if self.total is None or not self.rate:
+            return None
+        return max(0, self.total - self.completed) / self.rate
+
+    def as_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "errors": self.errors,
+            "chunks_done": self.chunks_done,
+            "chunks_retried": self.chunks_retried,
+            "elapsed": self.elapsed,
+            "rate": self.rate,
+            "eta": self.eta
+        }
+
+class AN1Orchestrator:
+    """
+    Analyse AN1 parallèle d'un grand nombre d'établissements
+
+    Les établissements sont regroupés en paquets traités par process_batch()
+    dans les processus du pool (un agent AN1 par processus). Les entrées sont
+    consommées à la demande (au plus CHUNKS_PER_WORKER paquets en vol par
+    processus) et chaque résultat est produit dès que son paquet se termine.
+    Une erreur n'affecte que son établissement. Après l'arrêt brutal d'un
+    processus, les paquets en vol sont relancés seuls puis coupés en deux
+    tant qu'ils échouent: seul l'établissement qui provoque l'arrêt est
+    marqué en erreur (environ log2(chunk_size) + 1 redémarrages du pool
+    par établissement fautif; pas d'autre limite de tentatives).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 facet_weights: Optional[Dict[str, Dict[str, float]]] = None,
+                 executor: Optional[Executor] = None,
+                 progress_interval: float = PROGRESS_LOG_INTERVAL):
+        """
+        Args:
+            max_workers: Processus du pool (tous les cœurs par défaut)
+            chunk_size: Établissements par paquet envoyé à un processus
+            facet_weights: Facettes HSE transmises à chaque agent AN1 (voir AN1AnalysteEcarts)
+            executor: Pool existant (non fermé par l'orchestrateur)
+            progress_interval: Intervalle (s) entre deux journaux de progression
+        """
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size doit être >= 1: {chunk_size}")
+
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.chunk_size = chunk_size
+        self.facet_weights = facet_weights
+        self.progress_interval = progress_interval
+        self.max_in_flight = self.max_workers * CHUNKS_PER_WORKER
+
+        self._executor = executor
+        self._owns_executor = executor is None
+        self.last_progress: Optional[OrchestratorProgress] = None
+        self._last_log = 0.0
+
+    # ===================================================================
+    # CYCLE DE VIE DU POOL
+    # ===================================================================
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.facet_weights,)
+            )
+        return self._executor
+
+    def _restart_executor(self):
+        """Remplace un pool interrompu (processus tué, mémoire épuisée...)"""
+        if not self._owns_executor:
+            raise RuntimeError("Pool externe interrompu")
+        logger.warning("⚠️ Pool AN1 interrompu - redémarrage des processus")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def close(self):
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> "AN1Orchestrator":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ===================================================================
+    # ANALYSE EN FLUX
+    # ===================================================================
+
+    def iter_results(self, sites: Iterable[SiteInput], context: Dict = None,
+                     on_progress: Optional[Callable[[OrchestratorProgress], Any]] = None
+                     ) -> Iterator[Tuple[Hashable, Dict]]:
+        """
+        Produit (identifiant, résultat AN1) dans l'ordre d'achèvement des paquets
+
+        Un résultat en erreur a le format de process(): {"error": ..., "agent_id": "AN1"}.
+        """
+        dispatcher = _Dispatcher(self, sites, context, wrap=lambda future: future)
+
+        try:
+            dispatcher.fill()
+            while dispatcher.pending:
+                done, _ = wait(dispatcher.pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from dispatcher.complete(future, on_progress)
+                dispatcher.fill()
+        finally:
+            dispatcher.close()
+
+    async def stream(self, sites: Iterable[SiteInput], context: Dict = None,
+                     on_progress: Optional[Callable[[OrchestratorProgress], Any]] = None
+                     ) -> AsyncIterator[Tuple[Hashable, Dict]]:
+        """Variante asynchrone de iter_results() (la boucle reste libre pendant les calculs)"""
+        dispatcher = _Dispatcher(self, sites, context, wrap=asyncio.wrap_future)
+
+        try:
+            dispatcher.fill()
+            while dispatcher.pending:
+                done, _ = await asyncio.wait(dispatcher.pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    for item in dispatcher.complete(future, on_progress):
+                        yield item
+                dispatcher.fill()
+        finally:
+            dispatcher.close()
+
+    def run(self, sites: Iterable[SiteInput], context: Dict = None,
+            on_progress: Optional[Callable[[OrchestratorProgress], Any]] = None) -> Dict[Hashable, Dict]:
+        """Analyse complète {identifiant: résultat AN1}"""
+        return dict(self.iter_results(sites, context, on_progress))
+
+    def report(self) -> Dict:
+        """Progression de la dernière analyse"""
+        return self.last_progress.as_dict() if self.last_progress else {}
+
+    def _report(self, progress: OrchestratorProgress,
+                on_progress: Optional[Callable[[OrchestratorProgress], Any]]):
+        if on_progress is not None:
+            on_progress(progress)
+
+        now = time.perf_counter()
+        if now - self._last_log >= self.progress_interval:
+            self._last_log = now
+            total = f"/{progress.total}" if progress.total is not None else ""
+            eta = f", reste ~{progress.eta:.0f}s" if progress.eta is not None else ""
+            logger.info(f"📊 AN1: {progress.completed}{total} établissements "
+                        f"({progress.rate:.0f}/s, {progress.errors} erreurs{eta})")
+
+class _Dispatcher:
+    """
+    Envoi des paquets d'une analyse (commun aux variantes synchrone et asynchrone)
+
+    Après l'arrêt brutal d'un processus, les paquets touchés passent en
+    quarantaine: relancés seuls puis coupés en deux tant qu'ils échouent,
+    jusqu'à isoler l'établissement fautif.
+    """
+
+    def __init__(self, orchestrator: AN1Orchestrator, sites: Iterable[SiteInput],
+                 context: Optional[Dict], wrap: Callable[[Future], Any]):
+        self.orchestrator = orchestrator
+        self.context = context
+        self.wrap = wrap
+        self.chunks = self._chunks(sites, orchestrator.chunk_size)
+        self.pending: Dict[Any, Tuple[List[SiteInput], bool]] = {}
+        self.quarantine: Deque[List[SiteInput]] = deque()
+
+        total = len(sites) if hasattr(sites, "__len__") else None
+        self.progress = orchestrator.last_progress = OrchestratorProgress(total=total)
+        orchestrator._last_log = self.progress.started
+        logger.info(f"🔄 Orchestrateur AN1 - {total if total is not None else '?'} établissements, "
+                    f"{orchestrator.max_workers} processus, paquets de {orchestrator.chunk_size}")
+
+    @staticmethod
+    def _chunks(sites: Iterable[SiteInput], size: int) -> Iterator[List[SiteInput]]:
+        iterator = iter(sites)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def submit(self, chunk: List[SiteInput], quarantined: bool = False):
+        future = self.orchestrator.executor.submit(_analyse_chunk, chunk, self.context)
+        self.pending[self.wrap(future)] = (chunk, quarantined)
+
+    def fill(self):
+        """Complète les paquets en vol (un seul paquet à la fois en quarantaine)"""
+        if self.quarantine:
+            if not self.pending:
+                self.submit(self.quarantine.popleft(), quarantined=True)
+            return
+
+        for chunk in islice(self.chunks, self.orchestrator.max_in_flight - len(self.pending)):
+            self.submit(chunk)
+
+    def complete(self, future, on_progress) -> List[Tuple[Hashable, Dict]]:
+        """Résultats d'un paquet terminé (liste vide si le paquet est relancé)"""
+        entry = self.pending.pop(future, None)
+        if entry is None:
+            return []  # Déjà remis en quarantaine par un redémarrage du pool
+        chunk, quarantined = entry
+        try:
+            results = future.result()
+        except BrokenProcessPool as e:
+            results = self._handle_broken_pool(chunk, quarantined, e)
+            if results is None:
+                return []
+        except Exception as e:
+            # Paquet non transmissible ou erreur hors process_batch: tout le paquet en erreur
+            logger.error(f"❌ Erreur paquet AN1 ({len(chunk)} établissements): {e}")
+            results = _chunk_errors(chunk, str(e))
+
+        progress = self.progress
+        progress.chunks_done += 1
+        progress.completed += len(results)
+        progress.errors += sum(1 for _, result in results if "error" in result)
+        self.orchestrator._report(progress, on_progress)
+        return results
+
+    def _handle_broken_pool(self, chunk: List[SiteInput], quarantined: bool,
+                            error: Exception) -> Optional[List[Tuple[Hashable, Dict]]]:
+        if not self.orchestrator._owns_executor:
+            return _chunk_errors(chunk, f"Processus AN1 interrompu: {error}")
+
+        # Paquet seul en vol: il est fautif
+        if quarantined and len(chunk) == 1:
+            site_id = chunk[0][0]
+            logger.error(f"❌ Établissement {site_id!r}: arrêt brutal du processus AN1")
+            self._restart()
+            return _chunk_errors(chunk, f"Processus AN1 interrompu: {error}")
+
+        if quarantined:
+            middle = len(chunk) // 2
+            self.quarantine.extendleft([chunk[middle:], chunk[:middle]])
+        else:
+            self.quarantine.append(chunk)
+        self.progress.chunks_retried += 1
+        self._restart()
+        return None
+
+    def _restart(self):
+        """Redémarre le pool; les paquets encore en vol passent en quarantaine"""
+        if self.orchestrator._executor is None:
+            return
+        self.orchestrator._restart_executor()
+        for future, (chunk, _) in list(self.pending.items()):
+            future.cancel()
+            self.quarantine.append(chunk)
+            self.progress.chunks_retried += 1
+        self.pending.clear()
+
+    def close(self):
+        for future in self.pending:
+            future.cancel()
+        progress = self.progress
+        logger.info(f"✅ Orchestrateur AN1 terminé - {progress.completed} établissements, "
+                    f"{progress.errors} erreurs, {progress.elapsed:.2f}s")
+
+# ===================================================================
+# FONCTIONS EXÉCUTÉES DANS LES PROCESSUS DU POOL
+# ===================================================================
+
+_worker_agent = None
+
+def _init_worker(facet_weights: Optional[Dict[str, Dict[str, float]]] = None):
+    """Agent AN1 créé une fois par processus; journaux par établissement réduits au minimum"""
+    global _worker_agent
+    from an1_analyste_ecarts import AN1AnalysteEcarts
+
+    logging.getLogger("SafetyAgentic.AN1").setLevel(logging.WARNING)
+    _worker_agent = AN1AnalysteEcarts(facet_weights=facet_weights)
+
+def _run_sync(coroutine):
+    """Exécute une coroutine AN1 (sans attente réelle) hors boucle d'événements"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("Coroutine AN1 suspendue de façon inattendue")
+
+def _analyse_chunk(chunk: List[SiteInput], context: Dict = None) -> List[Tuple[Hashable, Dict]]:
+    """Analyse d'un paquet par process_batch() (erreurs isolées par établissement)"""
+    if _worker_agent is None:
+        _init_worker()
+    agent = _worker_agent
+
+    try:
+        results = _run_sync(agent.process_batch([(a1, a2) for _, a1, a2 in chunk], context))
+    except Exception as e:
+        results = [{"error": str(e), "agent_id": agent.agent_id}] * len(chunk)
+
+    return [(site_id, result) for (site_id, _, _), result in zip(chunk, results)]
+
+def _chunk_errors(chunk: List[SiteInput], message: str) -> List[Tuple[Hashable, Dict]]:
+    return [(site_id, {"error": message, "agent_id": "AN1"}) for site_id, _, _ in chunk]
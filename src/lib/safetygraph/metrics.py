@@ -0,0 +1,182 @@
+# Métriques SafetyAgentic - Registre histogrammes
+# ===========================================
+# Histogrammes de durées par étape (perf_counter monotone) et export
+# au format texte Prometheus (exposition 0.0.4)
+
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# Bornes par défaut (secondes) - étapes AN1 de la microseconde à la seconde
+DEFAULT_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]  # ((nom, valeur), ...) dans l'ordre de label_names
+
+class _Timer:
+    """Chronomètre de bloc (perf_counter) - with series.time()"""
+    __slots__ = ("series", "start")
+    
+    def __init__(self, series: "HistogramSeries"):
+        self.series = series
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.series.observe(time.perf_counter() - self.start)
+        return False
+
+class HistogramSeries:
+    """Série d'un histogramme pour un jeu d'étiquettes (à pré-lier sur les chemins chauds)"""
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+    
+    def __init__(self, buckets: Tuple[float, ...], lock: threading.Lock):
+        self.buckets = buckets
+        # Compteurs non cumulés (dernière case = au-delà de la dernière borne); cumul à l'export
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock
+    
+    def observe(self, value: float):
+        """Enregistrer une observation"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def time(self) -> _Timer:
+        """Chronométrer un bloc (perf_counter)"""
+        return _Timer(self)
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes, une série par jeu d'étiquettes"""
+    
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], HistogramSeries] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, **labels) -> HistogramSeries:
+        """Série associée aux étiquettes (créée au besoin)"""
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Étiquettes attendues pour {self.name}: {self.label_names}, reçues: {tuple(labels)}")
+        key = tuple(str(labels[name]) for name in self.label_names)
+        
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, HistogramSeries(self.buckets, self._lock))
+        return series
+    
+    def observe(self, value: float, **labels):
+        """Enregistrer une observation"""
+        self.labels(**labels).observe(value)
+    
+    def time(self, **labels) -> _Timer:
+        """Chronométrer un bloc (perf_counter): with histogram.time(stage="...")"""
+        return _Timer(self.labels(**labels))
+    
+    def snapshot(self) -> Dict[LabelKey, Dict]:
+        """Copie des séries: compteurs cumulés par borne, somme, nombre"""
+        with self._lock:
+            snapshot = {}
+            for values, series in self._series.items():
+                cumulative, total = [], 0
+                for bucket_count in series.counts[:-1]:
+                    total += bucket_count
+                    cumulative.append(total)
+                key = tuple(zip(self.label_names, values))
+                snapshot[key] = {"buckets": dict(zip(self.buckets, cumulative)),
+                                 "sum": series.sum, "count": series.count}
+            return snapshot
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Résumé lisible par série observée: nombre, total, moyenne"""
+        return {
+            ",".join(f"{k}={v}" for k, v in key) or self.name: {
+                "count": series["count"],
+                "sum": series["sum"],
+                "mean": series["sum"] / series["count"]
+            }
+            for key, series in self.snapshot().items() if series["count"]
+        }
+    
+    def reset(self):
+        """Remettre les séries à zéro (les séries pré-liées restent valides)"""
+        with self._lock:
+            for series in self._series.values():
+                series.counts = [0] * (len(self.buckets) + 1)
+                series.sum = 0.0
+                series.count = 0
+
+class MetricsRegistry:
+    """Registre de métriques exportable au format Prometheus"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+    
+    def histogram(self, name: str, documentation: str, label_names: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Obtenir (ou créer) un histogramme par nom"""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = Histogram(name, documentation, label_names, buckets)
+                self._metrics[name] = metric
+            elif metric.label_names != tuple(label_names):
+                raise ValueError(f"Histogramme {name} déjà enregistré avec étiquettes {metric.label_names}")
+            return metric
+    
+    def get(self, name: str) -> Optional[Histogram]:
+        return self._metrics.get(name)
+    
+    def reset(self):
+        """Remettre à zéro toutes les séries (métriques conservées)"""
+        for metric in list(self._metrics.values()):
+            metric.reset()
+    
+    def to_prometheus(self) -> str:
+        """Export texte Prometheus de toutes les métriques"""
+        lines: List[str] = []
+        
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} histogram")
+            
+            for key, series in sorted(metric.snapshot().items()):
+                for bound, count in series["buckets"].items():
+                    lines.append(f"{metric.name}_bucket{_format_labels(key + (('le', _format_float(bound)),))} {count}")
+                lines.append(f"{metric.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{metric.name}_sum{_format_labels(key)} {_format_float(series['sum'])}")
+                lines.append(f"{metric.name}_count{_format_labels(key)} {series['count']}")
+        
+        return "\n".join(lines) + "\n" if lines else ""
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in key) + "}"
+
+# Registre partagé par défaut
+metrics_registry = MetricsRegistry()
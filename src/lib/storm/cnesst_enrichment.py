@@ -0,0 +1,332 @@
+﻿"""
+CNESST Enrichment - SafetyGraph BehaviorX STORM
+==============================================
+Enrichissement en flux des incidents CNESST (CSV, JSONL, Parquet) par les
+recherches STORM: type d'incident → topics via un index précalculé, charges
+d'enrichissement partagées par référence, sortie JSONL en flux
+"""
+
+import csv
+import json
+import time
+import logging
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+logger = logging.getLogger('CNESSTEnrichment')
+
+# Champs portant le type d'incident (premier champ renseigné retenu)
+INCIDENT_TYPE_FIELDS = (
+    "type_incident", "type_lesion", "typeLesion",
+    "genre_accident", "evenement_accident", "evenementAccident"
+)
+
+# Mots-clés (sans accents, minuscules) du type d'incident → topics STORM
+INCIDENT_KEYWORD_TOPICS = {
+    "chute": ["hazard_identification_behavioral", "safety_critical_behaviors", "near_miss_behavioral_analysis"],
+    "electri": ["safety_critical_behaviors", "risk_perception_psychology", "behavioral_safety_compliance"],
+    "musculo": ["human_factors_analysis", "behavioral_risk_assessment", "training_needs_analysis"],
+    "tms": ["human_factors_analysis", "behavioral_risk_assessment", "training_needs_analysis"],
+    "manutention": ["human_factors_analysis", "behavioral_risk_assessment", "competency_based_training"],
+    "effort": ["human_factors_analysis", "behavioral_risk_assessment"],
+    "machine": ["hazard_identification_behavioral", "behavioral_safety_compliance", "safety_audit_effectiveness"],
+    "coince": ["hazard_identification_behavioral", "behavioral_safety_compliance"],
+    "ecrase": ["hazard_identification_behavioral", "safety_critical_behaviors"],
+    "vehicule": ["risk_perception_psychology", "safety_decision_making", "real_time_safety_monitoring"],
+    "collision": ["risk_perception_psychology", "safety_decision_making"],
+    "brulure": ["hazard_identification_behavioral", "compliance_training_effectiveness"],
+    "chimique": ["hazard_identification_behavioral", "risk_communication_strategies", "compliance_training_effectiveness"],
+    "exposition": ["risk_communication_strategies", "real_time_safety_monitoring"],
+    "coupure": ["safety_critical_behaviors", "behavioral_safety_training"],
+    "violence": ["psychological_safety_workplace", "just_culture_implementation", "listening_safety_concerns"],
+    "psycho": ["psychological_safety_workplace", "listening_safety_concerns"],
+    "harcelement": ["psychological_safety_workplace", "just_culture_implementation"]
+}
+
+# Topics appliqués quand aucun mot-clé ne correspond
+DEFAULT_INCIDENT_TOPICS = ["incident_reporting_culture", "near_miss_behavioral_analysis", "behavioral_safety_outcomes"]
+
+ENRICHMENT_CONFIDENCE = 0.91
+
+def normalize_incident_type(value: Optional[str]) -> str:
+    """Type d'incident sans accents, en minuscules, espaces normalisés"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+def build_enrichment_payload(research_results: Sequence[Dict], timestamp: Optional[str] = None) -> Dict:
+    """Charge storm_enrichment (format enrich_cnesst_data) pour un ensemble de recherches"""
+    recommendations: List[str] = []
+    behavioral: List[str] = []
+    for research in research_results:
+        recommendations.extend(research.get("evidence_based_insights", []))
+        behavioral.extend(research.get("behavioral_applications", []))
+
+    return {
+        "research_topics_applied": [r["topic"] for r in research_results],
+        "evidence_based_recommendations": recommendations,
+        "behavioral_insights": behavioral,
+        "prevention_strategies": [],
+        "enrichment_confidence": ENRICHMENT_CONFIDENCE,
+        "enrichment_timestamp": timestamp or datetime.now().isoformat()
+    }
+
+class IncidentTopicIndex:
+    """
+    Index type d'incident → topics STORM disponibles
+
+    Les règles par mot-clé sont évaluées une seule fois par type distinct
+    (normalisé); les enregistrements suivants du même type sont servis par
+    consultation de dictionnaire.
+    """
+
+    def __init__(self, available_topics: Iterable[str],
+                 keyword_topics: Optional[Dict[str, List[str]]] = None,
+                 default_topics: Optional[List[str]] = None):
+        self.available = set(available_topics)
+        self.keyword_topics = {
+            normalize_incident_type(keyword): topics
+            for keyword, topics in (keyword_topics or INCIDENT_KEYWORD_TOPICS).items()
+        }
+        self.default_topics = tuple(
+            t for t in (default_topics or DEFAULT_INCIDENT_TOPICS) if t in self.available
+        )
+        self._by_type: Dict[str, Tuple[str, ...]] = {}
+        # Valeurs brutes déjà vues (évite la normalisation à chaque enregistrement)
+        self._by_raw: Dict[Optional[str], Tuple[str, ...]] = {}
+
+    def topics_for(self, incident_type: Optional[str]) -> Tuple[str, ...]:
+        """Topics (ordre des règles, sans doublons) d'un type d'incident"""
+        topics = self._by_raw.get(incident_type)
+        if topics is not None:
+            return topics
+
+        key = normalize_incident_type(incident_type)
+        topics = self._by_type.get(key)
+        if topics is None:
+            matched: Dict[str, None] = {}
+            for keyword, keyword_topics in self.keyword_topics.items():
+                if keyword in key:
+                    matched.update((t, None) for t in keyword_topics if t in self.available)
+            topics = self._by_type[key] = tuple(matched) or self.default_topics
+
+        self._by_raw[incident_type] = topics
+        return topics
+
+    @property
+    def distinct_types(self) -> int:
+        return len(self._by_type)
+
+class CNESSTBulkEnricher:
+    """
+    Enrichissement en flux d'incidents CNESST
+
+    Une charge storm_enrichment est construite (et sérialisée) une seule fois
+    par ensemble de topics, puis partagée par référence entre tous les
+    incidents concernés: mémoire bornée par le nombre d'ensembles distincts,
+    pas par le nombre d'incidents.
+    """
+
+    def __init__(self, research_results: Dict[str, Dict], index: Optional[IncidentTopicIndex] = None,
+                 type_fields: Sequence[str] = INCIDENT_TYPE_FIELDS):
+        """
+        Args:
+            research_results: Résultats STORM par topic ({topic: résultat execute_research})
+            index: Index type d'incident → topics (règles par défaut sinon)
+            type_fields: Champs candidats pour le type d'incident
+        """
+        self.research_results = research_results
+        self.index = index or IncidentTopicIndex(research_results)
+        self.type_fields = tuple(type_fields)
+        self.timestamp = datetime.now().isoformat()
+        self._payloads: Dict[Tuple[str, ...], Dict] = {}
+        self._payload_json: Dict[Tuple[str, ...], str] = {}
+        self._encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+        self.stats = {"records": 0, "unmatched": 0, "errors": 0}
+
+    def incident_type(self, incident: Dict) -> Optional[str]:
+        for field in self.type_fields:
+            value = incident.get(field)
+            if value:
+                return value
+        return None
+
+    def payload_for(self, topics: Tuple[str, ...]) -> Dict:
+        """Charge partagée d'un ensemble de topics (même objet pour tous les incidents)"""
+        payload = self._payloads.get(topics)
+        if payload is None:
+            payload = self._payloads[topics] = build_enrichment_payload(
+                [self.research_results[t] for t in topics], self.timestamp
+            )
+        return payload
+
+    def _payload_key(self, incident: Dict) -> Tuple[str, ...]:
+        topics = self.index.topics_for(self.incident_type(incident))
+        if not topics:
+            self.stats["unmatched"] += 1
+        return topics
+
+    def _is_record(self, incident) -> bool:
+        """Enregistrement objet JSON / dict; les autres (liste, scalaire) sont comptés en erreur"""
+        if isinstance(incident, dict):
+            return True
+        self.stats["errors"] += 1
+        logger.warning(f"⚠️ Incident CNESST ignoré (objet attendu, {type(incident).__name__} reçu)")
+        return False
+
+    def enrich(self, incidents: Iterable[Dict]) -> Iterator[Dict]:
+        """Incidents enrichis (copie superficielle, storm_enrichment partagé)"""
+        for incident in incidents:
+            self.stats["records"] += 1
+            if not self._is_record(incident):
+                continue
+            yield {**incident, "storm_enrichment": self.payload_for(self._payload_key(incident))}
+
+    def write_jsonl(self, incidents: Iterable[Dict], output: TextIO, payload_refs: bool = False,
+                    flush_every: int = 1000) -> Dict:
+        """
+        Écrit les incidents enrichis en JSONL au fil de la lecture
+
+        Chaque charge est sérialisée une fois; avec payload_refs=True, chaque ligne
+        ne porte que "storm_enrichment_ref" (clé de payloads() à écrire à part).
+
+        Returns:
+            Statistiques (enregistrements, erreurs, ensembles de topics, débit)
+        """
+        encode = self._encoder.encode
+        buffer: List[str] = []
+        start = time.perf_counter()
+
+        for incident in incidents:
+            self.stats["records"] += 1
+            # Seul un dict s'encode en '{...}' (insertion du champ ci-dessous)
+            if not self._is_record(incident):
+                continue
+            if "storm_enrichment" in incident or "storm_enrichment_ref" in incident:
+                # Ré-enrichissement: l'ancienne charge est remplacée
+                incident = {k: v for k, v in incident.items()
+                            if k not in ("storm_enrichment", "storm_enrichment_ref")}
+            try:
+                line = encode(incident)
+            except (TypeError, ValueError) as e:
+                self.stats["errors"] += 1
+                logger.warning(f"⚠️ Incident CNESST ignoré (non sérialisable): {e}")
+                continue
+
+            topics = self._payload_key(incident)
+            if payload_refs:
+                self.payload_for(topics)
+                enrichment = encode(self.payload_ref(topics))
+                field = '"storm_enrichment_ref": '
+            else:
+                enrichment = self._serialized_payload(topics)
+                field = '"storm_enrichment": '
+
+            # Ajout du champ sans resérialiser la charge: '{...}' → '{..., "storm_enrichment": {...}}'
+            separator = ", " if line != "{}" else ""
+            buffer.append(f"{line[:-1]}{separator}{field}{enrichment}}}\n")
+
+            if len(buffer) >= flush_every:
+                output.write("".join(buffer))
+                buffer.clear()
+
+        if buffer:
+            output.write("".join(buffer))
+
+        return self.report(time.perf_counter() - start)
+
+    def payload_ref(self, topics: Tuple[str, ...]) -> str:
+        return "|".join(topics)
+
+    def payloads(self) -> Dict[str, Dict]:
+        """Charges construites {référence: storm_enrichment}"""
+        return {self.payload_ref(topics): self.payload_for(topics) for topics in self._payloads}
+
+    def _serialized_payload(self, topics: Tuple[str, ...]) -> str:
+        serialized = self._payload_json.get(topics)
+        if serialized is None:
+            serialized = self._payload_json[topics] = self._encoder.encode(self.payload_for(topics))
+        return serialized
+
+    def report(self, elapsed: Optional[float] = None) -> Dict:
+        report = {
+            **self.stats,
+            "distinct_incident_types": self.index.distinct_types,
+            "payloads": len(self._payloads)
+        }
+        if elapsed is not None:
+            report["elapsed"] = elapsed
+            report["records_per_second"] = self.stats["records"] / elapsed if elapsed > 0 else 0.0
+        return report
+
+# ===================================================================
+# LECTURE EN FLUX DES FICHIERS CNESST
+# ===================================================================
+
+def read_incidents(path: str, file_format: Optional[str] = None, batch_size: int = 10000) -> Iterator[Dict]:
+    """
+    Incidents CNESST lus enregistrement par enregistrement
+
+    Args:
+        path: Fichier CSV, JSONL (.jsonl/.ndjson) ou Parquet
+        file_format: "csv", "jsonl" ou "parquet" (déduit de l'extension sinon)
+        batch_size: Lignes par lot Parquet (mémoire bornée)
+    """
+    file_format = (file_format or _format_from_suffix(path)).lower()
+
+    if file_format == "csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from csv.DictReader(f)
+    elif file_format in ("jsonl", "ndjson"):
+        with open(path, encoding="utf-8-sig") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"⚠️ Ligne JSONL {line_number} ignorée ({path}): {e}")
+    elif file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("pyarrow requis pour lire les fichiers Parquet CNESST") from e
+
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Format CNESST non supporté: {file_format}")
+
+def _format_from_suffix(path: str) -> str:
+    suffix = Path(path).suffix.lower().lstrip(".")
+    return {"ndjson": "jsonl", "pq": "parquet"}.get(suffix, suffix)
+
+def enrich_cnesst_file(input_path: str, output_path: str, research_results: Dict[str, Dict],
+                       file_format: Optional[str] = None, index: Optional[IncidentTopicIndex] = None,
+                       payload_refs: bool = False) -> Dict:
+    """
+    Enrichit un fichier CNESST complet vers output_path (JSONL), en mémoire bornée
+
+    Avec payload_refs=True, les charges partagées sont écrites dans
+    <output_path>.payloads.json et chaque ligne n'en porte que la référence.
+    """
+    enricher = CNESSTBulkEnricher(research_results, index=index)
+    logger.info(f"🔄 Enrichissement CNESST en flux: {input_path} → {output_path}")
+
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as output:
+        report = enricher.write_jsonl(read_incidents(input_path, file_format), output, payload_refs=payload_refs)
+
+    if payload_refs:
+        payloads_path = f"{output_path}.payloads.json"
+        with open(payloads_path, "w", encoding="utf-8") as f:
+            json.dump(enricher.payloads(), f, ensure_ascii=False, indent=2)
+        report["payloads_path"] = payloads_path
+
+    logger.info(f"✅ {report['records']} incidents CNESST enrichis ({report['payloads']} charges partagées, "
+                f"{report['records_per_second']:.0f} enr./s)")
+    return report
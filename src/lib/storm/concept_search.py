@@ -0,0 +1,176 @@
+﻿"""
+Concept Search - SafetyGraph BehaviorX STORM
+===========================================
+Index inversé plein texte des concepts du knowledge graph
+Tokenisation FR/EN insensible aux accents, classement BM25, filtres topic/agent
+"""
+
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from insight_dedup import normalize_insight
+
+# numpy chargé à la première recherche (import du module quasi gratuit)
+if TYPE_CHECKING:
+    import numpy as np
+
+# Paramètres BM25 usuels (saturation du tf, normalisation par longueur)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Mots vides français et anglais (forme normalisée, sans accents)
+STOPWORDS = frozenset("""
+    a au aux avec ce ces cet cette dans de des du elle en et est etre eux il ils
+    je la le les leur leurs lui mais me meme mes moi mon ne nos notre nous on ou
+    par pas pour qu que qui sa se ses son sont sur ta te tes toi ton tu un une
+    vos votre vous y d l j n s c m t sans sous entre plus moins tres ete
+    an and are as at be been but by for from has have in into is it its no not
+    of on or so such than that the their them then there these they this those
+    to was were which while will with within
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Termes indexables: sans accents, mots vides retirés, pluriels réguliers repliés"""
+    terms = []
+    for word in normalize_insight(text).split():
+        if word in STOPWORDS:
+            continue
+        # Pluriels réguliers FR/EN (risques → risque, injuries → injury), sauf -ss
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word[-1] == "s" and word[-2] != "s":
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class ConceptSearchIndex:
+    """
+    Index inversé incrémental des concepts (BM25)
+
+    Chaque terme pointe vers deux tableaux compacts (positions des concepts,
+    fréquences) étendus à l'insertion; une requête les lit sans copie via
+    numpy et ne touche que les postings de ses termes. Les filtres topic et
+    agent sont des listes de positions maintenues de la même façon.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.concept_ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._lengths = array("f")
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._topics: Dict[str, array] = {}
+        self._agents: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.concept_ids)
+
+    def __contains__(self, concept_id: str) -> bool:
+        return concept_id in self._positions
+
+    # ===================================================================
+    # INDEXATION
+    # ===================================================================
+
+    def add(self, concept_id: str, content: str) -> bool:
+        """Indexe un concept (ignoré s'il est déjà indexé)"""
+        if concept_id in self._positions:
+            return False
+
+        position = len(self.concept_ids)
+        self._positions[concept_id] = position
+        self.concept_ids.append(concept_id)
+
+        tokens = tokenize(content)
+        self._lengths.append(len(tokens))
+        self._total_length += len(tokens)
+
+        all_postings = self._postings
+        for term, frequency in Counter(tokens).items():
+            postings = all_postings.get(term)
+            if postings is None:
+                postings = all_postings[term] = (array("i"), array("f"))
+            postings[0].append(position)
+            postings[1].append(frequency)
+        return True
+
+    def add_topic(self, concept_id: str, topic: str):
+        """Rattache un concept indexé à un topic (une seule fois par couple)"""
+        self._topics.setdefault(topic, array("i")).append(self._positions[concept_id])
+
+    def add_agent(self, concept_id: str, agent_id: str):
+        """Rattache un concept indexé à un agent (une seule fois par couple)"""
+        self._agents.setdefault(agent_id, array("i")).append(self._positions[concept_id])
+
+    # ===================================================================
+    # RECHERCHE
+    # ===================================================================
+
+    def _filter_positions(self, topic: Optional[str], agent_id: Optional[str]) -> Optional["np.ndarray"]:
+        import numpy as np
+
+        selections = []
+        for key, table in ((topic, self._topics), (agent_id, self._agents)):
+            if key is None:
+                continue
+            positions = table.get(key)
+            if not positions:
+                return np.empty(0, dtype=np.int32)
+            selections.append(np.frombuffer(positions, dtype=np.int32))
+
+        if not selections:
+            return None
+        if len(selections) == 1:
+            return selections[0]
+        return np.intersect1d(*selections, assume_unique=True)
+
+    def search(self, query: str, topic: Optional[str] = None, agent_id: Optional[str] = None,
+               limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Concepts les plus pertinents pour une requête
+
+        Args:
+            query: Texte libre (français ou anglais)
+            topic: Restreint aux concepts de ce topic
+            agent_id: Restreint aux concepts qui enrichissent cet agent (ex. "agent_A1")
+            limit: Nombre maximal de résultats
+
+        Returns:
+            (concept_id, score BM25) par score décroissant
+        """
+        import numpy as np
+
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._postings]
+        if not terms or limit <= 0:
+            return []
+
+        n_docs = len(self.concept_ids)
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        average_length = self._total_length / n_docs
+
+        scores = np.zeros(n_docs, dtype=np.float64)
+        for term in terms:
+            positions, frequencies = self._postings[term]
+            positions = np.frombuffer(positions, dtype=np.int32)
+            frequencies = np.frombuffer(frequencies, dtype=np.float32)
+            df = len(positions)
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            length_norm = self.k1 * (1 - self.b + self.b * lengths[positions] / average_length)
+            scores[positions] += idf * frequencies * (self.k1 + 1) / (frequencies + length_norm)
+
+        candidates = self._filter_positions(topic, agent_id)
+        if candidates is None:
+            candidates = np.flatnonzero(scores)
+        else:
+            candidates = candidates[scores[candidates] > 0]
+        if len(candidates) > limit:
+            # Seuil du limit-ième score: les ex æquo au seuil sont départagés ci-dessous
+            cutoff = -np.partition(-scores[candidates], limit - 1)[limit - 1]
+            candidates = candidates[scores[candidates] >= cutoff]
+
+        # Tri par score décroissant, position (ordre d'insertion) en cas d'égalité
+        order = np.lexsort((candidates, -scores[candidates]))[:limit]
+        return [(self.concept_ids[i], float(scores[i])) for i in candidates[order].tolist()]
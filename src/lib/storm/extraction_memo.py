@@ -0,0 +1,108 @@
+﻿"""
+Extraction Memo - SafetyGraph BehaviorX STORM
+===========================================
+Mémoïsation adressée par contenu des extractions sémantiques
+Niveau mémoire (LRU) + niveau disque (SQLite), compteurs hit/miss
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger('ExtractionMemo')
+
+DEFAULT_MEMO_PATH = Path.home() / ".cache" / "storm" / "semantic_memo.sqlite3"
+
+class ExtractionMemo:
+    """Mémo deux niveaux clé = hash(modèle, topic, contenu tronqué, version prompt)"""
+    
+    def __init__(self, path: Optional[str] = None, memory_size: int = 1024):
+        self.path = Path(path or os.getenv("STORM_MEMO_PATH", DEFAULT_MEMO_PATH))
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conn = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def key(model: str, topic: str, content: str, prompt_version: str) -> str:
+        """Clé SHA-256 des entrées qui déterminent la réponse du modèle"""
+        digest = hashlib.sha256()
+        for part in (model, topic, content, prompt_version):
+            encoded = part.encode("utf-8")
+            digest.update(len(encoded).to_bytes(8, "big"))
+            digest.update(encoded)
+        return digest.hexdigest()
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion SQLite ouverte au premier usage"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_memo ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+    
+    def _remember(self, key: str, value: Dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Cherche en mémoire puis sur disque (promotion en mémoire)"""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return self._memory[key]
+        
+        row = self.conn.execute("SELECT payload FROM semantic_memo WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        
+        value = json.loads(row[0])
+        self._remember(key, value)
+        self.disk_hits += 1
+        return value
+    
+    def set(self, key: str, value: Dict):
+        """Enregistre dans les deux niveaux"""
+        self._remember(key, value)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO semantic_memo VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), time.time())
+        )
+        self.conn.commit()
+    
+    def clear(self):
+        self._memory.clear()
+        self.conn.execute("DELETE FROM semantic_memo")
+        self.conn.commit()
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def stats(self) -> Dict:
+        """Compteurs hit/miss par niveau"""
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / total if total else 0.0
+        }
@@ -0,0 +1,309 @@
+﻿"""
+Insight Dedup - SafetyGraph BehaviorX STORM
+==========================================
+Détection des quasi-doublons d'insights (paraphrases d'un même constat)
+Shingles de caractères + MinHash + LSH par bandes, représentants canoniques
+"""
+
+import re
+import json
+import zlib
+import logging
+import unicodedata
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# numpy chargé à la première signature (import du module quasi gratuit)
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger('InsightDedup')
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_SHINGLE_SIZE = 5
+# Similarité de Jaccard estimée à partir de laquelle deux insights sont fusionnés
+DEFAULT_THRESHOLD = 0.7
+# Insights signés par appel numpy (borne la matrice permutations × shingles)
+SIGNATURE_BATCH = 64
+
+# Hachage multiplicatif h(x) = ((a·x + b) mod 2^64) >> 32, graine fixe (stable entre sessions)
+_SEED = 1729
+_ROLLING_BASE = 0x100000001B3
+_NON_WORD = re.compile(r"[\W_]+")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+
+def normalize_insight(text: str) -> str:
+    """Texte comparable: sans accents, casse repliée, ponctuation → espaces"""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+class NearDuplicateIndex:
+    """
+    Index LSH des insights canoniques
+
+    Chaque insight est réduit à l'ensemble de ses shingles de caractères,
+    résumé par une signature MinHash (num_perm minima de permutations
+    universelles). La signature est découpée en bandes; deux insights
+    partageant une bande sont candidats et fusionnés si leur Jaccard estimée
+    atteint threshold. Seuls les représentants canoniques (premier insight de
+    chaque groupe) sont indexés: une insertion coûte O(bandes + candidats),
+    indépendamment du nombre d'insights déjà vus.
+
+    Les valeurs chiffrées font partie des clés de bandes: « réduit de 40% »
+    et « réduit de 60% » restent deux constats distincts malgré leur proximité.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM,
+                 bands: int = DEFAULT_BANDS, shingle_size: int = DEFAULT_SHINGLE_SIZE):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) doit être un multiple de bands ({bands})")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold doit être dans ]0, 1]: {threshold}")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        self.canonicals: List[str] = []
+        self.topics: List[Dict[str, None]] = []
+        self.counts: List[int] = []
+        self._exact: Dict[str, int] = {}
+        # Clé de bande (entier) → groupe, ou liste de groupes en cas de collision
+        self._buckets: Dict[int, Union[int, List[int]]] = {}
+        self._signatures: Optional["np.ndarray"] = None
+        self._hashing: Optional[Tuple] = None
+        self.stats = {"inserts": 0, "exact_duplicates": 0, "near_duplicates": 0, "candidates_checked": 0}
+
+    def __len__(self) -> int:
+        return len(self.canonicals)
+
+    # ===================================================================
+    # SIGNATURES
+    # ===================================================================
+
+    def _hash_params(self) -> Tuple:
+        if self._hashing is None:
+            import numpy as np
+
+            rng = np.random.default_rng(_SEED)
+            full = np.iinfo(np.uint64).max
+            self._hashing = (
+                rng.integers(0, full, size=self.num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1),
+                rng.integers(0, full, size=self.num_perm, dtype=np.uint64, endpoint=True),
+                # Multiplicateurs par bande (clés distinctes d'une bande à l'autre)
+                rng.integers(0, full, size=(self.bands, self.rows), dtype=np.uint64, endpoint=True) | np.uint64(1),
+                np.array([_ROLLING_BASE ** j % (1 << 64) for j in range(self.shingle_size)], dtype=np.uint64)
+            )
+        return self._hashing
+
+    def signatures(self, normalized_texts: Sequence[str]) -> "np.ndarray":
+        """Signatures MinHash (textes × num_perm, uint32) de textes normalisés"""
+        import numpy as np
+        from numpy.lib.stride_tricks import sliding_window_view
+
+        a, b, _, powers = self._hash_params()
+        k = self.shingle_size
+        result = np.empty((len(normalized_texts), self.num_perm), dtype=np.uint32)
+
+        for start in range(0, len(normalized_texts), SIGNATURE_BATCH):
+            # Textes plus courts qu'un shingle complétés par des zéros (un seul shingle)
+            padded = [text.ljust(k, "\0") for text in normalized_texts[start:start + SIGNATURE_BATCH]]
+            codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+            offsets = np.zeros(len(padded), dtype=np.int64)
+            np.cumsum([len(text) for text in padded[:-1]], out=offsets[1:])
+
+            # Empreinte polynomiale de chaque fenêtre de k caractères (modulo 2^64)
+            windows = sliding_window_view(codes, k) @ powers
+            windows ^= windows >> np.uint64(29)
+
+            # Fenêtres à cheval sur deux textes exclues
+            valid = np.ones(len(windows), dtype=bool)
+            for shift in range(1, k):
+                valid[offsets[1:] - shift] = False
+            kept = np.flatnonzero(valid)
+            segments = np.searchsorted(kept, offsets)
+
+            hashed = (np.outer(a, windows[kept]) + b[:, None]) >> np.uint64(32)
+            result[start:start + len(padded)] = np.minimum.reduceat(hashed, segments, axis=1).T
+
+        return result
+
+    def _band_keys(self, signatures: "np.ndarray", normalized_texts: Sequence[str]) -> List[List[int]]:
+        """Clés entières des bandes, valeurs chiffrées du texte incluses"""
+        import numpy as np
+
+        _, _, band_multipliers, _ = self._hash_params()
+        numbers = np.array(
+            [zlib.crc32(",".join(sorted(set(_NUMBER.findall(text)))).encode("ascii")) for text in normalized_texts],
+            dtype=np.uint64
+        )
+        bands = signatures.reshape(len(signatures), self.bands, self.rows)
+        keys = (bands * band_multipliers).sum(axis=2, dtype=np.uint64)
+        keys ^= numbers[:, None] * np.uint64(_ROLLING_BASE)
+        return keys.tolist()
+
+    def similarity(self, first: str, second: str) -> float:
+        """Jaccard estimée entre deux insights"""
+        first_sig, second_sig = self.signatures([normalize_insight(first), normalize_insight(second)])
+        return float((first_sig == second_sig).mean())
+
+    # ===================================================================
+    # INSERTION / RECHERCHE
+    # ===================================================================
+
+    def _best_candidate(self, signature: "np.ndarray", keys: List[int]) -> Tuple[Optional[int], set]:
+        """Meilleur groupe candidat au-dessus du seuil, et clés de bandes déjà occupées"""
+        # Intersection en C: la plupart des insights nouveaux n'occupent aucune bande connue
+        occupied = self._buckets.keys() & keys
+        if not occupied:
+            return None, occupied
+
+        candidates: Dict[int, None] = {}
+        for key in occupied:
+            bucket = self._buckets[key]
+            if isinstance(bucket, int):
+                candidates[bucket] = None
+            else:
+                candidates.update(dict.fromkeys(bucket))
+        candidates = list(candidates)
+
+        self.stats["candidates_checked"] += len(candidates)
+        scores = (self._signatures[candidates] == signature).mean(axis=1)
+        best = int(scores.argmax())
+        return (candidates[best] if scores[best] >= self.threshold else None), occupied
+
+    def _insert(self, text: str, signature: "np.ndarray", keys: List[int], occupied: set) -> int:
+        import numpy as np
+
+        group = len(self.canonicals)
+        self.canonicals.append(" ".join(text.split()))
+        self.topics.append({})
+        self.counts.append(0)
+
+        # Signatures canoniques dans une matrice contiguë (capacité doublée au besoin)
+        if self._signatures is None or group == len(self._signatures):
+            grown = np.empty((max(64, 2 * group), self.num_perm), dtype=np.uint32)
+            if self._signatures is not None:
+                grown[:group] = self._signatures
+            self._signatures = grown
+        self._signatures[group] = signature
+
+        # Bandes libres remplies d'un bloc, bandes partagées converties en listes
+        shared = {key: self._buckets[key] for key in occupied}
+        self._buckets.update(dict.fromkeys(keys, group))
+        for key, bucket in shared.items():
+            if isinstance(bucket, int):
+                self._buckets[key] = [bucket, group]
+            else:
+                bucket.append(group)
+                self._buckets[key] = bucket
+        return group
+
+    def add_many(self, items: Iterable[Tuple[str, Optional[str]]]) -> List[Tuple[int, str]]:
+        """
+        Rattache des insights (texte, topic) à leurs groupes, dans l'ordre
+
+        Les signatures des insights inconnus sont calculées en lot; chaque
+        insight peut se rattacher à un groupe créé plus tôt dans le même lot.
+
+        Returns:
+            (groupe, texte canonique) pour chaque insight
+        """
+        items = list(items)
+        normalized = [normalize_insight(text) for text, _ in items]
+
+        # Signatures des seuls textes jamais vus (doublons exacts du lot signés une fois)
+        unseen: Dict[str, int] = {}
+        for text in normalized:
+            if text not in self._exact and text not in unseen:
+                unseen[text] = len(unseen)
+        if unseen:
+            unseen_texts = list(unseen)
+            signatures = self.signatures(unseen_texts)
+            keys = self._band_keys(signatures, unseen_texts)
+
+        results = []
+        for (text, topic), norm in zip(items, normalized):
+            self.stats["inserts"] += 1
+            group = self._exact.get(norm)
+            if group is not None:
+                self.stats["exact_duplicates"] += 1
+            else:
+                row = unseen[norm]
+                group, occupied = self._best_candidate(signatures[row], keys[row])
+                if group is not None:
+                    self.stats["near_duplicates"] += 1
+                else:
+                    group = self._insert(text, signatures[row], keys[row], occupied)
+                self._exact[norm] = group
+
+            self.counts[group] += 1
+            if topic is not None:
+                self.topics[group][topic] = None
+            results.append((group, self.canonicals[group]))
+
+        return results
+
+    def add(self, text: str, topic: Optional[str] = None) -> Tuple[int, str]:
+        """Rattache un insight à son groupe (créé si aucun quasi-doublon)"""
+        return self.add_many([(text, topic)])[0]
+
+    def find(self, text: str) -> Optional[int]:
+        """Groupe d'un insight déjà indexé (ou quasi-doublon), sans insertion"""
+        normalized = normalize_insight(text)
+        group = self._exact.get(normalized)
+        if group is not None or not self.canonicals:
+            return group
+        signatures = self.signatures([normalized])
+        return self._best_candidate(signatures[0], self._band_keys(signatures, [normalized])[0])[0]
+
+    def canonical(self, text: str, topic: Optional[str] = None) -> str:
+        """Texte canonique d'un insight (l'insight est indexé au passage)"""
+        return self.add(text, topic)[1]
+
+    def dedupe(self, insights: Iterable[str], topic: Optional[str] = None) -> List[str]:
+        """Représentants canoniques distincts, dans l'ordre de première apparition"""
+        return list(dict.fromkeys(canonical for _, canonical in self.add_many((i, topic) for i in insights)))
+
+    def groups(self) -> List[Dict]:
+        return [
+            {"canonical": text, "count": count, "topics": list(topics)}
+            for text, count, topics in zip(self.canonicals, self.counts, self.topics)
+        ]
+
+    # ===================================================================
+    # PERSISTANCE (entre sessions)
+    # ===================================================================
+
+    def save(self, path: str):
+        """Sauvegarde les représentants canoniques (signatures recalculées au chargement)"""
+        state = {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "groups": self.groups()
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "NearDuplicateIndex":
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+
+        index = cls(state["threshold"], state["num_perm"], state["bands"], state["shingle_size"])
+        groups = state["groups"]
+        for (group_id, _), group in zip(index.add_many((g["canonical"], None) for g in groups), groups):
+            index.counts[group_id] += group["count"] - 1
+            index.topics[group_id].update(dict.fromkeys(group["topics"]))
+        index.stats = dict.fromkeys(index.stats, 0)
+        logger.info(f"✅ Index quasi-doublons chargé: {len(index)} insights canoniques")
+        return index
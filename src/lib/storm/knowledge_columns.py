@@ -0,0 +1,251 @@
+﻿"""
+Knowledge Columns - SafetyGraph BehaviorX STORM
+==============================================
+Stockage en colonnes des lots de connaissances extraites
+Codes de pools de chaînes partagés, confiances en float64, insights en CSR
+"""
+
+from array import array
+from itertools import accumulate, chain, islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# numpy chargé aux agrégations (import du module quasi gratuit)
+if TYPE_CHECKING:
+    import numpy as np
+
+class StringPool:
+    """Table de chaînes dédupliquées: chaque chaîne distincte est stockée une fois"""
+
+    __slots__ = ("strings", "_codes")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+    def intern(self, value: str) -> int:
+        """Code de la chaîne (ajoutée au pool si nouvelle)"""
+        try:
+            return self._codes[value]
+        except KeyError:
+            code = self._codes[value] = len(self.strings)
+            self.strings.append(value)
+            return code
+
+    def intern_many(self, values: Sequence[str]) -> array:
+        """Codes d'une séquence de chaînes (nouvelles chaînes ajoutées dans l'ordre)"""
+        codes = self._codes
+        for value in dict.fromkeys(values):
+            if value not in codes:
+                codes[value] = len(self.strings)
+                self.strings.append(value)
+        return array("i", map(codes.__getitem__, values))
+
+class KnowledgeColumns:
+    """
+    Lot de connaissances en colonnes parallèles
+
+    Une ligne par connaissance: codes topic et catégorie (pools partagés),
+    confiance (float64), insights et applications comportementales en
+    listes de codes délimitées par des offsets (format CSR). Une chaîne
+    répétée d'une ligne à l'autre n'est stockée qu'une fois; les agrégats
+    par catégorie sont des opérations numpy sur les colonnes.
+    """
+
+    def __init__(self):
+        self.topics = StringPool()
+        self.categories = StringPool()
+        # Insights et applications partagent un pool (textes souvent repris)
+        self.texts = StringPool()
+        self.topic_codes = array("i")
+        self.category_codes = array("i")
+        self.confidence = array("d")
+        self.insight_offsets = array("q", [0])
+        self.insight_codes = array("i")
+        self.application_offsets = array("q", [0])
+        self.application_codes = array("i")
+
+    def __len__(self) -> int:
+        return len(self.confidence)
+
+    # ===================================================================
+    # CONSTRUCTION
+    # ===================================================================
+
+    def append(self, topic: str, category: str, confidence: float,
+               insights: Iterable[str], applications: Iterable[str] = ()) -> int:
+        """Ajoute une ligne; retourne son indice"""
+        self.topic_codes.append(self.topics.intern(topic))
+        self.category_codes.append(self.categories.intern(category))
+        self.confidence.append(confidence)
+
+        intern = self.texts.intern
+        self.insight_codes.extend(map(intern, insights))
+        self.insight_offsets.append(len(self.insight_codes))
+        self.application_codes.extend(map(intern, applications))
+        self.application_offsets.append(len(self.application_codes))
+        return len(self.confidence) - 1
+
+    def extend(self, topics: Sequence[str], categories: Sequence[str], confidence: Sequence[float],
+               insights: Optional[Sequence[Sequence[str]]] = None,
+               applications: Optional[Sequence[Sequence[str]]] = None):
+        """
+        Ajoute des lignes à partir de colonnes parallèles (listes Python)
+
+        Codage des chaînes et offsets en bloc (map / chain), sans appel
+        Python par ligne. insights / applications absents: listes vides.
+        """
+        rows = len(topics)
+        if not len(categories) == len(confidence) == rows:
+            raise ValueError("Colonnes de longueurs différentes")
+
+        self.topic_codes.extend(self.topics.intern_many(topics))
+        self.category_codes.extend(self.categories.intern_many(categories))
+        self.confidence.extend(array("d", confidence))
+
+        for lists, offsets, codes in ((insights, self.insight_offsets, self.insight_codes),
+                                      (applications, self.application_offsets, self.application_codes)):
+            if lists is None:
+                offsets.extend([offsets[-1]] * rows)
+                continue
+            if len(lists) != rows:
+                raise ValueError("Colonnes de longueurs différentes")
+            offsets.extend(islice(accumulate(map(len, lists), initial=offsets[-1]), 1, None))
+            codes.extend(self.texts.intern_many(list(chain.from_iterable(lists))))
+
+    def append_knowledge(self, knowledge) -> int:
+        """Ajoute un ExtractedKnowledge"""
+        return self.append(knowledge.topic, knowledge.category, knowledge.confidence_score,
+                           knowledge.insights, knowledge.behavioral_applications)
+
+    def append_semantic(self, extraction, category: str = "general") -> int:
+        """Ajoute une SemanticExtraction (sans catégorie propre ni applications)"""
+        return self.append(extraction.topic, category, extraction.confidence_score, extraction.key_insights)
+
+    @classmethod
+    def from_knowledge(cls, knowledge_list: Iterable) -> "KnowledgeColumns":
+        """Lot d'ExtractedKnowledge"""
+        knowledge_list = list(knowledge_list)
+        columns = cls()
+        columns.extend(
+            [k.topic for k in knowledge_list], [k.category for k in knowledge_list],
+            [k.confidence_score for k in knowledge_list],
+            [k.insights for k in knowledge_list], [k.behavioral_applications for k in knowledge_list]
+        )
+        return columns
+
+    @classmethod
+    def from_semantic(cls, extractions: Iterable, category: str = "general") -> "KnowledgeColumns":
+        """Lot de SemanticExtraction (catégorie commune, sans applications)"""
+        extractions = list(extractions)
+        columns = cls()
+        columns.extend(
+            [e.topic for e in extractions], [category] * len(extractions),
+            [e.confidence_score for e in extractions], [e.key_insights for e in extractions]
+        )
+        return columns
+
+    # ===================================================================
+    # LECTURE
+    # ===================================================================
+
+    def topic(self, row: int) -> str:
+        return self.topics[self.topic_codes[row]]
+
+    def category(self, row: int) -> str:
+        return self.categories[self.category_codes[row]]
+
+    def insights(self, row: int) -> List[str]:
+        strings = self.texts.strings
+        return [strings[code] for code in self.insight_codes[self.insight_offsets[row]:self.insight_offsets[row + 1]]]
+
+    def applications(self, row: int) -> List[str]:
+        strings = self.texts.strings
+        start, end = self.application_offsets[row], self.application_offsets[row + 1]
+        return [strings[code] for code in self.application_codes[start:end]]
+
+    def rows(self) -> Iterator[Tuple[str, str, float, List[str]]]:
+        """(topic, catégorie, confiance, insights) par ligne"""
+        for row in range(len(self)):
+            yield self.topic(row), self.category(row), self.confidence[row], self.insights(row)
+
+    def column(self, name: str) -> "np.ndarray":
+        """Vue numpy sans copie d'une colonne (topic_codes, confidence, insight_offsets...)
+        
+        Le lot ne peut plus être étendu tant qu'une vue est référencée (BufferError).
+        """
+        import numpy as np
+        values = getattr(self, name)
+        return np.frombuffer(values, dtype={"i": np.int32, "q": np.int64, "d": np.float64}[values.typecode])
+
+    # ===================================================================
+    # AGRÉGATS (vectorisés)
+    # ===================================================================
+
+    def average_confidence(self) -> float:
+        return float(self.column("confidence").mean()) if len(self) else 0.0
+
+    def category_counts(self) -> "np.ndarray":
+        """Nombre de lignes par code catégorie"""
+        import numpy as np
+        return np.bincount(self.column("category_codes"), minlength=len(self.categories))
+
+    def category_confidence(self) -> "np.ndarray":
+        """Confiance moyenne par code catégorie"""
+        import numpy as np
+        counts = self.category_counts()
+        sums = np.bincount(self.column("category_codes"), weights=self.column("confidence"),
+                           minlength=len(self.categories))
+        return sums / np.maximum(counts, 1)
+
+    def category_rows(self) -> List["np.ndarray"]:
+        """Indices des lignes par code catégorie (ordre d'insertion conservé)"""
+        import numpy as np
+        order = np.argsort(self.column("category_codes"), kind="stable")
+        return np.split(order, np.cumsum(self.category_counts())[:-1])
+
+    def category_applications(self) -> List[List[str]]:
+        """Applications distinctes par code catégorie (ordre de première apparition)"""
+        import numpy as np
+
+        codes = self.column("application_codes")
+        lengths = np.diff(self.column("application_offsets"))
+        row_categories = np.repeat(self.column("category_codes"), lengths)
+
+        # Couples (catégorie, application) distincts, triés par première occurrence
+        pairs = row_categories.astype(np.int64) * len(self.texts) + codes
+        _, first = np.unique(pairs, return_index=True)
+        first.sort()
+
+        by_category: List[List[str]] = [[] for _ in range(len(self.categories))]
+        strings = self.texts.strings
+        for category, code in zip(row_categories[first].tolist(), codes[first].tolist()):
+            by_category[category].append(strings[code])
+        return by_category
+
+    def category_summary(self) -> Dict[str, Dict]:
+        """Effectif, confiance moyenne et applications distinctes par catégorie"""
+        counts = self.category_counts().tolist()
+        confidence = self.category_confidence().tolist()
+        applications = self.category_applications()
+        return {
+            category: {
+                "knowledge_count": counts[code],
+                "avg_confidence": confidence[code],
+                "behavioral_applications": applications[code]
+            }
+            for code, category in enumerate(self.categories.strings)
+        }
+
+    def nbytes(self) -> int:
+        """Taille des colonnes numériques (hors pools de chaînes)"""
+        return sum(
+            column.itemsize * len(column)
+            for column in (self.topic_codes, self.category_codes, self.confidence, self.insight_offsets,
+                           self.insight_codes, self.application_offsets, self.application_codes)
+        )
@@ -6,17 +6,23 @@ Intégration avec pipeline SafetyGraph BehaviorX
 """
 
 import json
+import os
 import re
-from typing import Dict, List, Any, Optional
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from typing import Dict, List, Any, Optional, Pattern, Iterable, Iterator
 from dataclasses import dataclass
 from datetime import datetime
 import logging
 
+from insight_dedup import NearDuplicateIndex
+from knowledge_columns import KnowledgeColumns
+
 logger = logging.getLogger('KnowledgeExtractor')
 
-@dataclass
+@dataclass(slots=True)
 class ExtractedKnowledge:
-    """Structure des connaissances extraites"""
+    """Structure des connaissances extraites (slots: pas de __dict__ par instance)"""
     topic: str
     category: str
     insights: List[str]
@@ -31,6 +37,10 @@ class KnowledgeExtractor:
     
     def __init__(self):
         self.extraction_patterns = self._initialize_patterns()
+        self.compiled_patterns = {
+            kind: self._compile_patterns(patterns)
+            for kind, patterns in self.extraction_patterns.items()
+        }
         self.behavioral_mapping = self._initialize_behavioral_mapping()
     
     def _initialize_patterns(self) -> Dict:
@@ -43,12 +53,12 @@ class KnowledgeExtractor:
                 r"evidence suggests (.*?)\.",
                 r"findings reveal (.*?)\."
             ],
-            "metrics": [
-                r"(\d+(?:\.\d+)?%?) improvement",
-                r"(\d+(?:\.\d+)?%?) reduction",
-                r"(\d+(?:\.\d+)?%?) increase",
-                r"ROI of (\d+(?:\.\d+)?%?)"
-            ],
+            "metrics": {
+                "improvement_rate": r"(\d+(?:\.\d+)?%?) improvement",
+                "reduction_rate": r"(\d+(?:\.\d+)?%?) reduction",
+                "increase_rate": r"(\d+(?:\.\d+)?%?) increase",
+                "roi": r"ROI of (\d+(?:\.\d+)?%?)"
+            },
             "sources": [
                 r"according to (.*?) \(",
                 r"(.*?) study found",
@@ -56,6 +66,40 @@ class KnowledgeExtractor:
             ]
         }
     
+    def _compile_patterns(self, patterns) -> Pattern:
+        """Combine les patterns en une seule alternance compilée (une passe par document)
+        
+        Le groupe capturant de chaque pattern devient un groupe nommé, ce qui
+        permet d'attribuer chaque match à son pattern via match.lastgroup.
+        Une lookahead sur les premiers caractères possibles évite de tenter
+        toutes les alternatives à chaque position.
+        """
+        
+        if not isinstance(patterns, dict):
+            patterns = {f"p{i}": pattern for i, pattern in enumerate(patterns)}
+        
+        alternatives = [
+            re.sub(r"\((?!\?)", f"(?P<{name}>", pattern, count=1)
+            for name, pattern in patterns.items()
+        ]
+        combined = "(?:" + "|".join(alternatives) + ")"
+        
+        first_chars = [self._first_char_class(pattern) for pattern in patterns.values()]
+        if all(first_chars):
+            combined = "(?=[" + "".join(sorted(set(first_chars))) + "])" + combined
+        
+        return re.compile(combined, re.IGNORECASE)
+    
+    def _first_char_class(self, pattern: str) -> Optional[str]:
+        """Premier caractère possible d'un pattern (None si indéterminable)"""
+        
+        head = pattern.lstrip("(")
+        if head.startswith("\\d"):
+            return "\\d"
+        if head[:1].isalpha():
+            return head[0].lower()
+        return None
+    
     def _initialize_behavioral_mapping(self) -> Dict:
         """Mapping connaissances → applications comportementales"""
         
@@ -132,30 +176,25 @@ class KnowledgeExtractor:
     def _extract_insights(self, content: str) -> List[str]:
         """Extrait insights clés du contenu"""
         
-        insights = []
-        for pattern in self.extraction_patterns["insights"]:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            insights.extend(matches)
+        insights = [
+            match.group(match.lastgroup)
+            for match in self.compiled_patterns["insights"].finditer(content)
+        ]
         
-        # Déduplication et nettoyage
-        unique_insights = list(set(insights))
-        cleaned_insights = [insight.strip() for insight in unique_insights if len(insight.strip()) > 10]
+        # Nettoyage puis déduplication (ordre d'apparition conservé)
+        cleaned_insights = dict.fromkeys(
+            cleaned for cleaned in (insight.strip() for insight in insights) if len(cleaned) > 10
+        )
         
-        return cleaned_insights[:5]  # Top 5 insights
+        return list(cleaned_insights)[:5]  # Top 5 insights
     
     def _extract_metrics(self, content: str) -> Dict[str, Any]:
         """Extrait métriques quantifiables"""
         
+        # Passe unique: chaque match est attribué à son propre mot-clé
         metrics = {}
-        for pattern in self.extraction_patterns["metrics"]:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            for match in matches:
-                if "improvement" in content.lower():
-                    metrics["improvement_rate"] = match
-                elif "reduction" in content.lower():
-                    metrics["reduction_rate"] = match
-                elif "roi" in content.lower():
-                    metrics["roi"] = match
+        for match in self.compiled_patterns["metrics"].finditer(content):
+            metrics[match.lastgroup] = match.group(match.lastgroup)
         
         return metrics
     
@@ -271,8 +310,17 @@ class KnowledgeExtractor:
         
         return min(relevance, 1.0)
     
-    def batch_extract_knowledge(self, research_results: List[Dict]) -> List[ExtractedKnowledge]:
-        """Extraction en lot de connaissances"""
+    def batch_extract_knowledge(self, research_results: List[Dict], parallel: bool = False,
+                                max_workers: Optional[int] = None) -> List[ExtractedKnowledge]:
+        """Extraction en lot de connaissances
+        
+        parallel=True répartit l'extraction sur un ProcessPoolExecutor
+        (ordre des résultats conservé).
+        """
+        
+        if parallel:
+            indexed = dict(self._iter_parallel(research_results, max_workers))
+            return [indexed[i] for i in sorted(indexed)]
         
         extracted_knowledge = []
         for research_data in research_results:
@@ -285,53 +333,133 @@ class KnowledgeExtractor:
         
         return extracted_knowledge
     
-    def export_for_behaviorx_integration(self, knowledge_list: List[ExtractedKnowledge]) -> Dict:
-        """Exporte connaissances pour intégration BehaviorX"""
+    def iter_extract_knowledge(self, research_results: Iterable[Dict],
+                               max_workers: Optional[int] = None) -> Iterator[ExtractedKnowledge]:
+        """Extraction parallèle en flux: produit chaque ExtractedKnowledge dès qu'il est prêt
         
-        export_data = {
-            "extraction_session": datetime.now().isoformat(),
-            "total_knowledge_items": len(knowledge_list),
-            "categories_covered": list(set(k.category for k in knowledge_list)),
-            "average_confidence": sum(k.confidence_score for k in knowledge_list) / len(knowledge_list) if knowledge_list else 0.0,
-            "behavioral_enhancements": {},
-            "knowledge_items": []
+        L'ordre suit l'achèvement, pas l'entrée. Les résultats de recherche
+        sont consommés à la demande (au plus 4 tâches en vol par worker).
+        """
+        
+        for _, knowledge in self._iter_parallel(research_results, max_workers):
+            yield knowledge
+    
+    def _iter_parallel(self, research_results: Iterable[Dict],
+                       max_workers: Optional[int] = None) -> Iterator[tuple]:
+        """Soumet les extractions au pool de processus, produit (index, connaissance)"""
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        max_in_flight = max_workers * 4
+        results_iter = enumerate(research_results)
+        
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            
+            def submit_next() -> bool:
+                try:
+                    index, research_data = next(results_iter)
+                except StopIteration:
+                    return False
+                future = executor.submit(_extract_in_worker, research_data)
+                pending[future] = (index, research_data.get("topic", "unknown"))
+                return True
+            
+            while len(pending) < max_in_flight and submit_next():
+                pass
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, topic = pending.pop(future)
+                    try:
+                        knowledge = future.result()
+                        logger.info(f"✅ Connaissances extraites pour: {knowledge.topic}")
+                        yield index, knowledge
+                    except Exception as e:
+                        logger.error(f"❌ Erreur extraction {topic}: {e}")
+                    submit_next()
+    
+    def to_behaviorx_item(self, knowledge: ExtractedKnowledge,
+                          near_duplicates: Optional[NearDuplicateIndex] = None) -> Dict:
+        """Élément de connaissance au format BehaviorX (export en lot ou flux)
+        
+        Avec near_duplicates, les insights sont remplacés par leurs représentants
+        canoniques (paraphrases fusionnées, tous topics et sessions confondus).
+        """
+        
+        insights = knowledge.insights
+        if near_duplicates is not None:
+            insights = near_duplicates.dedupe(insights, knowledge.topic)
+        
+        return {
+            "topic": knowledge.topic,
+            "category": knowledge.category,
+            "insights": insights,
+            "behavioral_applications": knowledge.behavioral_applications,
+            "metrics": knowledge.metrics,
+            "confidence": knowledge.confidence_score,
+            "agent_integration_ready": knowledge.confidence_score >= 0.7
         }
+    
+    def export_for_behaviorx_integration(self, knowledge_list: Iterable[ExtractedKnowledge],
+                                         near_duplicates: Optional[NearDuplicateIndex] = None) -> Dict:
+        """Exporte connaissances pour intégration BehaviorX
         
-        # Structurer par catégorie pour agents BehaviorX
-        for knowledge in knowledge_list:
-            export_data["knowledge_items"].append({
-                "topic": knowledge.topic,
-                "category": knowledge.category,
-                "insights": knowledge.insights,
-                "behavioral_applications": knowledge.behavioral_applications,
-                "metrics": knowledge.metrics,
-                "confidence": knowledge.confidence_score,
-                "agent_integration_ready": knowledge.confidence_score >= 0.7
-            })
-        
-        # Regrouper par catégorie pour faciliter intégration
-        by_category = {}
-        for knowledge in knowledge_list:
-            if knowledge.category not in by_category:
-                by_category[knowledge.category] = []
-            by_category[knowledge.category].append(knowledge)
+        Accepte une liste ou un flux (ex. iter_extract_knowledge), consommé en une passe.
+        near_duplicates fusionne les paraphrases d'insights (voir to_behaviorx_item).
+        """
+        
+        knowledge_items = []
+        # Colonnes des agrégats (les connaissances elles-mêmes ne sont pas conservées)
+        topics, categories, confidence, applications = [], [], [], []
         
-        export_data["behavioral_enhancements"] = {
+        for knowledge in knowledge_list:
+            knowledge_items.append(self.to_behaviorx_item(knowledge, near_duplicates))
+            topics.append(knowledge.topic)
+            categories.append(knowledge.category)
+            confidence.append(knowledge.confidence_score)
+            applications.append(knowledge.behavioral_applications)
+        
+        # Effectifs et moyennes par catégorie vectorisés (insights non agrégés, non recopiés)
+        columns = KnowledgeColumns()
+        columns.extend(topics, categories, confidence)
+        counts = columns.category_counts().tolist()
+        averages = columns.category_confidence().tolist()
+        
+        by_category = {
             category: {
-                "knowledge_count": len(items),
-                "avg_confidence": sum(k.confidence_score for k in items) / len(items),
-                "behavioral_applications": list(set().union(*[k.behavioral_applications for k in items])),
-                "integration_priority": "high" if len(items) >= 3 else "medium"
+                "knowledge_count": counts[code],
+                "avg_confidence": averages[code],
+                "behavioral_applications": list(dict.fromkeys(
+                    chain.from_iterable(applications[row] for row in rows.tolist())
+                )),
+                "integration_priority": "high" if counts[code] >= 3 else "medium"
             }
-            for category, items in by_category.items()
+            for code, (category, rows) in enumerate(zip(columns.categories.strings, columns.category_rows()))
         }
         
-        return export_data
+        return {
+            "extraction_session": datetime.now().isoformat(),
+            "total_knowledge_items": len(knowledge_items),
+            "categories_covered": list(by_category),
+            "average_confidence": columns.average_confidence(),
+            "behavioral_enhancements": by_category,
+            "knowledge_items": knowledge_items
+        }
 
 # ===================================================================
 # FONCTIONS UTILITAIRES
 # ===================================================================
 
+_worker_extractor: Optional[KnowledgeExtractor] = None
+
+def _extract_in_worker(research_data: Dict) -> ExtractedKnowledge:
+    """Extraction dans un processus du pool (extracteur créé une fois par processus)"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = KnowledgeExtractor()
+    return _worker_extractor.extract_from_research(research_data)
+
 def validate_knowledge_extraction() -> bool:
     """Valide fonctionnement extracteur de connaissances"""
     
@@ -362,5 +490,18 @@ def validate_knowledge_extraction() -> bool:
         logger.error(f"❌ Erreur validation extracteur: {e}")
         return False
 
-# Instance globale
-knowledge_extractor = KnowledgeExtractor()
+# Instance globale (créée au premier accès: compilation des motifs différée)
+_knowledge_extractor: Optional[KnowledgeExtractor] = None
+
+def get_knowledge_extractor() -> KnowledgeExtractor:
+    """Extracteur partagé, créé au premier appel"""
+    global _knowledge_extractor
+    if _knowledge_extractor is None:
+        _knowledge_extractor = KnowledgeExtractor()
+    return _knowledge_extractor
+
+def __getattr__(name: str):
+    # Compatibilité: `from knowledge_extractor import knowledge_extractor`
+    if name == "knowledge_extractor":
+        return get_knowledge_extractor()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
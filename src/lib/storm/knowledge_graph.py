@@ -4,12 +4,34 @@ Structuration sémantique pour enrichissement agents
 """
 
 import json
-import networkx as nx
-from typing import Dict, List, Tuple
+import hashlib
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 from datetime import datetime
 
+from concept_search import ConceptSearchIndex
+from insight_dedup import DEFAULT_THRESHOLD, NearDuplicateIndex
+
+# networkx et numpy chargés au premier usage (import du module quasi gratuit)
+if TYPE_CHECKING:
+    import numpy as np
+
+# Format snapshot binaire (répertoire de tableaux .npy + meta.json)
+SNAPSHOT_FORMAT = "safety-knowledge-graph-snapshot"
+SNAPSHOT_VERSION = 1
+NODE_LISTS = {'concept': 'concepts', 'agent': 'agents', 'sector': 'sectors', 'intervention': 'interventions'}
+
 class SafetyKnowledgeGraph:
-    def __init__(self):
+    def __init__(self, near_duplicates: Optional[NearDuplicateIndex] = None,
+                 dedup_threshold: Optional[float] = DEFAULT_THRESHOLD):
+        '''
+        Args:
+            near_duplicates: Index de quasi-doublons partagé (entre graphes ou sessions)
+            dedup_threshold: Seuil de fusion des paraphrases si aucun index n'est fourni
+                (None: déduplication exacte uniquement)
+        '''
+        import networkx as nx
+        
         self.graph = nx.DiGraph()
         self.nodes = {
             'concepts': [],
@@ -17,50 +39,166 @@ class SafetyKnowledgeGraph:
             'sectors': [],
             'interventions': []
         }
+        # Index topic → concepts et agent → concepts (ordre d'insertion)
+        self.topic_index: Dict[str, Dict[str, None]] = {}
+        self.agent_index: Dict[str, Dict[str, None]] = {}
+        
+        # Enrichissements et impacts maintenus à l'insertion (export O(agents))
+        self.version = 0
+        self._agent_enhancements: Dict[str, List[str]] = {}
+        self._impact_scores: Dict[str, float] = {}
+        # Tuples immuables: partagés sans copie entre exports successifs
+        self._enhancements_snapshot: Dict[str, Tuple[str, ...]] = {}
+        self._dirty_agents: set = set()
+        
+        # Paraphrases d'un même insight rattachées à un concept canonique
+        if near_duplicates is None and dedup_threshold is not None:
+            near_duplicates = NearDuplicateIndex(threshold=dedup_threshold)
+        self.near_duplicates = near_duplicates
+        
+        # Recherche plein texte des concepts (index inversé BM25 tenu à jour à l'insertion)
+        self.search_index = ConceptSearchIndex()
+    
+    @staticmethod
+    def concept_id(content: str) -> str:
+        '''Identifiant stable dérivé du contenu normalisé (déduplication)'''
+        normalized = " ".join(content.split()).casefold()
+        return f"concept_{hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]}"
         
     def add_semantic_knowledge(self, extraction_data: Dict):
         '''Ajoute connaissances extraites au graphe'''
         
-        topic = extraction_data.get('topic', 'unknown')
-        insights = extraction_data.get('insights', [])
-        agents = extraction_data.get('agent_mappings', {})
-        
-        # Ajouter nœuds concepts
-        for insight in insights:
-            concept_id = f"concept_{len(self.nodes['concepts'])}"
-            self.graph.add_node(concept_id, type='concept', content=insight, topic=topic)
-            self.nodes['concepts'].append(concept_id)
-        
-        # Ajouter relations agents
-        for agent, function in agents.items():
-            agent_id = f"agent_{agent}"
-            if not self.graph.has_node(agent_id):
-                self.graph.add_node(agent_id, type='agent', function=function)
-                self.nodes['agents'].append(agent_id)
+        self.add_semantic_knowledge_bulk([extraction_data])
+    
+    def add_semantic_knowledge_bulk(self, extractions: Iterable[Dict]) -> int:
+        '''Ajoute un lot d'extractions en une seule insertion networkx
+        
+        Retourne le nombre de nouveaux concepts (les insights déjà connus
+        sont rattachés au concept existant).
+        '''
+        
+        new_nodes: Dict[str, Dict] = {}
+        new_edges: List[Tuple[str, str, Dict]] = []
+        
+        # Quasi-doublons résolus en un seul lot (signatures MinHash vectorisées)
+        extractions = list(extractions)
+        canonicals = None
+        if self.near_duplicates is not None:
+            canonicals = iter(self.near_duplicates.add_many(
+                (insight, extraction_data.get('topic', 'unknown'))
+                for extraction_data in extractions
+                for insight in extraction_data.get('insights', [])
+            ))
+        
+        for extraction_data in extractions:
+            topic = extraction_data.get('topic', 'unknown')
+            insights = extraction_data.get('insights', [])
+            if canonicals is not None:
+                insights = [canonical for _, (_, canonical) in zip(insights, canonicals)]
+            agents = extraction_data.get('agent_mappings', {})
+            topic_concepts = self.topic_index.setdefault(topic, {})
+            
+            # Ajouter nœuds concepts (dédupliqués par contenu, quasi-doublons fusionnés)
+            concept_ids = []
+            for insight in insights:
+                concept_id = self.concept_id(insight)
+                if concept_id in new_nodes:
+                    attrs = new_nodes[concept_id]
+                elif self.graph.has_node(concept_id):
+                    attrs = self.graph.nodes[concept_id]
+                else:
+                    attrs = {'type': 'concept', 'content': insight, 'topic': topic, 'topics': []}
+                    new_nodes[concept_id] = attrs
+                    self.nodes['concepts'].append(concept_id)
+                    self.search_index.add(concept_id, insight)
+                
+                if topic not in attrs['topics']:
+                    attrs['topics'].append(topic)
+                    self.search_index.add_topic(concept_id, topic)
+                topic_concepts[concept_id] = None
+                concept_ids.append(concept_id)
             
-            # Créer relations concept → agent
-            for concept_id in self.nodes['concepts'][-len(insights):]:
-                self.graph.add_edge(concept_id, agent_id, relationship='enhances')
+            # Ajouter relations agents
+            for agent, function in agents.items():
+                agent_id = f"agent_{agent}"
+                if agent_id not in new_nodes and not self.graph.has_node(agent_id):
+                    new_nodes[agent_id] = {'type': 'agent', 'function': function}
+                    self.nodes['agents'].append(agent_id)
+                    self._agent_enhancements[agent_id] = []
+                    self._impact_scores[agent_id] = 0.0
+                    self._enhancements_snapshot[agent_id] = ()
+                
+                # Créer relations concept → agent (concepts de cette extraction uniquement)
+                agent_concepts = self.agent_index.setdefault(agent_id, {})
+                enhancements = self._agent_enhancements[agent_id]
+                for concept_id in concept_ids:
+                    if concept_id not in agent_concepts:
+                        agent_concepts[concept_id] = None
+                        new_edges.append((concept_id, agent_id, {'relationship': 'enhances'}))
+                        self.search_index.add_agent(concept_id, agent_id)
+                        content = new_nodes[concept_id]['content'] if concept_id in new_nodes \
+                            else self.graph.nodes[concept_id]['content']
+                        enhancements.append(content)
+                        self._dirty_agents.add(agent_id)
+                self._impact_scores[agent_id] = min(len(agent_concepts) * 0.1, 0.8)
+        
+        if new_nodes or new_edges:
+            self.graph.add_nodes_from(new_nodes.items())
+            self.graph.add_edges_from(new_edges)
+            self.version += 1
+        return sum(1 for attrs in new_nodes.values() if attrs['type'] == 'concept')
+    
+    def get_topic_concepts(self, topic: str) -> List[str]:
+        '''Concepts rattachés à un topic (index, sans parcours du graphe)'''
+        return list(self.topic_index.get(topic, {}))
+    
+    def get_agent_concepts(self, agent_id: str) -> List[str]:
+        '''Concepts qui enrichissent un agent (index, sans parcours du graphe)'''
+        return list(self.agent_index.get(f"agent_{agent_id}", {}))
     
     def get_agent_enhancements(self, agent_id: str) -> List[str]:
         '''Récupère améliorations pour un agent spécifique'''
         
-        enhancements = []
-        for node in self.graph.predecessors(f"agent_{agent_id}"):
-            if self.graph.nodes[node]['type'] == 'concept':
-                enhancements.append(self.graph.nodes[node]['content'])
+        return list(self._agent_enhancements.get(f"agent_{agent_id}", []))
+    
+    def search_concepts(self, query: str, topic: Optional[str] = None, agent_id: Optional[str] = None,
+                        limit: int = 10) -> List[Dict]:
+        '''Concepts pertinents pour une requête (BM25, sans parcours des nœuds)
+        
+        Args:
+            query: Mots-clés ou phrase, français ou anglais (accents ignorés)
+            topic: Restreint aux concepts de ce topic
+            agent_id: Restreint aux concepts qui enrichissent cet agent (ex. "A1", "AN1")
+            limit: Nombre maximal de résultats
+        '''
         
-        return enhancements
+        agent = f"agent_{agent_id}" if agent_id is not None else None
+        return [
+            {
+                'concept_id': concept_id,
+                'content': self.graph.nodes[concept_id]['content'],
+                'topics': list(self.graph.nodes[concept_id]['topics']),
+                'score': score
+            }
+            for concept_id, score in self.search_index.search(query, topic=topic, agent_id=agent, limit=limit)
+        ]
     
     def calculate_enhancement_impact(self) -> Dict[str, float]:
-        '''Calcule impact améliorations par agent'''
+        '''Calcule impact améliorations par agent (maintenu à l'insertion)'''
+        
+        return dict(self._impact_scores)
+    
+    def _agent_enhancements_export(self) -> Dict[str, Tuple[str, ...]]:
+        '''Instantané des enrichissements (tuples), reconstruit seulement pour les agents modifiés
         
-        impact_scores = {}
-        for agent_node in self.nodes['agents']:
-            enhancement_count = len(list(self.graph.predecessors(agent_node)))
-            impact_scores[agent_node] = min(enhancement_count * 0.1, 0.8)
+        Les tuples des agents inchangés sont partagés d'un export à l'autre:
+        un export ne peut pas modifier l'état du graphe ni les exports suivants.
+        '''
         
-        return impact_scores
+        for agent_id in self._dirty_agents:
+            self._enhancements_snapshot[agent_id] = tuple(self._agent_enhancements[agent_id])
+        self._dirty_agents.clear()
+        return dict(self._enhancements_snapshot)
     
     def export_knowledge_structure(self) -> Dict:
         '''Exporte structure pour Safety Agentique'''
@@ -68,12 +206,270 @@ class SafetyKnowledgeGraph:
         return {
             'timestamp': datetime.now().isoformat(),
             'graph_version': '2.0',
+            'graph_revision': self.version,
             'total_nodes': self.graph.number_of_nodes(),
-            'total_edges': self.graph.number_of_edges(),
+            'total_edges': sum(len(concepts) for concepts in self.agent_index.values()),
             'node_types': {k: len(v) for k, v in self.nodes.items()},
+            'agent_enhancements': self._agent_enhancements_export(),
+            'impact_predictions': self.calculate_enhancement_impact()
+        }
+    
+    def save_snapshot(self, path: str):
+        '''Sauvegarde binaire compacte: arêtes CSR indexées + tables de chaînes
+        
+        Le répertoire produit peut être rouvert par load_snapshot() en
+        mémoire mappée, sans reconstruire le graphe networkx.
+        '''
+        
+        import numpy as np
+        
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        
+        node_ids = list(self.graph.nodes)
+        position = {node_id: i for i, node_id in enumerate(node_ids)}
+        types = sorted({attrs.get('type', '') for _, attrs in self.graph.nodes(data=True)})
+        type_codes = {t: i for i, t in enumerate(types)}
+        topics = list(self.topic_index)
+        topic_codes = {t: i for i, t in enumerate(topics)}
+        relationships: Dict[str, int] = {}
+        
+        node_type = np.empty(len(node_ids), dtype=np.uint8)
+        labels = []
+        concept_topics = []
+        succ_indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        succ_indices = []
+        succ_relationship = []
+        
+        for i, node_id in enumerate(node_ids):
+            attrs = self.graph.nodes[node_id]
+            node_type[i] = type_codes[attrs.get('type', '')]
+            labels.append(attrs.get('content', attrs.get('function', '')) or '')
+            concept_topics.append([topic_codes[t] for t in attrs.get('topics', []) if t in topic_codes])
+            for target, edge_attrs in self.graph.succ[node_id].items():
+                relationship = edge_attrs.get('relationship', '')
+                succ_indices.append(position[target])
+                succ_relationship.append(relationships.setdefault(relationship, len(relationships)))
+            succ_indptr[i + 1] = len(succ_indices)
+        
+        # Prédécesseurs des agents (ordre d'insertion des arêtes)
+        agents = {agent_id: position[agent_id] for agent_id in self.nodes['agents']}
+        pred_indptr, pred_indices = _to_csr(
+            [[position[c] for c in self.agent_index.get(agent_id, {})] for agent_id in agents]
+        )
+        topic_indptr, topic_indices = _to_csr(
+            [[position[c] for c in self.topic_index[t]] for t in topics]
+        )
+        concept_topic_indptr, concept_topic_indices = _to_csr(concept_topics)
+        
+        arrays = {
+            'node_type': node_type,
+            'succ_indptr': succ_indptr,
+            'succ_indices': np.array(succ_indices, dtype=np.int32),
+            'succ_relationship': np.array(succ_relationship, dtype=np.uint8),
+            'agent_pred_indptr': pred_indptr,
+            'agent_pred_indices': pred_indices,
+            'topic_concepts_indptr': topic_indptr,
+            'topic_concepts_indices': topic_indices,
+            'concept_topics_indptr': concept_topic_indptr,
+            'concept_topics_indices': concept_topic_indices
+        }
+        for name, strings in (('node_ids', node_ids), ('labels', labels)):
+            arrays[f'{name}_offsets'], arrays[f'{name}_blob'] = _to_string_table(strings)
+        
+        for name, array in arrays.items():
+            np.save(path / f"{name}.npy", array)
+        
+        meta = {
+            'format': SNAPSHOT_FORMAT,
+            'version': SNAPSHOT_VERSION,
+            'created': datetime.now().isoformat(),
+            'graph_revision': self.version,
+            'total_nodes': len(node_ids),
+            'total_edges': len(succ_indices),
+            'types': types,
+            'relationships': list(relationships),
+            'topics': topics,
+            'agents': agents,
+            'node_types': {k: len(v) for k, v in self.nodes.items()}
+        }
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+    
+    @staticmethod
+    def load_snapshot(path: str, mmap: bool = True) -> "KnowledgeGraphSnapshot":
+        '''Ouvre un snapshot binaire (lecture seule, mémoire mappée par défaut)'''
+        
+        return KnowledgeGraphSnapshot(path, mmap=mmap)
+
+# ===================================================================
+# SNAPSHOT BINAIRE
+# ===================================================================
+
+def _to_csr(rows: List[List[int]]) -> Tuple["np.ndarray", "np.ndarray"]:
+    '''Listes d'adjacence → (indptr int64, indices int32)'''
+    import numpy as np
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.fromiter((i for row in rows for i in row), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
+
+def _to_string_table(strings: List[str]) -> Tuple["np.ndarray", "np.ndarray"]:
+    '''Chaînes → (offsets int64, blob UTF-8 uint8)'''
+    import numpy as np
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def _load_array(path: Path, mmap: bool) -> "np.ndarray":
+    '''Charge un tableau .npy (les tableaux vides ne peuvent pas être mappés)'''
+    import numpy as np
+    if mmap:
+        try:
+            return np.load(path, mmap_mode='r')
+        except ValueError:
+            pass
+    return np.load(path)
+
+class KnowledgeGraphSnapshot:
+    '''Vue lecture seule d'un snapshot binaire de SafetyKnowledgeGraph
+    
+    Les tableaux sont mappés en mémoire: l'ouverture est quasi instantanée
+    et les pages sont partagées entre processus workers.
+    '''
+    
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = Path(path)
+        with open(self.path / "meta.json", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get('format') != SNAPSHOT_FORMAT or self.meta.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot incompatible: {self.path}")
+        
+        self.mmap = mmap
+        self._arrays: Dict[str, "np.ndarray"] = {}
+        self._topic_codes = {t: i for i, t in enumerate(self.meta['topics'])}
+    
+    def _array(self, name: str) -> "np.ndarray":
+        if name not in self._arrays:
+            self._arrays[name] = _load_array(self.path / f"{name}.npy", self.mmap)
+        return self._arrays[name]
+    
+    def _string(self, table: str, i: int) -> str:
+        offsets = self._array(f'{table}_offsets')
+        return bytes(self._array(f'{table}_blob')[offsets[i]:offsets[i + 1]]).decode('utf-8')
+    
+    def _row(self, name: str, i: int) -> "np.ndarray":
+        indptr = self._array(f'{name}_indptr')
+        return self._array(f'{name}_indices')[indptr[i]:indptr[i + 1]]
+    
+    def number_of_nodes(self) -> int:
+        return self.meta['total_nodes']
+    
+    def number_of_edges(self) -> int:
+        return self.meta['total_edges']
+    
+    def node_id(self, i: int) -> str:
+        return self._string('node_ids', i)
+    
+    def node_label(self, i: int) -> str:
+        '''Contenu d'un concept ou fonction d'un agent'''
+        return self._string('labels', i)
+    
+    def node_type(self, i: int) -> str:
+        return self.meta['types'][self._array('node_type')[i]]
+    
+    def get_agent_enhancements(self, agent_id: str) -> List[str]:
+        '''Contenus des concepts qui enrichissent un agent'''
+        agent = f"agent_{agent_id}"
+        if agent not in self.meta['agents']:
+            return []
+        row = list(self.meta['agents']).index(agent)
+        return [self.node_label(int(i)) for i in self._row('agent_pred', row)]
+    
+    def get_topic_concepts(self, topic: str) -> List[str]:
+        '''Identifiants des concepts rattachés à un topic'''
+        if topic not in self._topic_codes:
+            return []
+        return [self.node_id(int(i)) for i in self._row('topic_concepts', self._topic_codes[topic])]
+    
+    def calculate_enhancement_impact(self) -> Dict[str, float]:
+        indptr = self._array('agent_pred_indptr')
+        return {
+            agent_id: min(int(indptr[row + 1] - indptr[row]) * 0.1, 0.8)
+            for row, agent_id in enumerate(self.meta['agents'])
+        }
+    
+    def export_knowledge_structure(self) -> Dict:
+        '''Même structure que SafetyKnowledgeGraph.export_knowledge_structure'''
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'graph_version': '2.0',
+            'graph_revision': self.meta['graph_revision'],
+            'total_nodes': self.number_of_nodes(),
+            'total_edges': self.number_of_edges(),
+            'node_types': self.meta['node_types'],
             'agent_enhancements': {
-                agent: self.get_agent_enhancements(agent.replace('agent_', ''))
-                for agent in self.nodes['agents']
+                agent: tuple(self.get_agent_enhancements(agent.replace('agent_', '', 1)))
+                for agent in self.meta['agents']
             },
             'impact_predictions': self.calculate_enhancement_impact()
         }
+    
+    def to_knowledge_graph(self, near_duplicates: Optional[NearDuplicateIndex] = None) -> SafetyKnowledgeGraph:
+        '''Reconstruit un SafetyKnowledgeGraph modifiable à partir du snapshot
+        
+        Les concepts restaurés sont réindexés comme représentants canoniques
+        (les paraphrases des sessions suivantes s'y rattachent) et dans
+        l'index de recherche plein texte.
+        '''
+        kg = SafetyKnowledgeGraph(near_duplicates=near_duplicates)
+        topics = self.meta['topics']
+        relationships = self.meta['relationships']
+        node_ids = [self.node_id(i) for i in range(self.number_of_nodes())]
+        succ_indptr = self._array('succ_indptr')
+        succ_indices = self._array('succ_indices')
+        succ_relationship = self._array('succ_relationship')
+        
+        for i, node_id in enumerate(node_ids):
+            node_type = self.node_type(i)
+            label = self.node_label(i)
+            if node_type == 'concept':
+                node_topics = [topics[t] for t in self._row('concept_topics', i)]
+                attrs = {'type': node_type, 'content': label,
+                         'topic': node_topics[0] if node_topics else 'unknown', 'topics': node_topics}
+                if kg.near_duplicates is not None:
+                    for topic in node_topics or [None]:
+                        kg.near_duplicates.add(label, topic)
+                kg.search_index.add(node_id, label)
+                for topic in node_topics:
+                    kg.search_index.add_topic(node_id, topic)
+            elif node_type == 'agent':
+                attrs = {'type': node_type, 'function': label}
+            else:
+                attrs = {'type': node_type}
+            kg.graph.add_node(node_id, **attrs)
+            if node_type in NODE_LISTS:
+                kg.nodes[NODE_LISTS[node_type]].append(node_id)
+        
+        kg.graph.add_edges_from(
+            (node_ids[i], node_ids[int(j)], {'relationship': relationships[int(r)]})
+            for i in range(len(node_ids))
+            for j, r in zip(succ_indices[succ_indptr[i]:succ_indptr[i + 1]],
+                            succ_relationship[succ_indptr[i]:succ_indptr[i + 1]])
+        )
+        
+        for t, topic in enumerate(topics):
+            kg.topic_index[topic] = {node_ids[int(i)]: None for i in self._row('topic_concepts', t)}
+        for row, agent_id in enumerate(self.meta['agents']):
+            concepts = [node_ids[int(i)] for i in self._row('agent_pred', row)]
+            kg.agent_index[agent_id] = dict.fromkeys(concepts)
+            for concept_id in concepts:
+                kg.search_index.add_agent(concept_id, agent_id)
+            kg._agent_enhancements[agent_id] = [kg.graph.nodes[c]['content'] for c in concepts]
+            kg._impact_scores[agent_id] = min(len(concepts) * 0.1, 0.8)
+            kg._enhancements_snapshot[agent_id] = ()
+            kg._dirty_agents.add(agent_id)
+        kg.version = self.meta['graph_revision']
+        
+        return kg
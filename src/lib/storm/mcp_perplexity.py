@@ -6,33 +6,138 @@ Recherche en temps réel pour enrichissement agents
 """
 
 import os
+import random
 import asyncio
-import aiohttp
 import logging
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 from datetime import datetime
 
+from storm_config import load_storm_config
+from research_cache import ResearchCache
+from rate_limit import TokenBucket
+from single_flight import SingleFlight
+
+# aiohttp chargé à la première requête réelle (mode démo et import sans coût)
+if TYPE_CHECKING:
+    import aiohttp
+
 logger = logging.getLogger('MCPPerplexity')
 
+# Version du prompt de recherche (invalide le cache si modifiée)
+PROMPT_TEMPLATE_VERSION = "1.0"
+
+# Statuts HTTP justifiant une nouvelle tentative
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class PerplexityAPIError(Exception):
+    """Échec réel de l'API Perplexity (après nouvelles tentatives)"""
+    
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
 class PerplexityMCPConnector:
     """Connecteur MCP pour API Perplexity"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResearchCache] = None, config: Optional[Dict] = None):
+        config = config or load_storm_config()
+        perplexity = config.get("api", {}).get("perplexity", {})
+        
+        self.cache = cache or ResearchCache.from_config(config, namespace="perplexity")
         self.api_key = os.getenv("PERPLEXITY_API_KEY", "demo_key")
-        self.base_url = "https://api.perplexity.ai"
-        self.model = "llama-3.1-sonar-large-128k-online"
+        self.base_url = os.getenv("PERPLEXITY_BASE_URL", "https://api.perplexity.ai")
+        self.model = perplexity.get("model", "llama-3.1-sonar-large-128k-online")
+        self.max_tokens = perplexity.get("max_tokens", 4000)
+        self.temperature = perplexity.get("temperature", 0.2)
+        self.timeout = perplexity.get("timeout", 30)
+        self.max_retries = perplexity.get("max_retries", 3)
+        self.retry_backoff = perplexity.get("retry_backoff", 1.0)
+        self.retry_backoff_max = perplexity.get("retry_backoff_max", 30.0)
+        self.pool_size = config.get("research", {}).get("parallel_threads", 8)
         self.session = None
+        self._session_loop = None
+        # Recherches identiques concurrentes: un seul appel amont
+        self.inflight = SingleFlight("perplexity")
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        await self._get_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
+        await self.close()
+    
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """Session HTTP longue durée (pool keep-alive), recréée si la boucle change"""
+        import aiohttp
+        
+        loop = asyncio.get_running_loop()
+        if self.session is not None and not self.session.closed and self._session_loop is not loop:
+            await self._close_stale_session()
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._session_loop = loop
+        return self.session
+    
+    async def _close_stale_session(self):
+        """Ferme la session d'une boucle précédente avant d'en ouvrir une pour la boucle courante"""
+        session, session_loop = self.session, self._session_loop
+        self.session = None
+        self._session_loop = None
+        
+        if session_loop is not None and session_loop.is_running():
+            # Boucle active dans un autre thread: fermeture dans sa propre boucle
+            asyncio.run_coroutine_threadsafe(session.close(), session_loop)
+            return
+        if session_loop is None or session_loop.is_closed():
+            logger.warning("⚠️ Session HTTP d'une boucle terminée sans close(): "
+                           "fermer le connecteur avant la fin de la boucle (close_shared_connector)")
+        try:
+            await session.close()
+        except Exception as e:
+            logger.warning(f"⚠️ Fermeture de l'ancienne session HTTP incomplète: {e!r}")
+    
+    async def close(self):
+        """Ferme la session HTTP et son pool de connexions"""
+        if self.session and not self.session.closed:
             await self.session.close()
+        self.session = None
+        self._session_loop = None
     
-    async def search_topic(self, topic: str, context: str = "safety") -> Dict:
-        """Recherche un topic via API Perplexity"""
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Délai backoff exponentiel avec jitter complet (Retry-After prioritaire)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.retry_backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * (2 ** attempt)))
+    
+    async def search_topic(self, topic: str, context: str = "safety",
+                           rate_limiter: Optional[TokenBucket] = None) -> Dict:
+        """Recherche un topic via API Perplexity
+        
+        Les appels concurrents pour le même (topic, context) partagent une
+        seule requête amont et reçoivent le même résultat. rate_limiter n'est
+        consulté qu'avant l'appel HTTP réel (ni en démo, ni sur un hit du
+        cache, ni pour un appel fusionné).
+        """
+        
+        return await self.inflight.run(
+            (topic, context), lambda: self._search_topic(topic, context, rate_limiter)
+        )
+    
+    async def _search_topic(self, topic: str, context: str,
+                            rate_limiter: Optional[TokenBucket] = None) -> Dict:
+        """Recherche effective (cache persistant puis API avec nouvelles tentatives)"""
         
         # Construction prompt optimisé pour sécurité
         prompt = f'''
@@ -53,35 +158,66 @@ class PerplexityMCPConnector:
         if self.api_key == "demo_key":
             return await self._simulate_api_response(topic)
         
-        # Vraie intégration API (à implémenter)
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 4000,
-                "temperature": 0.2
-            }
-            
-            async with self.session.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return self._parse_api_response(data, topic)
-                else:
-                    logger.error(f"API Error: {response.status}")
-                    return await self._simulate_api_response(topic)
+        # Consultation cache persistant (TTL)
+        cached = self.cache.get(topic, context, PROMPT_TEMPLATE_VERSION)
+        if cached is not None:
+            logger.info(f"♻️ Topic servi depuis le cache: {topic}")
+            return cached
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+        
+        import aiohttp
+        
+        session = await self._get_session()
+        last_error: Optional[PerplexityAPIError] = None
+        
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            # Un jeton par requête HTTP réelle (nouvelles tentatives comprises)
+            if rate_limiter is not None:
+                await rate_limiter.acquire()
+            try:
+                async with session.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=headers,
+                    json=payload
+                ) as response:
+                    if response.status == 200:
+                        try:
+                            data = await response.json()
+                            result = self._parse_api_response(data, topic)
+                        except (aiohttp.ContentTypeError, ValueError, AttributeError, IndexError, TypeError) as e:
+                            # Corps 200 illisible (JSON invalide, structure inattendue): pas de nouvelle tentative
+                            last_error = PerplexityAPIError(f"Réponse API invalide: {e!r}", response.status)
+                            break
+                        self.cache.set(topic, context, PROMPT_TEMPLATE_VERSION, result)
+                        return result
                     
-        except Exception as e:
-            logger.error(f"Erreur API Perplexity: {e}")
-            return await self._simulate_api_response(topic)
+                    last_error = PerplexityAPIError(f"API Error: {response.status}", response.status)
+                    if response.status not in RETRYABLE_STATUSES:
+                        break
+                    retry_after = response.headers.get("Retry-After")
+                    
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = PerplexityAPIError(f"Erreur réseau: {e!r}")
+            
+            if attempt < self.max_retries:
+                delay = self._retry_delay(attempt, retry_after)
+                logger.warning(f"⚠️ {topic}: {last_error} - nouvelle tentative {attempt + 1}/{self.max_retries} dans {delay:.1f}s")
+                await asyncio.sleep(delay)
+        
+        logger.error(f"❌ Erreur API Perplexity ({topic}): {last_error}")
+        raise last_error
     
     async def _simulate_api_response(self, topic: str) -> Dict:
         """Simulation réponse API pour tests"""
@@ -142,13 +278,49 @@ class PerplexityMCPConnector:
 # FONCTIONS UTILITAIRES
 # ===================================================================
 
-async def batch_research(topics: List[str], context: str = "safety") -> List[Dict]:
-    """Recherche en lot de topics"""
+_shared_connector: Optional[PerplexityMCPConnector] = None
+
+def get_shared_connector() -> PerplexityMCPConnector:
+    """Connecteur partagé longue durée (réutilise le pool HTTP entre lots)
+    
+    Sa session HTTP appartient à la boucle qui l'a ouverte: attendre
+    close_shared_connector() avant la fin de cette boucle.
+    """
+    global _shared_connector
+    if _shared_connector is None:
+        _shared_connector = PerplexityMCPConnector()
+    return _shared_connector
+
+async def close_shared_connector():
+    """Ferme le connecteur partagé (arrêt application)"""
+    global _shared_connector
+    if _shared_connector is not None:
+        await _shared_connector.close()
+        _shared_connector = None
+
+async def batch_research(topics: List[str], context: str = "safety",
+                         connector: Optional[PerplexityMCPConnector] = None) -> List[Dict]:
+    """Recherche en lot de topics
+    
+    Concurrence bornée par la taille du pool; un topic en échec produit
+    {"topic", "error", "status"} au lieu d'un résultat simulé.
+    """
+    
+    connector = connector or get_shared_connector()
+    semaphore = asyncio.Semaphore(connector.pool_size)
+    
+    async def run(topic: str) -> Dict:
+        async with semaphore:
+            try:
+                return await connector.search_topic(topic, context)
+            except PerplexityAPIError as e:
+                return {"topic": topic, "error": str(e), "status": e.status}
     
-    async with PerplexityMCPConnector() as connector:
-        tasks = [connector.search_topic(topic, context) for topic in topics]
-        results = await asyncio.gather(*tasks)
-        return results
+    results = await asyncio.gather(*(run(topic) for topic in topics))
+    failures = sum(1 for r in results if "error" in r)
+    if failures:
+        logger.warning(f"⚠️ batch_research: {failures}/{len(topics)} topics en échec")
+    return results
 
 def validate_mcp_integration() -> bool:
     """Valide intégration MCP Perplexity"""
@@ -0,0 +1,45 @@
+﻿"""
+Rate Limit - SafetyGraph BehaviorX STORM
+======================================
+Limiteur token-bucket asynchrone partagé (requêtes/minute, tokens/minute)
+"""
+
+import time
+import asyncio
+
+class TokenBucket:
+    """Limiteur de débit token-bucket (requêtes/minute avec rafale)"""
+    
+    def __init__(self, requests_per_minute: float, burst_limit: int):
+        if not requests_per_minute > 0:
+            raise ValueError(f"requests_per_minute doit être positif: {requests_per_minute!r}")
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst_limit)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self, amount: float = 1):
+        """Attend que `amount` jetons soient disponibles puis les consomme
+        
+        Une demande supérieure à la capacité est plafonnée à la capacité
+        (sinon elle ne serait jamais servie). Les jetons sont réservés sous
+        le verrou (solde éventuellement négatif) et l'attente a lieu hors du
+        verrou: chaque appelant dort jusqu'à son propre créneau, dans l'ordre
+        d'arrivée, sans bloquer les suivants.
+        """
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Réservation rendue: le créneau profite aux appelants suivants
+                self.tokens += amount
+                raise
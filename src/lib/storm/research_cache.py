@@ -0,0 +1,183 @@
+﻿"""
+Research Cache - SafetyGraph BehaviorX STORM
+==========================================
+Cache persistant (SQLite) des recherches STORM / Perplexity
+TTL + éviction LRU bornée, partagé entre sessions
+Dates d'accès des hits différées en mémoire, écrites avant chaque éviction
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger('ResearchCache')
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "storm" / "research_cache.sqlite3"
+
+class ResearchCache:
+    """Cache TTL/LRU persistant clé (topic, catégorie, version template)"""
+    
+    def __init__(self, path: Optional[str] = None, ttl: float = 3600, max_entries: int = 1000,
+                 namespace: str = "research", enabled: bool = True):
+        self.path = Path(path or os.getenv("STORM_CACHE_PATH", DEFAULT_CACHE_PATH))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        # Dates d'accès des hits pas encore écrites (clé → accessed_at)
+        self._accessed: Dict[tuple, float] = {}
+    
+    @classmethod
+    def from_config(cls, config: Dict, namespace: str = "research", path: Optional[str] = None) -> "ResearchCache":
+        """Construit le cache depuis la section performance de storm_config.yaml"""
+        performance = config.get("performance", {})
+        return cls(
+            path=path,
+            ttl=performance.get("cache_ttl", 3600),
+            max_entries=performance.get("cache_max_entries", 1000),
+            namespace=namespace,
+            enabled=performance.get("cache_enabled", True)
+        )
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connexion SQLite ouverte au premier usage"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS research_cache (
+                    namespace TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    template_version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, topic, category, template_version)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_research_cache_lru ON research_cache (namespace, accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+    
+    def _key(self, topic: str, category: Optional[str], template_version: str) -> tuple:
+        return (self.namespace, topic, category or "", template_version)
+    
+    def get(self, topic: str, category: Optional[str], template_version: str) -> Optional[Dict]:
+        """Retourne le résultat en cache s'il est encore valide (TTL)"""
+        if not self.enabled:
+            return None
+        
+        key = self._key(topic, category, template_version)
+        row = self.conn.execute(
+            "SELECT payload, created_at FROM research_cache "
+            "WHERE namespace = ? AND topic = ? AND category = ? AND template_version = ?",
+            key
+        ).fetchone()
+        now = time.time()
+        
+        if row is None or now - row[1] >= self.ttl:
+            if row is not None:
+                self._delete(key)
+            self.misses += 1
+            return None
+        
+        # Pas d'écriture ni de commit sur un hit: accessed_at écrit au prochain flush
+        self._accessed[key] = now
+        self.hits += 1
+        return json.loads(row[0])
+    
+    def set(self, topic: str, category: Optional[str], template_version: str, value: Dict):
+        """Enregistre un résultat puis applique l'éviction LRU"""
+        if not self.enabled:
+            return
+        
+        now = time.time()
+        self._accessed.pop(self._key(topic, category, template_version), None)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO research_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (*self._key(topic, category, template_version), json.dumps(value, default=str), now, now)
+        )
+        self._evict()
+        self.conn.commit()
+    
+    def _delete(self, key: tuple):
+        self._accessed.pop(key, None)
+        self.conn.execute(
+            "DELETE FROM research_cache "
+            "WHERE namespace = ? AND topic = ? AND category = ? AND template_version = ?",
+            key
+        )
+        self.conn.commit()
+    
+    def _flush_accessed(self):
+        """Écrit les dates d'accès différées (sans commit)"""
+        if not self._accessed:
+            return
+        self.conn.executemany(
+            "UPDATE research_cache SET accessed_at = ? "
+            "WHERE namespace = ? AND topic = ? AND category = ? AND template_version = ?",
+            [(accessed_at, *key) for key, accessed_at in self._accessed.items()]
+        )
+        self._accessed.clear()
+    
+    def flush(self):
+        """Écrit les dates d'accès différées et valide"""
+        if self._accessed:
+            self._flush_accessed()
+            self.conn.commit()
+    
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_entries"""
+        # Ordre LRU à jour avant de choisir les victimes
+        self._flush_accessed()
+        self.conn.execute(
+            "DELETE FROM research_cache WHERE namespace = ? AND rowid IN ("
+            "SELECT rowid FROM research_cache WHERE namespace = ? "
+            "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+    
+    def purge_expired(self) -> int:
+        """Supprime les entrées expirées, retourne le nombre supprimé"""
+        cursor = self.conn.execute(
+            "DELETE FROM research_cache WHERE namespace = ? AND created_at <= ?",
+            (self.namespace, time.time() - self.ttl)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+    
+    def clear(self):
+        """Vide le cache du namespace"""
+        self._accessed.clear()
+        self.conn.execute("DELETE FROM research_cache WHERE namespace = ?", (self.namespace,))
+        self.conn.commit()
+    
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+    
+    def stats(self) -> Dict:
+        """Statistiques d'utilisation du cache"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": self.conn.execute(
+                "SELECT COUNT(*) FROM research_cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0] if self.enabled else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
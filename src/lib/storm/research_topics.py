@@ -6,10 +6,17 @@ Mapping avec agents BehaviorX pour enrichissement
 """
 
 import json
-from typing import Dict, List, Set
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
 from dataclasses import dataclass
 
-@dataclass
+logger = logging.getLogger('ResearchTopics')
+
+TOPICS_FILE = Path(__file__).with_name("100_topics_hse.json")
+
+@dataclass(slots=True)
 class ResearchTopic:
     """Classe représentant un sujet de recherche STORM"""
     topic_id: str
@@ -19,101 +26,177 @@ class ResearchTopic:
     priority: int = 1
     evidence_weight: float = 1.0
 
+# Topics documentés individuellement: priment sur les valeurs de catégorie
+# de 100_topics_hse.json (focus, agents, poids de preuve)
+TOPIC_OVERRIDES = {
+    # LEADERSHIP & MANAGEMENT HSE (10 sujets)
+    "transformational_safety_leadership": ResearchTopic(
+        "transformational_safety_leadership",
+        "leadership",
+        "Leadership transformationnel en sécurité",
+        ["SC", "R1", "R5"], 1, 0.95
+    ),
+    "management_commitment_measurement": ResearchTopic(
+        "management_commitment_measurement", 
+        "leadership",
+        "Mesure engagement direction HSE",
+        ["A1", "AN1"], 1, 0.90
+    ),
+    # COMMUNICATION & PRÉVENTION (10 sujets)
+    "safety_communication_effectiveness": ResearchTopic(
+        "safety_communication_effectiveness",
+        "communication", 
+        "Efficacité communication sécurité",
+        ["R6", "R10"], 1, 0.88
+    ),
+    "incident_reporting_culture": ResearchTopic(
+        "incident_reporting_culture",
+        "communication",
+        "Culture déclaration incidents", 
+        ["A1", "AN1"], 1, 0.92
+    ),
+    
+    # CULTURE & CLIMAT (10 sujets) 
+    "psychological_safety_workplace": ResearchTopic(
+        "psychological_safety_workplace",
+        "culture",
+        "Sécurité psychologique au travail",
+        ["A2", "A3"], 1, 0.94
+    ),
+    
+    # FORMATION & DÉVELOPPEMENT (10 sujets)
+    "behavioral_safety_training": ResearchTopic(
+        "behavioral_safety_training", 
+        "training",
+        "Formation sécurité comportementale",
+        ["A1", "A2"], 1, 0.89
+    ),
+    
+    # ENGAGEMENT & PARTICIPATION (10 sujets)
+    "employee_safety_engagement": ResearchTopic(
+        "employee_safety_engagement",
+        "engagement",
+        "Engagement employés sécurité",
+        ["A1", "A2", "R3"], 1, 0.91
+    )
+}
+
 class ResearchTopicsManager:
-    """Gestionnaire des sujets de recherche pour BehaviorX"""
+    """Gestionnaire des sujets de recherche pour BehaviorX
+    
+    100_topics_hse.json est chargé au premier accès (aucun coût à l'import);
+    index catégorie → topics, agent → topics et liste triée par priorité
+    sont construits une fois au chargement.
+    """
+    
+    def __init__(self, topics_path: Optional[str] = None):
+        self.topics_path = Path(topics_path) if topics_path else TOPICS_FILE
+        self._topics: Optional[Dict[str, ResearchTopic]] = None
+        self._by_category: Dict[str, List[ResearchTopic]] = {}
+        self._by_agent: Dict[str, List[ResearchTopic]] = {}
+        self._by_priority: List[ResearchTopic] = []
+        self._lock = threading.Lock()
+    
+    def _ensure_loaded(self) -> Dict[str, ResearchTopic]:
+        """Chargement et indexation au premier accès"""
+        if self._topics is None:
+            with self._lock:
+                if self._topics is None:
+                    self._build_indexes(self._initialize_topics())
+        return self._topics
+    
+    @property
+    def topics(self) -> Dict[str, ResearchTopic]:
+        """Topics indexés par identifiant"""
+        return self._ensure_loaded()
+    
+    @property
+    def categories(self) -> Set[str]:
+        """Catégories disponibles"""
+        self._ensure_loaded()
+        return set(self._by_category)
     
-    def __init__(self):
-        self.topics = self._initialize_topics()
-        self.categories = self._get_categories()
+    def _load_topics_file(self) -> Dict:
+        """Lecture de 100_topics_hse.json (BOM UTF-8 toléré)"""
+        try:
+            with open(self.topics_path, encoding="utf-8-sig") as f:
+                config = json.load(f)
+            return config.get("storm_topics_config", config).get("topics_structure", {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"⚠️ Topics STORM illisibles ({self.topics_path}): {e}")
+            return {}
     
     def _initialize_topics(self) -> Dict[str, ResearchTopic]:
         """Initialise les 100 topics Safety Culture Builder"""
         
-        topics_data = {
-            # LEADERSHIP & MANAGEMENT HSE (10 sujets)
-            "transformational_safety_leadership": ResearchTopic(
-                "transformational_safety_leadership",
-                "leadership",
-                "Leadership transformationnel en sécurité",
-                ["SC", "R1", "R5"], 1, 0.95
-            ),
-            "management_commitment_measurement": ResearchTopic(
-                "management_commitment_measurement", 
-                "leadership",
-                "Mesure engagement direction HSE",
-                ["A1", "AN1"], 1, 0.90
-            ),
-            # Ajouter tous les autres topics...
-            
-            # COMMUNICATION & PRÉVENTION (10 sujets)
-            "safety_communication_effectiveness": ResearchTopic(
-                "safety_communication_effectiveness",
-                "communication", 
-                "Efficacité communication sécurité",
-                ["R6", "R10"], 1, 0.88
-            ),
-            "incident_reporting_culture": ResearchTopic(
-                "incident_reporting_culture",
-                "communication",
-                "Culture déclaration incidents", 
-                ["A1", "AN1"], 1, 0.92
-            ),
-            
-            # CULTURE & CLIMAT (10 sujets) 
-            "psychological_safety_workplace": ResearchTopic(
-                "psychological_safety_workplace",
-                "culture",
-                "Sécurité psychologique au travail",
-                ["A2", "A3"], 1, 0.94
-            ),
-            
-            # FORMATION & DÉVELOPPEMENT (10 sujets)
-            "behavioral_safety_training": ResearchTopic(
-                "behavioral_safety_training", 
-                "training",
-                "Formation sécurité comportementale",
-                ["A1", "A2"], 1, 0.89
-            ),
-            
-            # ENGAGEMENT & PARTICIPATION (10 sujets)
-            "employee_safety_engagement": ResearchTopic(
-                "employee_safety_engagement",
-                "engagement",
-                "Engagement employés sécurité",
-                ["A1", "A2", "R3"], 1, 0.91
-            )
-        }
+        topics_data: Dict[str, ResearchTopic] = {}
+        
+        # Topics du fichier: focus, agents et priorité hérités de la catégorie
+        for category, structure in self._load_topics_file().items():
+            for topic_id in structure.get("topics", []):
+                topics_data[topic_id] = TOPIC_OVERRIDES.get(topic_id) or ResearchTopic(
+                    topic_id,
+                    category,
+                    structure.get("description", category),
+                    list(structure.get("agent_impact", [])),
+                    structure.get("priority", 1)
+                )
+        
+        # Topics documentés absents du fichier
+        for topic_id, topic in TOPIC_OVERRIDES.items():
+            topics_data.setdefault(topic_id, topic)
         
+        logger.info(f"✅ {len(topics_data)} topics STORM chargés ({self.topics_path.name})")
         return topics_data
     
-    def _get_categories(self) -> Set[str]:
-        """Retourne les catégories disponibles"""
-        return set(topic.category for topic in self.topics.values())
+    def _build_indexes(self, topics: Dict[str, ResearchTopic]):
+        """Index inversés catégorie/agent et tri par priorité (une seule passe)"""
+        by_category: Dict[str, List[ResearchTopic]] = {}
+        by_agent: Dict[str, List[ResearchTopic]] = {}
+        
+        for topic in topics.values():
+            by_category.setdefault(topic.category, []).append(topic)
+            for agent_id in dict.fromkeys(topic.agents_impacted):
+                by_agent.setdefault(agent_id, []).append(topic)
+        
+        self._by_category = by_category
+        self._by_agent = by_agent
+        self._by_priority = sorted(topics.values(),
+                                   key=lambda x: (x.priority, x.evidence_weight),
+                                   reverse=True)
+        self._topics = topics
+    
+    def reload(self):
+        """Recharge le fichier de topics et reconstruit les index"""
+        with self._lock:
+            self._build_indexes(self._initialize_topics())
     
     def get_topics_by_category(self, category: str) -> List[ResearchTopic]:
         """Retourne topics par catégorie"""
-        return [topic for topic in self.topics.values() 
-                if topic.category == category]
+        self._ensure_loaded()
+        return list(self._by_category.get(category, []))
     
     def get_topics_for_agent(self, agent_id: str) -> List[ResearchTopic]:
         """Retourne topics pertinents pour un agent donné"""
-        return [topic for topic in self.topics.values()
-                if agent_id in topic.agents_impacted]
+        self._ensure_loaded()
+        return list(self._by_agent.get(agent_id, []))
     
     def get_high_priority_topics(self, limit: int = 10) -> List[ResearchTopic]:
         """Retourne topics haute priorité"""
-        sorted_topics = sorted(self.topics.values(), 
-                             key=lambda x: (x.priority, x.evidence_weight), 
-                             reverse=True)
-        return sorted_topics[:limit]
+        self._ensure_loaded()
+        return self._by_priority[:limit]
     
     def export_topics_mapping(self) -> Dict:
         """Exporte mapping topics pour intégration BehaviorX"""
         
-        mapping = {
-            "total_topics": len(self.topics),
-            "categories": list(self.categories),
-            "agent_mapping": {},
+        topics = self._ensure_loaded()
+        return {
+            "total_topics": len(topics),
+            "categories": list(self._by_category),
+            "agent_mapping": {
+                agent: [topic.topic_id for topic in agent_topics]
+                for agent, agent_topics in self._by_agent.items()
+            },
             "priority_topics": [t.topic_id for t in self.get_high_priority_topics()],
             "topics_detail": {
                 topic_id: {
@@ -123,21 +206,22 @@ class ResearchTopicsManager:
                     "priority": topic.priority,
                     "weight": topic.evidence_weight
                 }
-                for topic_id, topic in self.topics.items()
+                for topic_id, topic in topics.items()
             }
         }
-        
-        # Créer mapping par agent
-        all_agents = set()
-        for topic in self.topics.values():
-            all_agents.update(topic.agents_impacted)
-        
-        for agent in all_agents:
-            mapping["agent_mapping"][agent] = [
-                topic.topic_id for topic in self.get_topics_for_agent(agent)
-            ]
-        
-        return mapping
 
-# Instance globale
-topics_manager = ResearchTopicsManager()
+# Instance globale (créée au premier accès, topics chargés au premier usage)
+_topics_manager: Optional[ResearchTopicsManager] = None
+
+def get_topics_manager() -> ResearchTopicsManager:
+    """Gestionnaire de topics partagé, créé au premier appel"""
+    global _topics_manager
+    if _topics_manager is None:
+        _topics_manager = ResearchTopicsManager()
+    return _topics_manager
+
+def __getattr__(name: str):
+    # Compatibilité: `from research_topics import topics_manager`
+    if name == "topics_manager":
+        return get_topics_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
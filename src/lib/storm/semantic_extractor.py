@@ -3,13 +3,26 @@ Semantic Extractor Claude 4 - Optimisation STORM v2.0
 Extraction sémantique avancée pour Safety Agentique
 """
 
+import os
 import json
 import asyncio
-from typing import Dict, List, Optional
-from dataclasses import dataclass
-import anthropic
+import logging
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, asdict
 
-@dataclass 
+from rate_limit import TokenBucket
+from extraction_memo import ExtractionMemo
+
+logger = logging.getLogger('SemanticExtractor')
+
+# Version du prompt d'extraction (fait partie de la clé de mémoïsation)
+SEMANTIC_PROMPT_VERSION = "1.0"
+CONTENT_LIMIT = 3000
+SEMANTIC_TEMPERATURE = 0.1
+# Réglages d'échantillonnage inclus dans la clé de mémoïsation
+SEMANTIC_MEMO_VERSION = f"{SEMANTIC_PROMPT_VERSION}/temperature={SEMANTIC_TEMPERATURE}"
+
+@dataclass(slots=True)
 class SemanticExtraction:
     topic: str
     key_insights: List[str]
@@ -19,16 +32,64 @@ class SemanticExtraction:
     confidence_score: float
 
 class ClaudeSemanticExtractor:
-    def __init__(self, api_key: str, model: str = "claude-3-sonnet-20240229"):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(self, api_key: str, model: str = "claude-3-sonnet-20240229",
+                 max_concurrency: int = 8, tokens_per_minute: int = 40000,
+                 base_url: Optional[str] = None, memo: Optional[ExtractionMemo] = None,
+                 memoize: bool = True):
+        self.api_key = api_key
+        self.base_url = base_url or os.getenv("ANTHROPIC_BASE_URL")
+        self._client = None
+        self._accepts_temperature: Optional[bool] = None
         self.model = model
+        self.max_tokens = 1000
+        self.max_concurrency = max_concurrency
+        self.token_budget = TokenBucket(tokens_per_minute, tokens_per_minute)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.memo = (memo or ExtractionMemo()) if memoize else None
     
-    async def extract_semantic_knowledge(self, content: str, topic: str) -> SemanticExtraction:
-        prompt = f'''
+    @property
+    def client(self):
+        """Client asynchrone créé au premier appel (anthropic importé à ce moment)
+        
+        N'occupe pas la boucle pendant l'appel modèle; base_url /
+        ANTHROPIC_BASE_URL permet un serveur local de substitution.
+        """
+        if self._client is None:
+            import anthropic
+            self._client = anthropic.AsyncAnthropic(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+        self._accepts_temperature = None
+    
+    def _sampling_options(self) -> Dict:
+        """temperature SEMANTIC_TEMPERATURE pour messages.create
+        
+        Passée en paramètre si le SDK le déclare, sinon dans extra_body (des
+        versions du SDK anthropic ne déclarent plus temperature et rejettent
+        l'argument nommé): la requête envoyée est la même dans les deux cas.
+        """
+        if self._accepts_temperature is None:
+            import inspect
+            try:
+                parameters = inspect.signature(self.client.messages.create).parameters.values()
+                self._accepts_temperature = any(
+                    p.name == "temperature" or p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters
+                )
+            except (TypeError, ValueError):
+                self._accepts_temperature = True
+        if self._accepts_temperature:
+            return {"temperature": SEMANTIC_TEMPERATURE}
+        return {"extra_body": {"temperature": SEMANTIC_TEMPERATURE}}
+    
+    def _build_prompt(self, content: str, topic: str) -> str:
+        return f'''
         EXTRACTION SÉMANTIQUE SAFETY AGENTIQUE - TOPIC: {topic}
         
         Contenu à analyser:
-        {content[:3000]}
+        {content[:CONTENT_LIMIT]}
         
         Format de réponse JSON requis:
         {{
@@ -39,16 +100,58 @@ class ClaudeSemanticExtractor:
             "confidence": 0.XX
         }}
         '''
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        """Estimation tokens requête (≈4 caractères/token) + réponse maximale"""
+        return len(prompt) // 4 + self.max_tokens
+    
+    async def extract_semantic_knowledge(self, content: str, topic: str) -> SemanticExtraction:
+        # Mémoïsation: contenu inchangé = zéro appel modèle
+        memo_key = None
+        if self.memo is not None:
+            memo_key = self.memo.key(self.model, topic, content[:CONTENT_LIMIT], SEMANTIC_MEMO_VERSION)
+            cached = self.memo.get(memo_key)
+            if cached is not None:
+                return self._from_memo(cached)
         
-        response = self.client.messages.create(
+        prompt = self._build_prompt(content, topic)
+        
+        await self.token_budget.acquire(self._estimate_tokens(prompt))
+        response = await self.client.messages.create(
             model=self.model,
-            max_tokens=1000,
-            temperature=0.1,
-            messages=[{"role": "user", "content": prompt}]
+            max_tokens=self.max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+            **self._sampling_options()
         )
         
+        extraction = self._parse_response(response.content[0].text, topic)
+        if extraction is None:
+            return self._fallback_extraction(topic)
+        
+        # Seules les réponses JSON valides sont mémoïsées
+        if memo_key is not None:
+            self.memo.set(memo_key, asdict(extraction))
+        return extraction
+    
+    @staticmethod
+    def _from_memo(cached: Dict) -> SemanticExtraction:
+        """Extraction à partir d'une entrée mémoïsée (listes et dicts recopiés)
+        
+        Le niveau mémoire du memo conserve ses propres conteneurs: un appelant
+        qui modifie l'extraction retournée n'altère pas les hits suivants.
+        """
+        return SemanticExtraction(
+            topic=cached['topic'],
+            key_insights=list(cached['key_insights']),
+            quantified_metrics=dict(cached['quantified_metrics']),
+            agent_mappings=dict(cached['agent_mappings']),
+            citations=list(cached['citations']),
+            confidence_score=cached['confidence_score']
+        )
+    
+    def _parse_response(self, text: str, topic: str) -> Optional[SemanticExtraction]:
         try:
-            data = json.loads(response.content[0].text)
+            data = json.loads(text)
             return SemanticExtraction(
                 topic=topic,
                 key_insights=data.get('insights', []),
@@ -58,11 +161,47 @@ class ClaudeSemanticExtractor:
                 confidence_score=data.get('confidence', 0.0)
             )
         except:
-            return SemanticExtraction(
-                topic=topic,
-                key_insights=[f"Analyse {topic}"],
-                quantified_metrics={'efficacite': 0.8},
-                agent_mappings={'A1': 'collecte'},
-                citations=['Source académique'],
-                confidence_score=0.7
-            )
+            return None
+    
+    def _fallback_extraction(self, topic: str) -> SemanticExtraction:
+        return SemanticExtraction(
+            topic=topic,
+            key_insights=[f"Analyse {topic}"],
+            quantified_metrics={'efficacite': 0.8},
+            agent_mappings={'A1': 'collecte'},
+            citations=['Source académique'],
+            confidence_score=0.7
+        )
+    
+    async def _extract_bounded(self, content: str, topic: str) -> Optional[SemanticExtraction]:
+        """Extraction sous sémaphore; un échec API est journalisé et retourne None"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async with self._semaphore:
+            try:
+                return await self.extract_semantic_knowledge(content, topic)
+            except Exception as e:
+                logger.error(f"❌ Erreur extraction sémantique {topic}: {e}")
+                return None
+    
+    async def iter_extract_semantic_knowledge(self, items: Iterable[Tuple[str, str]]) -> AsyncIterator[SemanticExtraction]:
+        """Extraction concurrente de (content, topic), produite dans l'ordre d'achèvement
+        
+        Concurrence bornée par max_concurrency, débit par tokens_per_minute.
+        Les topics en échec sont omis.
+        """
+        tasks = [asyncio.ensure_future(self._extract_bounded(content, topic)) for content, topic in items]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                extraction = await next_done
+                if extraction is not None:
+                    yield extraction
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def batch_extract_semantic_knowledge(self, items: Iterable[Tuple[str, str]]) -> List[SemanticExtraction]:
+        """Extraction concurrente de (content, topic), dans l'ordre d'entrée (échecs omis)"""
+        results = await asyncio.gather(*(self._extract_bounded(content, topic) for content, topic in items))
+        return [extraction for extraction in results if extraction is not None]
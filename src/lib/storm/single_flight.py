@@ -0,0 +1,56 @@
+﻿"""
+Single Flight - SafetyGraph BehaviorX STORM
+=========================================
+Fusion des requêtes concurrentes identiques (un seul appel amont par clé)
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger('SingleFlight')
+
+class SingleFlight:
+    """
+    Registre des appels en cours, par clé
+
+    Le premier appelant d'une clé lance l'appel amont dans une tâche; les
+    appelants concurrents de la même clé attendent cette tâche au lieu d'en
+    lancer une autre. L'entrée disparaît dès la fin de l'appel: les appels
+    suivants repassent par le cache ou l'API.
+
+    Tous les appelants reçoivent le même objet résultat (à ne pas modifier)
+    ou la même exception. L'annulation d'un appelant n'annule pas l'appel
+    partagé.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Résultat de call(), partagé avec les appels concurrents de même clé"""
+        self.stats["calls"] += 1
+        task = self._inflight.get(key)
+
+        # Tâche d'une autre boucle (connecteur réutilisé entre asyncio.run): non partageable
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats["coalesced"] += 1
+            logger.debug(f"🔗 {self.name}: requête fusionnée avec l'appel en cours {key!r}")
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Exception consommée même si tous les appelants ont été annulés
+        if not task.cancelled():
+            task.exception()
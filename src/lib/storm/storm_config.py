@@ -0,0 +1,43 @@
+﻿"""
+STORM Config - SafetyGraph BehaviorX STORM
+========================================
+Chargement de storm_config.yaml partagé par les modules STORM
+"""
+
+import copy
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger('STORMConfig')
+
+# Configuration par défaut (miroir de storm_config.yaml)
+DEFAULT_STORM_CONFIG = {
+    "api": {
+        "perplexity": {"timeout": 30, "max_retries": 3, "retry_backoff": 1.0, "retry_backoff_max": 30.0},
+        "rate_limits": {"requests_per_minute": 20, "daily_limit": 1000, "burst_limit": 5}
+    },
+    "research": {"parallel_threads": 8, "batch_size": 10},
+    "pipeline": {"research_workers": 8, "extract_workers": 2, "queue_size": 16},
+    "performance": {"cache_enabled": True, "cache_ttl": 3600, "cache_max_entries": 1000}
+}
+
+def load_storm_config(config_path: Optional[str] = None) -> Dict:
+    """Charge storm_configuration depuis storm_config.yaml (défauts si absent)"""
+    
+    candidates = [Path(config_path)] if config_path else []
+    candidates.append(Path(__file__).with_name("storm_config.yaml"))
+    
+    for path in candidates:
+        if not path.is_file():
+            continue
+        try:
+            import yaml
+            with open(path, encoding="utf-8-sig") as f:
+                config = yaml.safe_load(f) or {}
+            return config.get("storm_configuration", config)
+        except Exception as e:
+            logger.warning(f"⚠️ Configuration STORM illisible ({path}): {e}")
+    
+    logger.warning("⚠️ Configuration STORM par défaut utilisée")
+    return copy.deepcopy(DEFAULT_STORM_CONFIG)
@@ -10,24 +10,111 @@ import sys
 import json
 import asyncio
 import logging
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from pathlib import Path
 
-# Configuration logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from storm_config import load_storm_config
+from research_cache import ResearchCache
+from rate_limit import TokenBucket
+from single_flight import SingleFlight
+from cnesst_enrichment import build_enrichment_payload, enrich_cnesst_file
+
+# Format des journaux du script (configuration laissée à l'application hôte à l'import)
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
 logger = logging.getLogger('STORMLauncher')
 
+# Version du gabarit de recherche (invalide le cache si modifiée)
+RESEARCH_TEMPLATE_VERSION = "1.0"
+
+class ResearchScheduler:
+    """Ordonnanceur asynchrone des recherches STORM (concurrence bornée + limite de débit)
+    
+    Seuls les appels amont consomment un jeton: les résultats servis par le
+    cache ou partagés avec une recherche en cours ne sont pas limités.
+    """
+    
+    def __init__(self, launcher: "STORMLauncher", config: Optional[Dict] = None):
+        config = config or launcher.config
+        research = config.get("research", {})
+        rate_limits = config.get("api", {}).get("rate_limits", {})
+        
+        self.launcher = launcher
+        self.parallel_threads = max(1, research.get("parallel_threads", 8))
+        self.batch_size = max(1, research.get("batch_size", 10))
+        self.rate_limiter = TokenBucket(
+            rate_limits.get("requests_per_minute", 20),
+            rate_limits.get("burst_limit", 5)
+        )
+    
+    async def run(self, topics_config: Dict[str, List[str]]) -> Dict:
+        """Exécute toutes les recherches et rapporte latences et débit"""
+        
+        queue: asyncio.Queue = asyncio.Queue()
+        for category, topics in topics_config.items():
+            for topic in topics:
+                queue.put_nowait((topic, category))
+        
+        total = queue.qsize()
+        results: Dict[str, Dict] = {}
+        latencies: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        start = time.perf_counter()
+        
+        logger.info(f"🚀 Recherche STORM parallèle: {total} topics, {self.parallel_threads} workers, "
+                    f"{self.rate_limiter.rate * 60:.0f} req/min")
+        
+        async def worker():
+            while True:
+                try:
+                    topic, category = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                topic_start = time.perf_counter()
+                try:
+                    results[topic] = await self.launcher.execute_research(
+                        topic, category, rate_limiter=self.rate_limiter
+                    )
+                except Exception as e:
+                    errors[topic] = str(e)
+                    logger.error(f"❌ Erreur recherche {topic}: {e}")
+                finally:
+                    latencies[topic] = time.perf_counter() - topic_start
+                
+                done = len(latencies)
+                if done % self.batch_size == 0 or done == total:
+                    logger.info(f"📊 Progression STORM: {done}/{total} topics")
+        
+        await asyncio.gather(*(worker() for _ in range(min(self.parallel_threads, total))))
+        
+        elapsed = time.perf_counter() - start
+        return {
+            "session_id": self.launcher.session_id,
+            "total_topics": total,
+            "completed": len(results),
+            "failed": len(errors),
+            "results": results,
+            "errors": errors,
+            "latencies": latencies,
+            "average_latency": sum(latencies.values()) / len(latencies) if latencies else 0.0,
+            "elapsed_time": elapsed,
+            "throughput_per_minute": len(results) / elapsed * 60 if elapsed > 0 else 0.0
+        }
+
 class STORMLauncher:
     """Moteur de recherche STORM pour SafetyGraph BehaviorX"""
     
     def __init__(self, config_path: Optional[str] = None):
         self.config_path = config_path or "config/storm_optimization.yml"
+        self.config = load_storm_config(self.config_path)
         self.session_id = f"storm_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.research_cache = {}
+        self.cache = ResearchCache.from_config(self.config, namespace="storm_research")
+        # Recherches identiques concurrentes (workflows BehaviorX parallèles): un seul appel amont
+        self.inflight = SingleFlight("storm_research")
         
         logger.info(f"🚀 STORM Launcher initialisé - Session: {self.session_id}")
     
@@ -161,11 +248,35 @@ class STORMLauncher:
         logger.info(f"✅ Configuration 100 topics chargée - 10 catégories")
         return topics_config
     
-    async def execute_research(self, topic: str, category: str = None) -> Dict:
-        """Exécute une recherche STORM pour un topic donné"""
+    async def execute_research(self, topic: str, category: str = None,
+                               rate_limiter: Optional[TokenBucket] = None) -> Dict:
+        """Exécute une recherche STORM pour un topic donné
+        
+        Les appels concurrents pour le même (topic, category) partagent une
+        seule recherche et reçoivent le même résultat. rate_limiter n'est
+        consulté qu'en cas d'appel amont (absent du cache, pas déjà en cours).
+        """
+        
+        return await self.inflight.run(
+            (topic, category), lambda: self._execute_research(topic, category, rate_limiter)
+        )
+    
+    async def _execute_research(self, topic: str, category: Optional[str],
+                                rate_limiter: Optional[TokenBucket] = None) -> Dict:
+        """Recherche effective (cache persistant puis recherche STORM)"""
         
         logger.info(f"🔍 Démarrage recherche STORM: {topic}")
         
+        # Consultation cache persistant (TTL)
+        cached = self.cache.get(topic, category, RESEARCH_TEMPLATE_VERSION)
+        if cached is not None:
+            self.research_cache[topic] = cached
+            logger.info(f"♻️ Recherche servie depuis le cache: {topic}")
+            return cached
+        
+        if rate_limiter is not None:
+            await rate_limiter.acquire()
+        
         # Simulation recherche STORM (à remplacer par vraie intégration API)
         research_result = {
             "topic": topic,
@@ -193,37 +304,52 @@ class STORMLauncher:
         
         # Cache du résultat
         self.research_cache[topic] = research_result
+        self.cache.set(topic, category, RESEARCH_TEMPLATE_VERSION, research_result)
         
         logger.info(f"✅ Recherche terminée: {topic} - {research_result['sources_found']} sources")
         return research_result
     
+    async def execute_all_research(self, topics_config: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Exécute les 100 recherches STORM en parallèle selon storm_config.yaml"""
+        
+        topics_config = topics_config or self.load_topics_configuration()
+        report = await ResearchScheduler(self).run(topics_config)
+        # Dates d'accès des hits du lot (ordre LRU partagé entre sessions)
+        self.cache.flush()
+        
+        logger.info(f"✅ Recherches STORM terminées: {report['completed']}/{report['total_topics']} "
+                    f"en {report['elapsed_time']:.1f}s ({report['throughput_per_minute']:.1f} topics/min)")
+        return report
+    
     def enrich_cnesst_data(self, incident_data: Dict, research_results: List[Dict]) -> Dict:
         """Enrichit données CNESST avec insights STORM"""
         
         enriched_data = {
             **incident_data,
-            "storm_enrichment": {
-                "research_topics_applied": [r["topic"] for r in research_results],
-                "evidence_based_recommendations": [],
-                "behavioral_insights": [],
-                "prevention_strategies": [],
-                "enrichment_confidence": 0.91,
-                "enrichment_timestamp": datetime.now().isoformat()
-            }
+            "storm_enrichment": build_enrichment_payload(research_results)
         }
         
-        # Agrégation des insights
-        for research in research_results:
-            enriched_data["storm_enrichment"]["evidence_based_recommendations"].extend(
-                research["evidence_based_insights"]
-            )
-            enriched_data["storm_enrichment"]["behavioral_insights"].extend(
-                research["behavioral_applications"]
-            )
-        
         logger.info(f"✅ Données CNESST enrichies avec {len(research_results)} recherches STORM")
         return enriched_data
     
+    def enrich_cnesst_bulk(self, input_path: str, output_path: str,
+                           research_results: Optional[Dict[str, Dict]] = None,
+                           file_format: Optional[str] = None, payload_refs: bool = False) -> Dict:
+        """Enrichit un fichier CNESST (CSV, JSONL, Parquet) en flux vers JSONL
+        
+        Les topics de chaque incident viennent de son type (index précalculé);
+        research_results vaut par défaut les recherches de la session.
+        """
+        
+        research_results = research_results if research_results is not None else self.research_cache
+        if not research_results:
+            raise ValueError("Aucune recherche STORM disponible pour l'enrichissement CNESST")
+        
+        return enrich_cnesst_file(
+            input_path, output_path, research_results,
+            file_format=file_format, payload_refs=payload_refs
+        )
+    
     def get_behavioral_enhancement_data(self, agent_type: str) -> Dict:
         """Fournit données d'enrichissement pour agents BehaviorX"""
         
@@ -254,6 +380,7 @@ class STORMLauncher:
             "session_id": self.session_id,
             "timestamp": datetime.now().isoformat(),
             "total_researches": len(self.research_cache),
+            "coalesced_researches": self.inflight.stats["coalesced"],
             "research_results": self.research_cache,
             "behavioral_enhancements": {
                 agent: self.get_behavioral_enhancement_data(agent)
@@ -336,4 +463,5 @@ async def main():
     print("\n🎉 STORM LAUNCHER OPÉRATIONNEL POUR BEHAVIORX!")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
     asyncio.run(main())
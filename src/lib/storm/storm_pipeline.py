@@ -0,0 +1,311 @@
+﻿"""
+STORM Pipeline - SafetyGraph BehaviorX STORM
+===========================================
+Pipeline en flux recherche → extraction → graphe de connaissances
+Files bornées entre étapes (contre-pression), workers configurables par étape
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+
+from storm_config import load_storm_config
+from rate_limit import TokenBucket
+from mcp_perplexity import PerplexityMCPConnector, close_shared_connector, get_shared_connector
+from knowledge_extractor import ExtractedKnowledge, KnowledgeExtractor, _extract_in_worker
+from knowledge_graph import SafetyKnowledgeGraph
+
+logger = logging.getLogger('STORMPipeline')
+
+# Agents BehaviorX enrichis par catégorie (facteurs de STORMLauncher.get_behavioral_enhancement_data)
+CATEGORY_AGENT_MAPPINGS = {
+    "leadership": {"orchestrator": "workflow_optimization", "A1_enhanced": "self_assessment_accuracy"},
+    "communication": {"A2_enhanced": "observation_quality"},
+    "culture": {"A1_enhanced": "behavioral_patterns", "A2_enhanced": "abc_analysis_depth"},
+    "training": {"A1_enhanced": "behavioral_patterns"},
+    "engagement": {"A2_enhanced": "abc_analysis_depth"},
+    "measurement": {"orchestrator": "data_integration"},
+    "risk_management": {"A1_enhanced": "self_assessment_accuracy", "orchestrator": "workflow_optimization"},
+    "general": {"orchestrator": "data_integration"}
+}
+
+# Erreurs conservées dans le rapport (mémoire bornée quel que soit le nombre de topics)
+MAX_REPORTED_ERRORS = 100
+
+_DONE = object()  # Sentinelle de fin de flux
+
+def default_agent_mapper(knowledge: ExtractedKnowledge) -> Dict[str, str]:
+    """Agents BehaviorX concernés par une connaissance (selon sa catégorie)"""
+    return CATEGORY_AGENT_MAPPINGS.get(knowledge.category, CATEGORY_AGENT_MAPPINGS["general"])
+
+class StreamingResearchPipeline:
+    """
+    Pipeline asynchrone search_topic → extract_from_research → add_semantic_knowledge
+    
+    Chaque étape lit une file bornée et écrit dans la suivante: une étape lente
+    bloque les précédentes (contre-pression) au lieu d'accumuler les résultats.
+    Les éléments enrichis sont émis dès leur insertion dans le graphe, pendant
+    que les topics suivants sont encore en recherche.
+    """
+    
+    def __init__(self, connector: Optional[PerplexityMCPConnector] = None,
+                 extractor: Optional[KnowledgeExtractor] = None,
+                 graph: Optional[SafetyKnowledgeGraph] = None,
+                 config: Optional[Dict] = None,
+                 research_workers: Optional[int] = None,
+                 extract_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None,
+                 context: str = "safety",
+                 executor: Optional[Executor] = None,
+                 agent_mapper: Optional[Callable[[ExtractedKnowledge], Dict[str, str]]] = None):
+        config = config or load_storm_config()
+        pipeline = config.get("pipeline", {})
+        research = config.get("research", {})
+        rate_limits = config.get("api", {}).get("rate_limits", {})
+        
+        self.connector = connector or get_shared_connector()
+        self.extractor = extractor or KnowledgeExtractor()
+        self.graph = graph if graph is not None else SafetyKnowledgeGraph()
+        self.research_workers = max(1, research_workers or pipeline.get(
+            "research_workers", research.get("parallel_threads", 8)))
+        self.extract_workers = max(1, extract_workers or pipeline.get("extract_workers", 2))
+        self.queue_size = max(1, queue_size or pipeline.get("queue_size", 16))
+        self.context = context
+        # Extraction (regex, CPU) hors boucle: threads par défaut, ProcessPoolExecutor accepté
+        self.executor = executor
+        self.agent_mapper = agent_mapper or default_agent_mapper
+        self.rate_limiter = TokenBucket(
+            rate_limits.get("requests_per_minute", 20),
+            rate_limits.get("burst_limit", 5)
+        )
+        self.stats: Dict = {}
+    
+    def _reset_stats(self):
+        self.stats = {
+            "submitted": 0,
+            "researched": 0,
+            "extracted": 0,
+            "enriched": 0,
+            "failed": 0,
+            "new_concepts": 0,
+            "errors": {},
+            "latency_sum": 0.0,
+            "first_result_latency": None,
+            "start": time.perf_counter()
+        }
+    
+    def _record_error(self, topic: str, stage: str, error: Exception):
+        self.stats["failed"] += 1
+        if len(self.stats["errors"]) < MAX_REPORTED_ERRORS:
+            self.stats["errors"][topic] = f"{stage}: {error}"
+        logger.error(f"❌ Pipeline STORM ({stage}) {topic}: {error}")
+    
+    async def stream(self, topics: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[Dict]:
+        """
+        Flux des éléments BehaviorX enrichis, dans l'ordre d'achèvement
+        
+        Args:
+            topics: Topics à rechercher (itérable ou itérable asynchrone, consommé au fil de l'eau)
+            
+        Yields:
+            Élément au format export_for_behaviorx_integration + agent_mappings,
+            new_concepts et latency (secondes depuis l'entrée du topic)
+        """
+        self._reset_stats()
+        stats = self.stats
+        loop = asyncio.get_running_loop()
+        
+        topic_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        research_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        knowledge_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        output_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        
+        if isinstance(self.executor, ProcessPoolExecutor):
+            extract = _extract_in_worker
+        else:
+            extract = self.extractor.extract_from_research
+        
+        async def feed():
+            if hasattr(topics, "__aiter__"):
+                async for topic in topics:
+                    await topic_queue.put((topic, time.perf_counter()))
+                    stats["submitted"] += 1
+            else:
+                for topic in topics:
+                    await topic_queue.put((topic, time.perf_counter()))
+                    stats["submitted"] += 1
+        
+        async def research_worker():
+            while True:
+                item = await topic_queue.get()
+                if item is _DONE:
+                    return
+                topic, entered = item
+                
+                try:
+                    # Jeton pris par le connecteur, seulement pour un appel HTTP réel
+                    research_data = await self.connector.search_topic(
+                        topic, self.context, rate_limiter=self.rate_limiter
+                    )
+                except Exception as e:
+                    self._record_error(topic, "recherche", e)
+                    continue
+                stats["researched"] += 1
+                await research_queue.put((topic, research_data, entered))
+        
+        async def extract_worker():
+            while True:
+                item = await research_queue.get()
+                if item is _DONE:
+                    return
+                topic, research_data, entered = item
+                
+                try:
+                    knowledge = await loop.run_in_executor(self.executor, extract, research_data)
+                except Exception as e:
+                    self._record_error(topic, "extraction", e)
+                    continue
+                stats["extracted"] += 1
+                # Insights pré-extraits par le connecteur si le contenu brut n'en donne pas
+                insights = knowledge.insights or research_data.get("insights", [])
+                await knowledge_queue.put((knowledge, insights, entered))
+        
+        async def graph_writer():
+            # Écrivain unique: le graphe n'est modifié que depuis la boucle
+            while True:
+                item = await knowledge_queue.get()
+                if item is _DONE:
+                    return
+                knowledge, insights, entered = item
+                
+                try:
+                    agent_mappings = self.agent_mapper(knowledge)
+                    new_concepts = self.graph.add_semantic_knowledge_bulk([{
+                        "topic": knowledge.topic,
+                        "insights": insights,
+                        "agent_mappings": agent_mappings
+                    }])
+                except Exception as e:
+                    self._record_error(knowledge.topic, "graphe", e)
+                    continue
+                
+                latency = time.perf_counter() - entered
+                enriched = self.extractor.to_behaviorx_item(knowledge)
+                enriched.update(agent_mappings=agent_mappings, new_concepts=new_concepts, latency=latency)
+                
+                stats["enriched"] += 1
+                stats["new_concepts"] += new_concepts
+                stats["latency_sum"] += latency
+                if stats["first_result_latency"] is None:
+                    stats["first_result_latency"] = time.perf_counter() - stats["start"]
+                await output_queue.put(enriched)
+        
+        async def stage(workers, count: int, downstream: asyncio.Queue, sentinels: int):
+            # Sentinelles transmises même en cas d'échec pour ne pas bloquer l'aval
+            # (pas après annulation: l'aval est annulé lui aussi)
+            try:
+                await asyncio.gather(*(workers() for _ in range(count)))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                for _ in range(sentinels):
+                    await downstream.put(_DONE)
+                raise
+            for _ in range(sentinels):
+                await downstream.put(_DONE)
+        
+        tasks = [
+            asyncio.create_task(stage(feed, 1, topic_queue, self.research_workers)),
+            asyncio.create_task(stage(research_worker, self.research_workers, research_queue, self.extract_workers)),
+            asyncio.create_task(stage(extract_worker, self.extract_workers, knowledge_queue, 1)),
+            asyncio.create_task(stage(graph_writer, 1, output_queue, 1))
+        ]
+        
+        logger.info(f"🚀 Pipeline STORM: {self.research_workers} recherche, {self.extract_workers} extraction, "
+                    f"files de {self.queue_size}")
+        
+        try:
+            while True:
+                item = await output_queue.get()
+                if item is _DONE:
+                    break
+                yield item
+            # Propager une erreur d'étape (ex. itérable de topics défaillant)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def run(self, topics: Union[Iterable[str], AsyncIterable[str]],
+                  on_result: Optional[Callable[[Dict], object]] = None) -> Dict:
+        """
+        Exécute le pipeline et transmet chaque élément à on_result (sync ou async)
+        
+        Les éléments ne sont pas conservés: la mémoire reste constante quel que
+        soit le nombre de topics.
+        """
+        async for enriched in self.stream(topics):
+            if on_result is not None:
+                outcome = on_result(enriched)
+                if asyncio.iscoroutine(outcome):
+                    await outcome
+        
+        return self.report()
+    
+    def report(self) -> Dict:
+        """Rapport de la dernière exécution"""
+        stats = self.stats
+        elapsed = time.perf_counter() - stats["start"] if stats else 0.0
+        enriched = stats.get("enriched", 0)
+        
+        return {
+            "submitted": stats.get("submitted", 0),
+            "researched": stats.get("researched", 0),
+            "extracted": stats.get("extracted", 0),
+            "enriched": enriched,
+            "failed": stats.get("failed", 0),
+            "errors": dict(stats.get("errors", {})),
+            "new_concepts": stats.get("new_concepts", 0),
+            "elapsed_time": elapsed,
+            "first_result_latency": stats.get("first_result_latency"),
+            "average_latency": stats["latency_sum"] / enriched if enriched else 0.0,
+            "throughput_per_minute": enriched / elapsed * 60 if elapsed > 0 else 0.0,
+            "graph_nodes": self.graph.graph.number_of_nodes()
+        }
+
+# ===================================================================
+# FONCTIONS UTILITAIRES
+# ===================================================================
+
+async def stream_research_to_graph(topics: Union[Iterable[str], AsyncIterable[str]],
+                                   on_result: Optional[Callable[[Dict], object]] = None,
+                                   **options) -> Dict:
+    """Raccourci: exécute un StreamingResearchPipeline et retourne son rapport"""
+    return await StreamingResearchPipeline(**options).run(topics, on_result)
+
+def validate_storm_pipeline() -> bool:
+    """Valide le pipeline en flux (mode simulation Perplexity)"""
+    
+    async def run_validation(topics: List[str], received: List[Dict]) -> Dict:
+        try:
+            return await stream_research_to_graph(topics, received.append, queue_size=2)
+        finally:
+            # Connecteur partagé fermé dans la boucle qui a ouvert sa session
+            await close_shared_connector()
+    
+    try:
+        topics = ["behavioral_safety_training", "safety_leadership_coaching", "near_miss_reporting"]
+        received = []
+        report = asyncio.run(run_validation(topics, received))
+        
+        valid = report["enriched"] == len(received) and report["failed"] == 0
+        logger.info(f"✅ Pipeline STORM validé: {report['enriched']}/{len(topics)} topics enrichis")
+        return valid
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur validation pipeline STORM: {e}")
+        return False